@@ -10,10 +10,37 @@ DEFAULT_ENTITY_SPEED = 2.0
 PHYSICS_FRAMERATE = 120
 # FPS cap
 RENDER_FRAMERATE = 60
+# Whether to draw moving things part of the way between where they were at the last two physics ticks, according to how
+# far between those ticks the frame is. This keeps motion smooth even when PHYSICS_FRAMERATE is not much more than (or
+# is less than) RENDER_FRAMERATE, at the cost of drawing everything up to one tick late.
+RENDER_INTERPOLATION = False
+# The most physics ticks to run in a single frame, when catching up after falling behind, and the most time (in
+# milliseconds) to spend running them. Beyond either, the remaining ticks are skipped, so that the game slows down
+# rather than freezing whilst it tries to catch up.
+MAX_TICKS_PER_FRAME = 8
+PHYSICS_TIME_BUDGET = 12
+# When recording a play session, how many physics ticks apart to save the whole state of the game ('keyframes'), so that
+# the recording can be replayed from partway through without replaying everything before it.
+RECORDING_KEYFRAME_INTERVAL = 1200
 
 # How many physics ticks it should take to fall through one z-level
 FALL_TICKS = 15
 
+# Whether to test for collisions using precomputed distance fields, rather than against each nearby tile. This makes
+# each test take the same (short) time however complicated the walls nearby, at the cost of some memory and of
+# computing the fields when a map is loaded.
+USE_DISTANCE_FIELDS = False
+# The spacing, in pixels, between the samples of each distance field. Smaller is more accurate, but uses more memory
+# and takes longer to load: each z-level needs six fields, of 4 bytes per sample, covering the rectangle of tiles that
+# the map spans (plus a margin). With 32 pixel tiles that's 6 * 4 * (32 / DISTANCE_FIELD_RESOLUTION) ** 2 bytes per
+# tile, so at the default resolution about 6KiB per tile, e.g. about 60MiB for a z-level of a 100 by 100 tile map.
+# Halving the resolution quadruples this.
+DISTANCE_FIELD_RESOLUTION = 2
+# Whether to test exactly against the nearby tiles when a distance field is too inaccurate to be certain of the answer.
+# (That is, when an entity is within about DISTANCE_FIELD_RESOLUTION pixels of touching something.) If False then
+# collisions may be off by up to that much.
+DISTANCE_FIELD_EXACT_FALLBACK = True
+
 # The maximum camera offset, in pixels, from the player's position
 MAX_CAMERA_OFFSET = 400
 # How fast the camera should move
@@ -21,6 +48,11 @@ CAMERA_SPEED = 3.0
 # How wide (in pixels) the region around the edge of the screen for moving the camera should be
 SCREEN_EDGE_WIDTH = 5
 
+# How many tiles wide and high the clusters used to speed up pathfinding are. (See pathfinding.py.)
+PATHFINDING_CLUSTER_SIZE = 16
+# How many paths to remember, so that they needn't be found again.
+PATHFINDING_CACHE_SIZE = 256
+
 ### Menu Settings ###
 
 # How many pixels to scroll in menus when using the scroll wheel
@@ -30,6 +62,22 @@ SCROLL_SPEED = 40
 
 WINDOW_NAME = 'Maze Game'
 
+# How many tiles wide and high each chunk of a map is. Maps are stored a chunk at a time.
+MAP_CHUNK_SIZE = 32
+# How wide and high (in pixels) each of the pieces that the map is drawn in is. Only those pieces in view are drawn. Is
+# rounded down to a whole number of tiles.
+MAP_SCREEN_TILE_SIZE = 512
+# How much memory (in bytes) to use for keeping drawn pieces of the map, so that they needn't be redrawn every time they
+# come back into view. The least recently seen pieces are forgotten first. Should be comfortably more than a screenful.
+MAP_SCREEN_MEMORY_BUDGET = 128 * 1024 ** 2
+# How long (in milliseconds) to spend each frame drawing the z-levels that the player might be about to move to (via
+# stairs, or by falling), so that they're ready in time.
+MAP_PREFETCH_BUDGET = 2
+
+# Whether to only push those parts of the screen that have changed to the display each frame, rather than the whole
+# screen. (For example when the camera is still and only the player moves.)
+DIRTY_RECT_RENDERING = False
+
 # The file extension for map files
 MAP_FILE_EXTENSION = 'map'
 
@@ -74,6 +122,11 @@ MENU_FONT_SIZE = 20
 MENU_FONT_COLOR = (0, 0, 0)  # Black
 
 MENU_BACKGROUND_COLOR = (255, 255, 255)  # White
+MENU_DISABLED_TINT = (150, 150, 150)  # What disabled list entries (e.g. maps that can't be loaded) are multiplied by
+
+# How much memory (in bytes) to use for keeping rendered text, so that it needn't be rendered again every time that it
+# is drawn. The least recently used text is forgotten first.
+TEXT_CACHE_MEMORY_BUDGET = 8 * 1024 ** 2
 
 
 ### Input ###
@@ -106,6 +159,7 @@ class DebugCommands(tools.Container):
     EXIT = 'exit'   # Quits back to menus
     CLOSE = 'close'  # Closes the whole application
     CURRENT_TILE = 'currenttile'
+    TIMING = 'timing'
 
 
 # How long a key should be held down for to start generating repeat keypresses.
@@ -121,5 +175,7 @@ SELECT_CONSOLE = '/'
 CONSOLE_MEMORY_SIZE = 20
 # How long each line should be in the console before getting wrapped
 CONSOLE_LINE_LENGTH = 130
+# How many lines of past output the console should remember
+CONSOLE_SCROLLBACK = 500
 # What the prompt should be in the console
 CONSOLE_PROMPT = '> '
@@ -10,6 +10,28 @@ import Game.config.config as config
 
 # How many pixels of tolerance we allow ourselves when completing move commands.
 move_tolerance = 1
+# How close (in pixels) a moving entity gets to a wall it is moving into before stopping.
+contact_tolerance = 0.05
+# How far (in pixels) from an entity touching a wall to probe, to find which way the wall is facing.
+contact_probe_distance = 0.25
+# How many directions to probe in, to find which way a wall is facing.
+contact_probe_directions = 16
+# How many times a moving entity may slide off of a wall (or walls) in a single move.
+max_slides = 3
+# How many of the most recent ticks to keep the timings of.
+tick_time_samples = 1000
+# How much longer (in milliseconds) than it should take a frame can take before it counts as late.
+late_frame_margin = 1
+# How far (in tiles) from the player to look for stairs, when deciding which z-levels to draw in advance.
+prefetch_stair_distance = 3
+# How wide and high (in pixels) each atlas that images are packed into is.
+atlas_page_size = 1024
+# How wide and high (in pixels) each of the cells is that the screen is divided into, when working out which overlays a
+# mouse event could be over.
+event_routing_cell_size = 100
+# How many entries either side of those in view to draw, for each list in a menu, so that scrolling a little needn't
+# draw any more of them.
+list_overscan_rows = 2
 
 
 class Move(tools.Container):
@@ -34,13 +56,25 @@ class MenuIdentifiers(tools.Container):
     MAIN_MENU = 'main_menu'
     MAP_SELECT = 'map_select'
     OPTIONS = 'options'
+    LOADING = 'loading'
     GAME_START = 'game_start'  # Not a menu; special value to indicate that the main game should be started
 
 
+class MapLoadStages(tools.Container):
+    """The stages of loading a map. See game.MapLoader."""
+
+    READ = 'read'
+    PARSE = 'parse'
+    BUILD = 'build'
+    RENDER = 'render'
+
+
 class Maps(tools.Container):
     """Constants relating to maps."""
 
     MAP_LOC = os.path.join(os.path.dirname(__file__), '..', *config.MAP_FOLDER.split('/'))
+    # Where the index of the maps in MAP_LOC is saved. See maps.Catalogue.
+    CATALOGUE_LOC = os.path.join(MAP_LOC, '.catalogue')
 
 
 class InputTypes(tools.Container):
@@ -105,3 +139,4 @@ class Helpers(tools.Container):
     """Constants relating to the abstract helpers."""
 
     IMAGE_LOC = os.path.join(os.path.dirname(__file__), '..')
+    IMAGE_ROOT = os.path.join(IMAGE_LOC, 'data', 'images')  # Every image beneath here is loaded up front
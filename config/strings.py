@@ -55,6 +55,16 @@ class MapSelectMenu(Menus):
     SELECT_MAP = 'Select map'
 
 
+class LoadingMenu(Menus):
+    """Strings relating to loading a map."""
+    READ = 'Reading'
+    PARSE = 'Parsing'
+    BUILD = 'Building'
+    RENDER = 'Drawing'
+    PROGRESS = '{stage}... {percent:.0f}%'
+    CANCEL = 'Cancel'
+
+
 class EscapeMenu(Menus):
     QUIT = 'Exit to menu'
 
@@ -70,6 +80,14 @@ class Debug(tools.Container):
     GAME_NOT_STARTED = 'Can not run command; game has not yet started.'
     HEADER = "Commands:"
     DEBUG_HEADER = "Debug commands:"
+    TIMING_HEADER = "Timing:"
+    TIMING_FRAMES = 'frames'
+    TIMING_LATE_FRAMES = 'late frames'
+    TIMING_TICKS = 'ticks'
+    TIMING_DROPPED_TICKS = 'dropped ticks'
+    TIMING_TICK_TIME = '{percentile}th percentile tick time'
+    TIMING_MILLISECONDS = '{:.3f} ms'
+    TIMING_NO_VALUE = '-'
 
 
 class FileLoading(tools.Container):
@@ -1,10 +1,13 @@
 import sys
+import time
 import Tools as tools
 
 
 import Game.config.config as config
 
 import Game.program.misc.commands as commands
+import Game.program.misc.exceptions as exceptions
+import Game.program.misc.maps as maps
 import Game.program.misc.sdl as sdl
 
 import Game.program.interface.base as base
@@ -14,18 +17,22 @@ import Game.program.interface.play_overlay as play_overlay
 import Game.program.interface.text_overlay as text_overlay
 
 import Game.program.game as game
+import Game.program.recording as recording
+import Game.program.tiles as tiles
 
+import Game.tools.benchmarks as benchmarks
 import Game.tools.map_editor as map_editor
 
 
-def play_game(start_game=True):
+def play_game(start_game=True, clock=None):
     """Creates a game instance."""
-    clock = sdl.time.Clock()
+    if clock is None:
+        clock = sdl.time.Clock()
     interface_ = interface_factory()
     menus = game.Menus(interface=interface_, clock=clock)
     game_objects = game.GameObjects(map_background_color=interface_.overlays.game.background_color)
     simulation = game.Simulation(game_objects=game_objects, interface=interface_, clock=clock)
-    command_runner = commands.CommandRunner(game_objects, interface_)
+    command_runner = commands.CommandRunner(game_objects, interface_, simulation)
     interface_.overlays.debug.register_commands(command_runner)
     game_instance = game.GameRunner(menus=menus, simulation=simulation, interface=interface_, game_objects=game_objects)
     if start_game:
@@ -33,6 +40,58 @@ def play_game(start_game=True):
     return game_instance
 
 
+def _first_map_name():
+    """The name of the first map, in alphabetical order, that can be loaded."""
+    for map_info in maps.catalogue.update(tiles.all_tiles()):
+        if map_info.valid:
+            return map_info.name
+    raise exceptions.MapLoadException
+
+
+def headless(map_name=None, frames=1000):
+    """Plays the given map (or the first map that can be loaded, if none is given) for the given number of frames,
+    without a display and as fast as possible. Returns the game instance, so that e.g.
+    game_instance.simulation.scheduler can be inspected."""
+    sdl.use_dummy_display()
+    game_instance = play_game(start_game=False, clock=game.HeadlessClock())
+    if map_name is None:
+        map_name = _first_map_name()
+    game_instance.play(map_name, frames)
+    return game_instance
+
+
+def record(file_path, map_name=None):
+    """Plays the given map (or the first map that can be loaded, if none is given), recording the inputs of every
+    tick to the given file, until the game is quit."""
+    game_instance = play_game(start_game=False)
+    if map_name is None:
+        map_name = _first_map_name()
+    recorder = recording.Recorder(file_path, map_name, game_instance.interface.screen_size.size)
+    game_instance.simulation.recorder = recorder
+    try:
+        game_instance.play(map_name)
+    except exceptions.BaseQuitException:
+        pass
+    finally:
+        recorder.close()
+        sdl.quit()
+
+
+def replay(file_path, start_tick=0):
+    """Replays a recording made by 'record', starting from the given tick, without a display and as fast as possible.
+    Returns the recording, the game instance and how many ticks were run."""
+    recording_ = recording.Recording(file_path)
+    sdl.use_dummy_display()
+    game_instance = play_game(start_game=False, clock=game.HeadlessClock())
+    # Where the player clicks depends on the size of the screen.
+    if tuple(game_instance.interface.screen_size.size) != tuple(recording_.screen_size):
+        raise exceptions.RecordingLoadException
+    game_instance.reset()
+    game_instance.game_objects.load_map(recording_.map_name)
+    ticks = recording_.replay(game_instance.simulation, start_tick)
+    return recording_, game_instance, ticks
+
+
 def interface_factory():
     """Convenience function to set up the input and outputs of an interface."""
     # Fonts
@@ -73,5 +132,37 @@ def interface_factory():
 if __name__ == '__main__':
     if len(sys.argv) > 1 and sys.argv[1] == 'mapeditor':
         map_editor.start()
+    elif len(sys.argv) > 1 and sys.argv[1] == 'benchmark':
+        benchmarks.start(sys.argv[2:])
+    elif len(sys.argv) > 1 and sys.argv[1] == 'headless':
+        # python main.py headless [map name] [frames]
+        headless_args = {}
+        if len(sys.argv) > 2:
+            headless_args['map_name'] = sys.argv[2]
+        if len(sys.argv) > 3:
+            headless_args['frames'] = int(sys.argv[3])
+        start_time = time.perf_counter()
+        scheduler = headless(**headless_args).simulation.scheduler
+        seconds = time.perf_counter() - start_time
+        print('{frames} frames and {ticks} ticks in {seconds:.3f} seconds: {fps:.1f} frames per second'
+              .format(frames=scheduler.frames, ticks=scheduler.ticks, seconds=seconds, fps=scheduler.frames / seconds))
+    elif len(sys.argv) > 2 and sys.argv[1] == 'record':
+        # python main.py record <file> [map name]
+        record(*sys.argv[2:4])
+    elif len(sys.argv) > 2 and sys.argv[1] == 'replay':
+        # python main.py replay <file> [start tick]
+        replay_args = {}
+        if len(sys.argv) > 3:
+            replay_args['start_tick'] = int(sys.argv[3])
+        start_time = time.perf_counter()
+        recording_, game_instance, ticks = replay(sys.argv[2], **replay_args)
+        seconds = time.perf_counter() - start_time
+        print('{ticks} ticks in {seconds:.3f} seconds: {tps:.1f} ticks per second'
+              .format(ticks=ticks, seconds=seconds, tps=ticks / seconds))
+        final_state = recording_.final_state
+        player_pos = game_instance.simulation.snapshot().player_pos
+        print('Final player position: {}'.format(player_pos))
+        if final_state is not None:
+            print('Matches the recording: {}'.format(player_pos == final_state.player_pos))
     else:
         play_game()
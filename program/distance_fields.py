@@ -0,0 +1,187 @@
+"""Distance fields: an alternative way of testing for collisions between entities and the map.
+
+A map's geometry doesn't change once it is loaded, so rather than testing an entity against every tile near it each
+time, we can work out once how far each point of each z-level is from the nearest piece of wall (or floor, or
+suspension), and store that. Whether an entity collides is then just whether it is nearer to the geometry than its
+radius: a single lookup, however complicated the geometry near it.
+
+The distances are sampled on a grid with spacing h = config.DISTANCE_FIELD_RESOLUTION, and looked up between samples
+by bilinear interpolation. Each sample is computed (by bisection) to within half of a tolerance t = h / 8, and is then
+stored as a 32-bit float (to halve the memory used), which rounds it by at most d * 2^-24, where d is the largest
+distance stored (see below). The distance from a point to a set of points is 1-Lipschitz, and bilinear interpolation of
+a 1-Lipschitz function is wrong by at most h / sqrt(2) (attained at the center of a grid square), whilst interpolating
+between samples which are each off by at most some amount is off by at most that amount as well. So every distance
+looked up is within
+
+    error_bound = h / sqrt(2) + t / 2 + d * 2^-24
+
+of the true distance. So whenever the distance looked up is further than error_bound from the entity's radius, the
+answer is certainly correct. Otherwise the entity is very nearly touching the geometry, and we fall back to testing it
+against the tiles exactly, unless config.DISTANCE_FIELD_EXACT_FALLBACK is False, in which case we just go with the
+approximate answer.
+
+Distances are not stored beyond max_distance (one tile's width) as they are never needed: they are capped at that,
+which keeps them 1-Lipschitz. Nor are negative distances stored for points inside walls; zero is stored there instead.
+(Only the distance from outside of the geometry matters to an entity with a positive radius.)"""
+
+import array
+import math
+import numpy as np
+
+
+import Game.config.config as config
+
+import Game.program.tiles as tiles
+
+
+class DistanceField:
+    """The distance from each point of a single z-level to the nearest geometry which a particular kind of collision
+    test (e.g. wall_collide for corporeal entities) is made against."""
+
+    def __init__(self, map_, collide_name, z, incorporeal, resolution, max_distance, tolerance):
+        self._collide_many = getattr(map_, collide_name + '_many')
+        self.z = z
+        self.incorporeal = incorporeal
+        self.max_distance = max_distance
+        self.tolerance = tolerance
+        # Cover the whole map, plus enough of a margin around it to reach the boundary beyond it.
+        bounds = map_.bounds
+        margin = math.ceil(max_distance / tiles.size) + 1
+        self.origin_x = (bounds.min_x - margin) * tiles.size
+        self.origin_y = (bounds.min_y - margin) * tiles.size
+        self.resolution = resolution
+        self.width = math.floor((bounds.max_x - bounds.min_x + 1 + 2 * margin) * tiles.size / resolution) + 1
+        self.height = math.floor((bounds.max_y - bounds.min_y + 1 + 2 * margin) * tiles.size / resolution) + 1
+        self.values = array.array('f', self._distances(0, self.width, 0, self.height).tobytes())
+
+    def _distances(self, start_i, end_i, start_j, end_j):
+        """Computes the distances at the samples in the given range of columns and rows, as a float32 array of shape
+        (end_j - start_j, end_i - start_i)."""
+        xs, ys = np.meshgrid(self.origin_x + self.resolution * np.arange(start_i, end_i),
+                             self.origin_y + self.resolution * np.arange(start_j, end_j))
+        distances = np.full(xs.shape, self.max_distance, dtype=float)
+        # Most points are nowhere near any geometry, so first pick out the ones that are, and then only bisect for the
+        # distance at those.
+        near = self._collide_many(self.max_distance, xs, ys, self.z, self.incorporeal)
+        near_xs = xs[near]
+        near_ys = ys[near]
+        lower = np.zeros(near_xs.shape, dtype=float)
+        upper = np.full(near_xs.shape, self.max_distance, dtype=float)
+        for _ in range(math.ceil(math.log2(self.max_distance / self.tolerance))):
+            middle = (lower + upper) / 2
+            collide = self._collide_many(middle, near_xs, near_ys, self.z, self.incorporeal)
+            upper = np.where(collide, middle, upper)
+            lower = np.where(collide, lower, middle)
+        distances[near] = (lower + upper) / 2
+        return distances.astype(np.float32)
+
+    def update(self, left, top, right, bottom):
+        """Computes again the distances at those samples within max_distance of the given rectangle (in pixels). Should
+        be called when the geometry in that rectangle changes."""
+        start_i = max(0, math.floor((left - self.max_distance - self.origin_x) / self.resolution))
+        end_i = min(self.width, math.ceil((right + self.max_distance - self.origin_x) / self.resolution) + 1)
+        start_j = max(0, math.floor((top - self.max_distance - self.origin_y) / self.resolution))
+        end_j = min(self.height, math.ceil((bottom + self.max_distance - self.origin_y) / self.resolution) + 1)
+        if start_i < end_i and start_j < end_j:
+            values = np.frombuffer(self.values, dtype=np.float32).reshape(self.height, self.width)
+            values[start_j:end_j, start_i:end_i] = self._distances(start_i, end_i, start_j, end_j)
+
+    def distance(self, x, y):
+        """The approximate distance from the given point to the nearest geometry, or None if the point is outside of
+        this field."""
+        grid_x = (x - self.origin_x) / self.resolution
+        grid_y = (y - self.origin_y) / self.resolution
+        i = math.floor(grid_x)
+        j = math.floor(grid_y)
+        if not (0 <= i < self.width - 1 and 0 <= j < self.height - 1):
+            return None
+        frac_x = grid_x - i
+        frac_y = grid_y - j
+        values = self.values
+        k = j * self.width + i
+        top = values[k] + frac_x * (values[k + 1] - values[k])
+        k += self.width
+        bottom = values[k] + frac_x * (values[k + 1] - values[k])
+        return top + frac_y * (bottom - top)
+
+
+class DistanceFields:
+    """Tests for collisions between entities and a map using distance fields. All of them may be computed at once via
+    compute_all, as Map.load_tiles does, so that computing them doesn't hold up the game; any that haven't been are
+    computed the first time that they are needed."""
+
+    collide_names = ('wall_collide', 'floor_collide', 'suspend_collide')
+
+    def __init__(self, map_, resolution=config.DISTANCE_FIELD_RESOLUTION,
+                 exact_fallback=config.DISTANCE_FIELD_EXACT_FALLBACK):
+        self._map = map_
+        self._fields = {}
+        self.resolution = resolution
+        self.exact_fallback = exact_fallback
+        self.max_distance = tiles.size
+        self.tolerance = resolution / 8
+        # The last term is the rounding from storing the fields as 32-bit floats, which have a 24-bit significand.
+        self.error_bound = resolution / math.sqrt(2) + self.tolerance / 2 + self.max_distance * 2 ** -24
+        # How many collision tests there have been, and how many of those had to be tested exactly
+        self.tests = 0
+        self.fallbacks = 0
+
+    def compute_all(self, progress=None):
+        """Computes every field that might be needed for the map. If 'progress' is given then it is called after each
+        field with how far through computing them it is, as a fraction between 0 and 1."""
+        bounds = self._map.bounds
+        keys = [(collide_name, z, incorporeal) for z in range(bounds.min_z, bounds.max_z + 1)
+                for collide_name in self.collide_names for incorporeal in (False, True)]
+        for i, key in enumerate(keys):
+            self._field(*key)
+            if progress is not None:
+                progress((i + 1) / len(keys))
+
+    def _field(self, collide_name, z, incorporeal):
+        """The field for the given kind of collision test. Is None if there's no need for one, because the z-level is
+        outside of the map (and so entirely boundary)."""
+        key = (collide_name, z, incorporeal)
+        try:
+            return self._fields[key]
+        except KeyError:
+            bounds = self._map.bounds
+            if bounds.min_z <= z <= bounds.max_z:
+                field = DistanceField(self._map, collide_name, z, incorporeal, self.resolution, self.max_distance,
+                                      self.tolerance)
+            else:
+                field = None
+            self._fields[key] = field
+            return field
+
+    def tiles_changed(self, x, y, z):
+        """Should be called whenever the tile at the given position changes (but not the bounds of the map; see
+        'clear'). Updates those parts of the fields for its z-level that are near enough to it to have changed."""
+        for key, field in self._fields.items():
+            if field is not None and key[1] == z:
+                field.update(x * tiles.size, y * tiles.size, (x + 1) * tiles.size, (y + 1) * tiles.size)
+
+    def clear(self):
+        """Forgets every field, so that they will be computed again when next needed. Should be called whenever the
+        bounds of the map change, as each field covers the whole of them."""
+        self._fields = {}
+
+    def nbytes(self):
+        """How much memory the fields computed so far are using, in bytes."""
+        return sum(field.values.itemsize * len(field.values) for field in self._fields.values() if field is not None)
+
+    def collide(self, collide_name, entity, pos):
+        """Whether the given entity at the given position collides with the map, for the given kind of collision test,
+        e.g. 'wall_collide'."""
+        self.tests += 1
+        field = self._field(collide_name, pos.z, bool(entity.incorporeal))
+        if field is not None:
+            distance = field.distance(pos.x, pos.y)
+            if distance is not None:
+                if distance < min(entity.radius, self.max_distance) - self.error_bound:
+                    return True
+                if distance > entity.radius + self.error_bound:
+                    return False
+                if not self.exact_fallback and entity.radius + self.error_bound < self.max_distance:
+                    return distance < entity.radius
+        self.fallbacks += 1
+        return self._map.tile_collide(collide_name, entity, pos)
@@ -56,3 +56,96 @@ class Entity(helpers.HasAppearances, tools.HasPositionMixin, appearance_files_lo
 class Player(Entity):
     """Holds all player data."""
     appearance_filenames = 'player.png'
+
+
+class EntityRegistry:
+    """Keeps track of all of the entities in the game, and where they are.
+
+    Entities are put into buckets according to which tile they are in, so that finding those near to some position only
+    needs to look through the few buckets around it. Whenever an entity moves, 'update' should be called so that it can
+    be moved to the right bucket.
+
+    (Entities are tracked by their id, as they needn't be hashable.)"""
+
+    def __init__(self):
+        self._buckets = {}  # {tile_pos: {id(entity): entity}}
+        self._tile_positions = {}  # {id(entity): tile_pos}, i.e. which bucket each entity is in
+        self._entities = {}  # {id(entity): entity}
+        self._max_radius = 0
+
+    def __iter__(self):
+        return iter(self._entities.values())
+
+    def __len__(self):
+        return len(self._entities)
+
+    def __contains__(self, entity):
+        return id(entity) in self._entities
+
+    def add(self, entity):
+        tile_pos = entity.tile_pos
+        self._entities[id(entity)] = entity
+        self._tile_positions[id(entity)] = tile_pos
+        self._buckets.setdefault(tile_pos, {})[id(entity)] = entity
+        self._max_radius = max(self._max_radius, entity.radius)
+
+    def remove(self, entity):
+        del self._entities[id(entity)]
+        tile_pos = self._tile_positions.pop(id(entity))
+        self._remove_from_bucket(entity, tile_pos)
+
+    def update(self, entity):
+        """Records that the given entity has moved."""
+        tile_pos = entity.tile_pos
+        old_tile_pos = self._tile_positions[id(entity)]
+        if tile_pos != old_tile_pos:
+            self._remove_from_bucket(entity, old_tile_pos)
+            self._tile_positions[id(entity)] = tile_pos
+            self._buckets.setdefault(tile_pos, {})[id(entity)] = entity
+
+    def _remove_from_bucket(self, entity, tile_pos):
+        bucket = self._buckets[tile_pos]
+        del bucket[id(entity)]
+        if not bucket:
+            del self._buckets[tile_pos]
+
+    def near(self, pos, radius):
+        """Iterates over every entity which intersects the disc with the given radius at the given position."""
+        reach = math.ceil((radius + self._max_radius) / tiles.size)
+        tile_x = math.floor(pos.x / tiles.size)
+        tile_y = math.floor(pos.y / tiles.size)
+        for offset_x in range(-reach, reach + 1):
+            for offset_y in range(-reach, reach + 1):
+                bucket = self._buckets.get((tile_x + offset_x, tile_y + offset_y, pos.z))
+                if bucket:
+                    for entity in bucket.values():
+                        if (entity.x - pos.x) ** 2 + (entity.y - pos.y) ** 2 < (entity.radius + radius) ** 2:
+                            yield entity
+
+    def collide(self, entity, pos):
+        """Whether or not the given entity at the given position would collide with any other entity."""
+        return any(other is not entity for other in self.near(pos, entity.radius))
+
+    def collisions(self):
+        """Iterates over every pair of entities which are colliding with each other. Each pair is only given once."""
+        reach = math.ceil(2 * self._max_radius / tiles.size)
+        # Only look at those buckets 'after' each bucket, so that each pair of buckets is only looked at once.
+        offsets = [(offset_x, offset_y) for offset_x in range(0, reach + 1) for offset_y in range(-reach, reach + 1)
+                   if offset_x > 0 or offset_y > 0]
+        for (tile_x, tile_y, z), bucket in self._buckets.items():
+            entities = list(bucket.values())
+            for i, entity in enumerate(entities):
+                for other in entities[i + 1:]:
+                    if self._intersect(entity, other):
+                        yield entity, other
+            for offset_x, offset_y in offsets:
+                other_bucket = self._buckets.get((tile_x + offset_x, tile_y + offset_y, z))
+                if other_bucket:
+                    for entity in entities:
+                        for other in other_bucket.values():
+                            if self._intersect(entity, other):
+                                yield entity, other
+
+    @staticmethod
+    def _intersect(entity, other):
+        return (entity.x - other.x) ** 2 + (entity.y - other.y) ** 2 < (entity.radius + other.radius) ** 2
@@ -1,4 +1,10 @@
+import array
+import collections
 import math
+import numpy as np
+import queue
+import threading
+import time
 import Tools as tools
 
 
@@ -11,104 +17,448 @@ import Game.program.misc.helpers as helpers
 import Game.program.misc.maps as maps
 import Game.program.misc.sdl as sdl
 
+import Game.program.distance_fields as distance_fields
 import Game.program.entities as entities
+import Game.program.pathfinding as pathfinding
 import Game.program.tiles as tiles
 
 
+def _progress_part(progress, start, end):
+    """For reporting progress through one part of a longer task, which takes up the fraction of it between 'start' and
+    'end'. Takes a 'progress' callback for the whole task (or None) and returns one for that part (or None)."""
+    if progress is None:
+        return None
+    return lambda part_progress: progress(start + part_progress * (end - start))
+
+
+class Level:
+    """Holds the tiles making up a single z-level of a map.
+
+    The level is split up into square chunks of config.MAP_CHUNK_SIZE by config.MAP_CHUNK_SIZE cells, and only those
+    chunks with a tile in them are stored. Rather than storing a tile object per cell, each chunk is stored as a dense
+    grid. Each cell of the grid holds a small integer: 0 if there is no tile there, and otherwise one more than the
+    index of the tile's type in the map's list of tile types. (Each entry of which already specifies the kind of tile,
+    its rotation and its appearance, just as in the map files themselves.)"""
+
+    def __init__(self, z, z_level_data):
+        self.z = z
+        self.min_x = min(x for x, y in z_level_data.keys())
+        self.max_x = max(x for x, y in z_level_data.keys())
+        self.min_y = min(y for x, y in z_level_data.keys())
+        self.max_y = max(y for x, y in z_level_data.keys())
+        self.chunks = {}  # (chunk_x, chunk_y): array of tile indices
+        chunk_size = config.MAP_CHUNK_SIZE
+        for (x, y), tile_def in z_level_data.items():
+            chunk_x, cell_x = divmod(x, chunk_size)
+            chunk_y, cell_y = divmod(y, chunk_size)
+            try:
+                chunk = self.chunks[(chunk_x, chunk_y)]
+            except KeyError:
+                chunk = array.array('H', bytes(2 * chunk_size * chunk_size))
+                self.chunks[(chunk_x, chunk_y)] = chunk
+            chunk[cell_y * chunk_size + cell_x] = tile_def + 1
+
+    def __iter__(self):
+        """Iterates over the (x, y, tile index) of all of the cells in the level which have a tile in them."""
+        for (chunk_x, chunk_y), chunk in self.chunks.items():
+            for cell_x, cell_y, tile_index in self.iter_chunk(chunk):
+                yield chunk_x * config.MAP_CHUNK_SIZE + cell_x, chunk_y * config.MAP_CHUNK_SIZE + cell_y, tile_index
+
+    @staticmethod
+    def iter_chunk(chunk):
+        """Iterates over the (x, y, tile index) of all of the cells in the given chunk which have a tile in them. The
+        positions are relative to the chunk."""
+        for i, tile_index in enumerate(chunk):
+            if tile_index:
+                cell_y, cell_x = divmod(i, config.MAP_CHUNK_SIZE)
+                yield cell_x, cell_y, tile_index - 1
+
+    def iter_region(self, left, top, width, height):
+        """Iterates over the (x, y, tile index) of all of the cells in the given rectangle (in cells) which have a tile
+        in them."""
+        chunk_size = config.MAP_CHUNK_SIZE
+        for chunk_x in range(left // chunk_size, (left + width - 1) // chunk_size + 1):
+            for chunk_y in range(top // chunk_size, (top + height - 1) // chunk_size + 1):
+                try:
+                    chunk = self.chunks[(chunk_x, chunk_y)]
+                except KeyError:
+                    continue
+                for cell_x, cell_y, tile_index in self.iter_chunk(chunk):
+                    x = chunk_x * chunk_size + cell_x
+                    y = chunk_y * chunk_size + cell_y
+                    if left <= x < left + width and top <= y < top + height:
+                        yield x, y, tile_index
+
+    def get(self, x, y):
+        """The index of the type of the tile at the specified location, or None if there is no tile there."""
+        if not (self.min_x <= x <= self.max_x and self.min_y <= y <= self.max_y):
+            return None
+        chunk_x, cell_x = divmod(x, config.MAP_CHUNK_SIZE)
+        chunk_y, cell_y = divmod(y, config.MAP_CHUNK_SIZE)
+        try:
+            chunk = self.chunks[(chunk_x, chunk_y)]
+        except KeyError:
+            return None
+        tile_index = chunk[cell_y * config.MAP_CHUNK_SIZE + cell_x]
+        if tile_index:
+            return tile_index - 1
+        return None
+
+    def set(self, x, y, tile_index):
+        """Sets the tile at the specified location to be of the type with the given index, or to be no tile at all if
+        the index is None."""
+        chunk_size = config.MAP_CHUNK_SIZE
+        chunk_x, cell_x = divmod(x, chunk_size)
+        chunk_y, cell_y = divmod(y, chunk_size)
+        try:
+            chunk = self.chunks[(chunk_x, chunk_y)]
+        except KeyError:
+            if tile_index is None:
+                return
+            chunk = array.array('H', bytes(2 * chunk_size * chunk_size))
+            self.chunks[(chunk_x, chunk_y)] = chunk
+        chunk[cell_y * chunk_size + cell_x] = 0 if tile_index is None else tile_index + 1
+        if tile_index is not None:
+            self.min_x = min(x, self.min_x)
+            self.max_x = max(x, self.max_x)
+            self.min_y = min(y, self.min_y)
+            self.max_y = max(y, self.max_y)
+
+    def get_many(self, xs, ys):
+        """As get, but for arrays of positions. Returns an array of indices, with -1 wherever there is no tile."""
+        chunk_size = config.MAP_CHUNK_SIZE
+        tile_indices = np.full(np.shape(xs), -1, dtype=int)
+        chunk_xs = np.floor_divide(xs, chunk_size)
+        chunk_ys = np.floor_divide(ys, chunk_size)
+        cell_xs = xs - chunk_xs * chunk_size
+        cell_ys = ys - chunk_ys * chunk_size
+        chunk_positions = np.unique(np.stack([np.ravel(chunk_xs), np.ravel(chunk_ys)], axis=-1), axis=0)
+        for chunk_x, chunk_y in chunk_positions.tolist():
+            try:
+                chunk = self.chunks[(chunk_x, chunk_y)]
+            except KeyError:
+                continue
+            in_chunk = (chunk_xs == chunk_x) & (chunk_ys == chunk_y)
+            # No copying here: this is a view onto the chunk's array.
+            grid = np.frombuffer(chunk, dtype=np.uint16).reshape(chunk_size, chunk_size)
+            tile_indices[in_chunk] = grid[cell_ys[in_chunk], cell_xs[in_chunk]].astype(int) - 1  # 0 -> -1
+        return tile_indices
+
+
 class Map:
     """Holds all map data - the tiles that make up the map, plus associated information such as the map's name, its
     visual depiction on the screen, etc."""
     
     def __init__(self, background_color):
-        self.screens = None  # The visual depiction of the map
-        self._tile_data = None  # The tiles making up the map
+        # The visual depiction of those pieces of the map that have been drawn so far, as a dict of
+        # {(z, x, y): Surface}, ordered from least to most recently used. (See Map.screens.)
+        self._screens = collections.OrderedDict()
+        self._screens_memory = 0  # How much memory (in bytes) the above is using
+        # How many times drawing the map on screen has had to wait for a piece of it to be drawn first, and how long (in
+        # seconds) it has spent waiting in total.
+        self.screen_stalls = 0
+        self.screen_stall_time = 0
+        self._tiles = None  # One tile for each type of tile in the map, shared between all cells of that type
+        self._levels = None  # Where each type of tile is in the map, as a dict of Levels
+        self._distance_fields = None  # Used for collision tests, if config.USE_DISTANCE_FIELDS is True
+        self.pathfinder = None  # Finds paths through the map
         self.initialised = False  # Whether the map has been loaded yet
         self._background_color = background_color  # The background color to use where no tile is defined.
-        self._max_z = -math.inf
-        self._max_y = -math.inf
-        self._max_x = -math.inf
-        self._min_z = math.inf
-        self._min_y = math.inf
-        self._min_x = math.inf
+        # The extent of the map: the smallest box containing the bounding boxes of all of its levels. Everywhere
+        # outside of this is boundary.
+        self._bounds = tools.Object(min_x=math.inf, max_x=-math.inf, min_y=math.inf, max_y=-math.inf, min_z=math.inf,
+                                    max_z=-math.inf)
+        # Returned for every cell without a tile in, rather than creating a new tile for each one. (Which would be slow,
+        # and these are most of what a sparse map is made of.)
+        self._empty_tile = tiles.Empty()
+        self._boundary_tile = tiles.Boundary()
         super(Map, self).__init__()
 
     def __iter__(self):
-        """Iterates over all tiles."""
-        for z_level in self._tile_data.values():
-            for tile in z_level.values():
-                yield tile
+        """Iterates over the position and tile of every cell in the map which has a tile in it."""
+        for level in self._levels.values():
+            for x, y, tile_index in level:
+                yield helpers.XYZPos(x=x, y=y, z=level.z), self._tiles[tile_index]
+
+    @property
+    def bounds(self):
+        """The smallest and largest x, y and z coordinates of any tile in the map."""
+        return self._bounds
+
+    def _update_bounds(self):
+        """Recomputes the extent of the map from the bounding boxes of its levels. Returns whether it has changed."""
+        old_bounds = self._bounds
+        levels = self._levels.values()
+        if levels:
+            self._bounds = tools.Object(min_x=min(level.min_x for level in levels),
+                                        max_x=max(level.max_x for level in levels),
+                                        min_y=min(level.min_y for level in levels),
+                                        max_y=max(level.max_y for level in levels),
+                                        min_z=min(self._levels.keys()),
+                                        max_z=max(self._levels.keys()))
+        return any(getattr(old_bounds, name) != getattr(self._bounds, name)
+                   for name in ('min_x', 'max_x', 'min_y', 'max_y', 'min_z', 'max_z'))
 
     def local(self, radius, pos):
-        tile_radius = 2 * math.ceil(radius / tiles.diag)
-        tile_center_x = math.floor(pos.x / tiles.size)
-        tile_center_y = math.floor(pos.y / tiles.size)
-        disc = tools.Disc(radius, pos)
-        for dist in range(0, tile_radius + 1):
-            for tile_x, tile_y in self._shell(tile_center_x, tile_center_y, dist):
-                if disc.colliderect(sdl.Rect(tile_x * tiles.size, tile_y * tiles.size, tiles.size, tiles.size)):
-                    yield self.get(tile_x, tile_y, pos.z)
+        """Iterates over the tiles which a disc of the given radius at the given position might intersect. Each tile is
+        given together with the position relative to that tile."""
+        tile_center_x, sub_x = divmod(math.floor(pos.x), tiles.size)
+        tile_center_y, sub_y = divmod(math.floor(pos.y), tiles.size)
+        try:
+            stencil = self._stencils[(radius, sub_x, sub_y)]
+        except KeyError:
+            stencil = self._stencil(radius, sub_x, sub_y)
+            self._stencils[(radius, sub_x, sub_y)] = stencil
+        for offset_x, offset_y in stencil:
+            tile_x = tile_center_x + offset_x
+            tile_y = tile_center_y + offset_y
+            tile_pos = helpers.XYZPos(x=pos.x - tile_x * tiles.size, y=pos.y - tile_y * tiles.size, z=pos.z)
+            yield self.get(tile_x, tile_y, pos.z), tile_pos
+
+    # The stencils that have been computed so far. These don't depend on the map, so are shared between all maps.
+    _stencils = {}
 
     @staticmethod
-    def _shell(tile_center_x, tile_center_y, dist):
-        if dist == 0:
-            yield tile_center_x, tile_center_y
+    def _stencil(radius, sub_x, sub_y):
+        """The offsets of the tiles which a disc of the given radius might intersect, relative to the tile that its
+        center is in, if its center is somewhere in the pixel at (sub_x, sub_y) within that tile. Nearer tiles are given
+        first.
+
+        As this has to hold for every center within the pixel, this may include a few tiles that the disc doesn't
+        actually intersect. That's fine: the tiles' own collision checks will rule those out."""
+        reach = math.ceil((radius + 1) / tiles.size)
+        stencil = []
+        for offset_x in range(-reach, reach + 1):
+            # The distance between the pixel and the tile, horizontally
+            gap_x = max(0, offset_x * tiles.size - (sub_x + 1), sub_x - (offset_x + 1) * tiles.size)
+            for offset_y in range(-reach, reach + 1):
+                gap_y = max(0, offset_y * tiles.size - (sub_y + 1), sub_y - (offset_y + 1) * tiles.size)
+                if gap_x ** 2 + gap_y ** 2 <= radius ** 2:
+                    stencil.append((offset_x, offset_y))
+        stencil.sort(key=lambda offset: abs(offset[0]) + abs(offset[1]))
+        return tuple(stencil)
+
+    # Special values returned by get_many
+    _EMPTY = -1
+    _BOUNDARY = -2
+
+    def get_many(self, item_xs, item_ys, item_z):
+        """As get, but for arrays of positions all on the same z-level. Rather than returning tiles, this returns an
+        array of indices into the map's tiles; or the special values _EMPTY and _BOUNDARY where get would return an
+        Empty or Boundary tile respectively."""
+        try:
+            level = self._levels[item_z]
+        except KeyError:
+            tile_indices = np.full(np.shape(item_xs), self._EMPTY, dtype=int)
+        else:
+            tile_indices = level.get_many(item_xs, item_ys)  # Already uses -1 == _EMPTY
+        bounds = self._bounds
+        if item_z > bounds.max_z or item_z < bounds.min_z:
+            tile_indices[...] = self._BOUNDARY
         else:
-            for i in range(0, dist):
-                j = dist - i
-                yield tile_center_x + i, tile_center_y + j
-                yield tile_center_x - j, tile_center_y + i
-                yield tile_center_x - i, tile_center_y - j
-                yield tile_center_x + j, tile_center_y - i
+            out_of_map = (item_ys > bounds.max_y) | (item_ys < bounds.min_y) | (item_xs > bounds.max_x) | \
+                         (item_xs < bounds.min_x)
+            tile_indices[out_of_map] = self._BOUNDARY
+        return tile_indices
 
     def get(self, item_x, item_y, item_z):
+        level = self._levels.get(item_z)
+        if level is not None:
+            tile_index = level.get(item_x, item_y)
+            if tile_index is not None:
+                return self._tiles[tile_index]
+        bounds = self._bounds
+        if item_z > bounds.max_z or item_z < bounds.min_z \
+                or item_y > bounds.max_y or item_y < bounds.min_y \
+                or item_x > bounds.max_x or item_x < bounds.min_x:
+            return self._boundary_tile
+        else:
+            return self._empty_tile
+
+    def load_tiles(self, tile_types, tile_data, progress=None):
+        """Loads the specified map from the given tile data.
+
+        :[callable] tile_types: The constructors for the types of tile used in the map.
+        :dict tile_data: The tiles making up the map, of the form {z: {(x, y): index into tile_types}}.
+        :callable progress: Optional argument. Called every so often with how far through loading the map is, as a
+            fraction between 0 and 1."""
+
+        if config.USE_DISTANCE_FIELDS:
+            # Computing the distance fields takes most of the time.
+            self._load_levels(tile_types, tile_data, _progress_part(progress, 0, 0.1))
+            self._distance_fields.compute_all(_progress_part(progress, 0.1, 0.8))
+            self.pathfinder = pathfinding.Pathfinder(self, _progress_part(progress, 0.8, 1))
+        else:
+            self._load_levels(tile_types, tile_data, _progress_part(progress, 0, 0.3))
+            self.pathfinder = pathfinding.Pathfinder(self, _progress_part(progress, 0.3, 1))
+        if progress is not None:
+            progress(1)
+
+    def set(self, item_x, item_y, item_z, tile_index):
+        """Changes the tile at the specified location to be of the type with the given index (into the tile types the
+        map was loaded with), or to be no tile at all if the index is None."""
+
         try:
-            return self._tile_data[item_z][(item_x, item_y)]
+            level = self._levels[item_z]
         except KeyError:
-            if item_z > self._max_z or item_z < self._min_z \
-                    or item_y > self._max_y or item_y < self._min_y \
-                    or item_x > self._max_x or item_x < self._min_x:
-                return tiles.Boundary(pos=helpers.XYZPos(x=item_x, y=item_y, z=item_z))
+            if tile_index is None:
+                return
+            level = Level(item_z, {(item_x, item_y): tile_index})
+            self._levels[item_z] = level
+        else:
+            level.set(item_x, item_y, tile_index)
+        bounds_changed = self._update_bounds()
+
+        screen_key = (item_z, item_x // self._screen_cells(), item_y // self._screen_cells())
+        screen = self._screens.pop(screen_key, None)
+        if screen is not None:
+            self._screens_memory -= self._screen_memory(screen)
+        if self._distance_fields is not None:
+            if bounds_changed:
+                # Every field covers the whole extent of the map, so they're all out of date.
+                self._distance_fields.clear()
             else:
-                return tiles.Empty(pos=helpers.XYZPos(x=item_x, y=item_y, z=item_z))
+                self._distance_fields.tiles_changed(item_x, item_y, item_z)
+        if self.pathfinder is not None:
+            self.pathfinder.tiles_changed(item_x, item_y, item_z)
 
-    def load_tiles(self, tile_data):
-        """Loads the specified map from the given tile data."""
+    def _load_levels(self, tile_types, tile_data, progress=None):
+        """Stores the given tile data. Pulled out as a separate function so that it may be benchmarked separately from
+        the rest of loading the map."""
 
-        self._tile_data = tile_data
+        self._tiles = [tile_type() for tile_type in tile_types]
+        self._levels = {}
+        self._screens = collections.OrderedDict()
+        self._screens_memory = 0
         self.initialised = True
-        self.screens = {}
-        self._max_z = -math.inf
-        self._max_y = -math.inf
-        self._max_x = -math.inf
-        self._min_z = math.inf
-        self._min_y = math.inf
-        self._min_x = math.inf
         for z, z_level in tile_data.items():
-            self._max_z = max(z, self._max_z)
-            self._min_z = min(z, self._min_z)
-            level_max_x = -math.inf
-            level_max_y = -math.inf
-            level_min_x = math.inf
-            level_min_y = math.inf
-            for x, y in z_level.keys():
-                level_max_x = max(x, level_max_x)
-                level_max_y = max(y, level_max_y)
-                level_min_x = min(x, level_min_x)
-                level_min_y = min(y, level_min_y)
-            self._max_x = max(level_max_x, self._max_x)
-            self._min_x = min(level_min_x, self._min_x)
-            self._max_y = max(level_max_y, self._max_y)
-            self._min_y = min(level_min_y, self._min_y)
-            width = level_max_x - level_min_x + 1
-            height = level_max_y - level_min_y + 1
-            surf = sdl.Surface((width * tiles.size, height * tiles.size))
-            surf.set_offset((level_min_x * tiles.size, level_min_y * tiles.size))
-            surf.fill(self._background_color)
-            self.screens[z] = surf
-
-        for tile in self:
-            self.screens[tile.z].blit_offset(tile.appearance, (tile.x * tiles.size, tile.y * tiles.size))
-        
+            self._levels[z] = Level(z, z_level)
+            if progress is not None:
+                progress(len(self._levels) / len(tile_data))
+        self._update_bounds()
+        self._distance_fields = distance_fields.DistanceFields(self) if config.USE_DISTANCE_FIELDS else None
+
+    @staticmethod
+    def _screen_cells():
+        """How many cells wide and high each of the pieces that the visual depiction of the map is split into is."""
+        return max(1, config.MAP_SCREEN_TILE_SIZE // tiles.size)
+
+    def screens(self, z, left, top, width, height):
+        """Iterates over the visual depictions of those pieces of the given z-level which intersect the given rectangle
+        (in pixels). Each is a Surface offset to where it should be drawn. Pieces with nothing in them are skipped.
+
+        Each piece is drawn the first time it is needed, unless it has already been drawn in advance via prefetch. Drawn
+        pieces are kept until they use more than config.MAP_SCREEN_MEMORY_BUDGET, at which point the least recently
+        used ones are forgotten."""
+
+        try:
+            level = self._levels[z]
+        except KeyError:
+            return
+        stalled = False
+        for key in self._screen_keys(z, left, top, width, height):
+            if key in self._screens:
+                screen = self._screen(level, key)
+            else:
+                start_time = time.perf_counter()
+                screen = self._screen(level, key)
+                if screen is not None:
+                    stalled = True
+                    self.screen_stall_time += time.perf_counter() - start_time
+            if screen is not None:
+                yield screen
+        if stalled:
+            self.screen_stalls += 1
+
+    def prefetch(self, z, left, top, width, height, deadline):
+        """Draws those pieces of the given z-level which intersect the given rectangle (in pixels) and which haven't
+        been drawn yet, so that they are ready for when they are needed. Stops once time.perf_counter() passes the given
+        deadline. Returns whether every piece got drawn."""
+
+        try:
+            level = self._levels[z]
+        except KeyError:
+            return True
+        for key in self._screen_keys(z, left, top, width, height):
+            if key not in self._screens:
+                if time.perf_counter() >= deadline:
+                    return False
+                self._screen(level, key)
+        return True
+
+    def nearby_levels(self, entity):
+        """The z-levels that the given entity might be about to move to: the one below it if it is falling, and those
+        that can be reached from stairs within internal.prefetch_stair_distance tiles of it."""
+
+        levels = set()
+        if self.fall(entity):
+            levels.add(entity.z - 1)
+        try:
+            level = self._levels[entity.z]
+        except KeyError:
+            return levels
+        reach = internal.prefetch_stair_distance
+        for _, _, tile_index in level.iter_region(entity.tile_x - reach, entity.tile_y - reach, 2 * reach + 1,
+                                                  2 * reach + 1):
+            tile = self._tiles[tile_index]
+            if tile.suspend_up:
+                levels.add(entity.z + 1)
+            if tile.suspend_down:
+                levels.add(entity.z - 1)
+        return levels
+
+    def _screen_keys(self, z, left, top, width, height):
+        """The keys of those pieces of the given z-level which intersect the given rectangle (in pixels)."""
+        screen_length = self._screen_cells() * tiles.size
+        for screen_x in range(math.floor(left / screen_length), math.floor((left + width) / screen_length) + 1):
+            for screen_y in range(math.floor(top / screen_length), math.floor((top + height) / screen_length) + 1):
+                yield z, screen_x, screen_y
+
+    def _screen(self, level, key):
+        """The visual depiction of the piece with the given key, drawing it if it hasn't been already. Returns None if
+        there is nothing in that piece."""
+
+        try:
+            screen = self._screens[key]
+        except KeyError:
+            _, screen_x, screen_y = key
+            screen_cells = self._screen_cells()
+            cells = list(level.iter_region(screen_x * screen_cells, screen_y * screen_cells, screen_cells,
+                                           screen_cells))
+            if not cells:
+                return None  # Nothing to draw
+            screen = self._render_screen(screen_x, screen_y, cells)
+            self._screens[key] = screen
+            self._screens_memory += self._screen_memory(screen)
+            self._evict_screens()
+        else:
+            self._screens.move_to_end(key)
+        return screen
+
+    def _render_screen(self, screen_x, screen_y, cells):
+        """Creates the visual depiction of a piece of the map, given the (x, y, tile index) of the cells in it."""
+        screen_cells = self._screen_cells()
+        screen_length = screen_cells * tiles.size
+        surf = sdl.Surface((screen_length, screen_length))
+        surf.set_offset((screen_x * screen_length, screen_y * screen_length))
+        surf.fill(self._background_color)
+        for x, y, tile_index in cells:
+            surf.blit(self._tiles[tile_index].appearance,
+                      ((x - screen_x * screen_cells) * tiles.size, (y - screen_y * screen_cells) * tiles.size))
+        return surf
+
+    @staticmethod
+    def _screen_memory(screen):
+        """How much memory (in bytes) a Surface uses."""
+        return screen.get_bytesize() * screen.get_width() * screen.get_height()
+
+    def _evict_screens(self):
+        """Forgets the least recently used drawn pieces until they are within the memory budget. (Always keeping the
+        most recently used one, though.)"""
+        while self._screens_memory > config.MAP_SCREEN_MEMORY_BUDGET and len(self._screens) > 1:
+            _, screen = self._screens.popitem(last=False)
+            self._screens_memory -= self._screen_memory(screen)
+
     def fall(self, entity):
         """Whether or not a flightless entity will fall through the specified position.
         
@@ -131,13 +481,88 @@ class Map:
         return True
 
     def wall_collide(self, entity, pos):
-        return any(tile.wall_collide(entity, pos) for tile in self.local(entity.radius, pos))
+        return self._collide('wall_collide', entity, pos)
 
     def floor_collide(self, entity, pos):
-        return any(tile.floor_collide(entity, pos) for tile in self.local(entity.radius, pos))
+        return self._collide('floor_collide', entity, pos)
 
     def suspend_collide(self, entity, pos):
-        return any(tile.suspend_collide(entity, pos) for tile in self.local(entity.radius, pos))
+        return self._collide('suspend_collide', entity, pos)
+
+    def _collide(self, collide_name, entity, pos):
+        if self._distance_fields is not None:
+            return self._distance_fields.collide(collide_name, entity, pos)
+        return self.tile_collide(collide_name, entity, pos)
+
+    def tile_collide(self, collide_name, entity, pos):
+        """Tests for a collision exactly, by calling the tile method with the given name on every tile the entity might
+        intersect."""
+        radius = entity.radius
+        for tile, tile_pos in self.local(radius, pos):
+            # Empty and boundary tiles are most of what's around, and are simple enough to handle here directly.
+            if tile is self._empty_tile:
+                continue
+            elif tile is self._boundary_tile:
+                if collide_name == 'wall_collide':
+                    dist_x = max(-tile_pos.x, 0, tile_pos.x - tiles.size)
+                    dist_y = max(-tile_pos.y, 0, tile_pos.y - tiles.size)
+                    if dist_x ** 2 + dist_y ** 2 < radius ** 2:
+                        return True
+            elif getattr(tile, collide_name)(entity, tile_pos):
+                return True
+        return False
+
+    def wall_collide_many(self, radii, xs, ys, z, incorporeal=False):
+        """As wall_collide, but for many entities on the same z-level at once. The entities are described by arrays of
+        their radii and positions, and optionally whether they are incorporeal. Returns a boolean array."""
+        return self._collide_many('wall_collide_many', radii, xs, ys, z, incorporeal)
+
+    def floor_collide_many(self, radii, xs, ys, z, incorporeal=False):
+        """As floor_collide, but for many entities at once, in the same way as wall_collide_many."""
+        return self._collide_many('floor_collide_many', radii, xs, ys, z, incorporeal)
+
+    def suspend_collide_many(self, radii, xs, ys, z, incorporeal=False):
+        """As suspend_collide, but for many entities at once, in the same way as wall_collide_many."""
+        return self._collide_many('suspend_collide_many', radii, xs, ys, z, incorporeal)
+
+    def _collide_many(self, collide_name, radii, xs, ys, z, incorporeal):
+        """Tests the entities against every tile they might intersect, by calling the tile method with the given name
+        on all of the entities next to tiles of each type at once."""
+        radii, xs, ys, incorporeal = np.broadcast_arrays(np.asarray(radii, dtype=float), np.asarray(xs, dtype=float),
+                                                         np.asarray(ys, dtype=float),
+                                                         np.asarray(incorporeal, dtype=bool))
+        collide = np.zeros(xs.shape, dtype=bool)
+        if xs.size == 0:
+            return collide
+        tile_center_xs = np.floor(xs / tiles.size).astype(int)
+        tile_center_ys = np.floor(ys / tiles.size).astype(int)
+        reach = math.ceil(radii.max() / tiles.size)
+        for offset_x in range(-reach, reach + 1):
+            for offset_y in range(-reach, reach + 1):
+                tile_xs = tile_center_xs + offset_x
+                tile_ys = tile_center_ys + offset_y
+                tile_indices = self.get_many(tile_xs, tile_ys, z)
+                tile_pos_xs = xs - tile_xs * tiles.size
+                tile_pos_ys = ys - tile_ys * tiles.size
+                for tile_index in np.unique(tile_indices):
+                    if tile_index == self._EMPTY:
+                        continue  # Never collides with anything
+                    # No need to test those entities that we already know collide
+                    which = (tile_indices == tile_index) & np.logical_not(collide)
+                    if which.any():
+                        tile = self._tile_from_index(tile_index)
+                        collide[which] = getattr(tile, collide_name)(radii[which], tile_pos_xs[which],
+                                                                     tile_pos_ys[which], incorporeal[which])
+        return collide
+
+    def _tile_from_index(self, tile_index):
+        """The tile corresponding to an index returned by get_many."""
+        if tile_index == self._EMPTY:
+            return self._empty_tile
+        elif tile_index == self._BOUNDARY:
+            return self._boundary_tile
+        else:
+            return self._tiles[tile_index]
 
 
 class Menus:
@@ -147,11 +572,16 @@ class Menus:
 
         # Shortcut for convenience
         self.menu_overlay = interface.overlays.menu
+        # Called every frame whilst the current menu is displayed, if not None. May return a menu to go to.
+        self._menu_poll = None
+        self._map_loader = None  # Loads the map selected in the map select menu
+        self._map_load_failed = False  # Whether the map selected in the map select menu couldn't be loaded
         super(Menus, self).__init__(**kwargs)
 
     def start_menu(self, game_objects):
         menus = {internal.MenuIdentifiers.MAIN_MENU: self._main_menu,
                  internal.MenuIdentifiers.MAP_SELECT: self._map_select,
+                 internal.MenuIdentifiers.LOADING: self._loading,
                  internal.MenuIdentifiers.OPTIONS: self._options}
         game_start_menu = {internal.MenuIdentifiers.GAME_START}
         self._menu(menus, game_start_menu, game_objects)
@@ -166,11 +596,16 @@ class Menus:
                 if old_menu != current_menu:
                     old_menu = current_menu
                     self.interface.reset('menu')
+                    self._menu_poll = None
                     menus[current_menu](game_objects)  # Set up the current menu
                     self.interface.flush()
                 while True:  # Wait for input from this menu
                     self.clock.tick(config.RENDER_FRAMERATE)
                     inputs = self.interface.inp()
+                    if self._menu_poll is not None:
+                        polled_menu = self._menu_poll()
+                        if polled_menu is not None:
+                            inputs.append((polled_menu, internal.InputTypes.MENU))
                     self.interface.flush()
                     if inputs:
                         if len([c_m for c_m, input_type in inputs if input_type != internal.InputTypes.MENU]):
@@ -204,46 +639,158 @@ class Menus:
 
     def _map_select(self, game_objects):
         """Displays the menu to select a map."""
-        map_names = maps.map_names()
+        map_infos = maps.catalogue.update(tiles.all_tiles())
+        map_names = [map_info.name for map_info in map_infos]
+        # Maps that can't be loaded are grayed out.
+        unloadable = [i for i, map_info in enumerate(map_infos) if not map_info.valid]
 
-        menu_list = self.menu_overlay.list(title=strings.MapSelectMenu.TITLE, entry_text=map_names, necessary=True)
+        menu_list = self.menu_overlay.list(title=strings.MapSelectMenu.TITLE, entry_text=map_names, disabled=unloadable,
+                                           necessary=True)
 
         game_start_button = self.menu_overlay.submit(strings.MapSelectMenu.SELECT_MAP)
         def game_start_button_press(menu_results, pos):
-            menu_to_go_to = internal.MenuIdentifiers.GAME_START
             selected_index = menu_results[menu_list]
             map_name = map_names[selected_index]
-            try:
-                map_name, tile_data, start_pos = maps.get_map_data_from_map_name(map_name, tiles.all_tiles())
-            except exceptions.MapLoadException:
-                bad_map_message = self.menu_overlay.messagebox(strings.FileLoading.BAD_LOAD_TITLE,
-                                                               strings.FileLoading.BAD_LOAD_MESSAGE,
-                                                               select=True)
-                close_messagebox = lambda *args, **kwargs: (self.menu_overlay.remove(bad_map_message), False)
-                bad_map_message.on_mouseup_button(strings.Menus.OK, close_messagebox)
-                bad_map_message.on_un_mousedown(close_messagebox)
-                self.menu_overlay.screen.update_cutouts()
-                self.interface.flush()
-                menu_to_go_to = internal.MenuIdentifiers.MAP_SELECT
-            else:
-                game_objects.map.load_tiles(tile_data)
-                # + 0.5 to move the player to center of the tile
-                game_objects.player.pos = helpers.XYZPos(x=(start_pos.x + 0.5) * tiles.size,
-                                                         y=(start_pos.y + 0.5) * tiles.size,
-                                                         z=start_pos.z)
-            return menu_to_go_to, False
+            self._map_loader = game_objects.map_loader(map_name, self.interface.screen_size.size)
+            self._map_loader.start()
+            return internal.MenuIdentifiers.LOADING, False
         game_start_button.on_submit(game_start_button_press)
 
         main_menu_button = self.menu_overlay.back(strings.MapSelectMenu.MAIN_MENU)
         main_menu_button.on_back(lambda menu_results, pos:
                                  (internal.MenuIdentifiers.MAIN_MENU, False))
 
+        if self._map_load_failed:
+            self._map_load_failed = False
+            bad_map_message = self.menu_overlay.messagebox(strings.FileLoading.BAD_LOAD_TITLE,
+                                                           strings.FileLoading.BAD_LOAD_MESSAGE,
+                                                           select=True)
+            close_messagebox = lambda *args, **kwargs: (self.menu_overlay.remove(bad_map_message), False)
+            bad_map_message.on_mouseup_button(strings.Menus.OK, close_messagebox)
+            bad_map_message.on_un_mousedown(close_messagebox)
+
+    def _loading(self, game_objects):
+        """Displays how far through loading the selected map is, whilst it loads in the background."""
+        map_loader = self._map_loader
+        stage_names = {internal.MapLoadStages.READ: strings.LoadingMenu.READ,
+                       internal.MapLoadStages.PARSE: strings.LoadingMenu.PARSE,
+                       internal.MapLoadStages.BUILD: strings.LoadingMenu.BUILD,
+                       internal.MapLoadStages.RENDER: strings.LoadingMenu.RENDER}
+        progress_button = self.menu_overlay.button(strings.LoadingMenu.PROGRESS.format(stage=strings.LoadingMenu.READ,
+                                                                                       percent=0))
+        render_stage_shown = False
+
+        def poll():
+            nonlocal render_stage_shown
+            last_event = None
+            for last_event in map_loader.progress_events():
+                pass
+            if map_loader.done and not render_stage_shown:
+                # The drawing happens in 'finish', on this (the main) thread, so show that it has begun first.
+                last_event = internal.MapLoadStages.RENDER, 0
+                render_stage_shown = True
+            if last_event is not None:
+                stage, stage_progress = last_event
+                progress_button.set_text(strings.LoadingMenu.PROGRESS.format(stage=stage_names[stage],
+                                                                             percent=100 * stage_progress))
+            elif map_loader.done:
+                try:
+                    map_loader.finish(game_objects)
+                except exceptions.MapLoadException:
+                    self._map_load_failed = True
+                    return internal.MenuIdentifiers.MAP_SELECT
+                return internal.MenuIdentifiers.GAME_START
+            return None
+        self._menu_poll = poll
+
+        def cancel(menu_results, pos):
+            map_loader.cancel()
+            return internal.MenuIdentifiers.MAP_SELECT, False
+        cancel_button = self.menu_overlay.back(strings.LoadingMenu.CANCEL)
+        cancel_button.on_back(cancel)
+
     def _options(self, game_objects):
         main_menu_button = self.menu_overlay.back(strings.MapSelectMenu.MAIN_MENU)
         main_menu_button.on_back(lambda menu_results, pos:
                                  (internal.MenuIdentifiers.MAIN_MENU, False))
 
 
+class HeadlessClock:
+    """Used in place of sdl.time.Clock when running without a display. Rather than waiting for (and then measuring) real
+    time, it claims that exactly one physics tick's worth of time passes every frame. So the game runs one tick per
+    frame, as fast as it can, and runs the same way every time."""
+
+    def tick(self, framerate=0):
+        return 1000 / config.PHYSICS_FRAMERATE
+
+
+class TickScheduler:
+    """Decides how many physics ticks to run each frame, and keeps statistics on how well it is keeping up.
+
+    Normally just enough ticks are run to keep up with real time. But if the game falls behind (e.g. after a slow
+    frame) then trying to catch up completely can make things worse, as the extra ticks take time themselves, and so
+    put it further behind still. So at most config.MAX_TICKS_PER_FRAME ticks are run per frame, taking no more than
+    config.PHYSICS_TIME_BUDGET milliseconds, and any further ticks are dropped: the game slows down rather than
+    freezing."""
+
+    def __init__(self):
+        self.physics_framelength = 1000 / config.PHYSICS_FRAMERATE
+        self.render_framelength = 1000 / config.RENDER_FRAMERATE
+        # How far (in milliseconds) the simulation is behind real time. Always less than one tick once ticks have run.
+        self.accumulator = 0
+        self.frames = 0
+        self.ticks = 0
+        self.dropped_ticks = 0  # Ticks that weren't run, to avoid falling further behind
+        self.late_frames = 0  # Frames that took longer than they should have
+        self.tick_times = collections.deque(maxlen=internal.tick_time_samples)  # How long recent ticks took, in ms
+
+    def run_ticks(self, step):
+        """Runs as many ticks (each by calling 'step') as are needed to catch up with real time, within the limits
+        described above."""
+
+        start_time = time.perf_counter()
+        ticks_run = 0
+        while self.accumulator >= self.physics_framelength:
+            out_of_time = (time.perf_counter() - start_time) * 1000 >= config.PHYSICS_TIME_BUDGET
+            if ticks_run >= config.MAX_TICKS_PER_FRAME or (ticks_run > 0 and out_of_time):
+                dropped_ticks = math.floor(self.accumulator / self.physics_framelength)
+                self.dropped_ticks += dropped_ticks
+                self.accumulator -= dropped_ticks * self.physics_framelength
+                break
+            tick_start_time = time.perf_counter()
+            step()
+            self.tick_times.append((time.perf_counter() - tick_start_time) * 1000)
+            self.accumulator -= self.physics_framelength
+            ticks_run += 1
+        self.ticks += ticks_run
+
+    def frame(self, elapsed):
+        """Should be called once per frame, with how long (in milliseconds) it has been since the previous frame, before
+        running that frame's ticks."""
+        self.frames += 1
+        if elapsed > self.render_framelength + internal.late_frame_margin:
+            self.late_frames += 1
+        self.accumulator += elapsed
+
+    @property
+    def alpha(self):
+        """How far real time is past the most recent tick, as a fraction of a tick between 0 and 1. Only meaningful
+        once 'run_ticks' has caught up with the time passed to 'frame'."""
+        return self.accumulator / self.physics_framelength
+
+    def tick_time_percentile(self, percentile):
+        """The given percentile of how long (in milliseconds) recent ticks took, or None if no ticks have been run."""
+        if not self.tick_times:
+            return None
+        tick_times = sorted(self.tick_times)
+        return tick_times[max(0, math.ceil(percentile / 100 * len(tick_times)) - 1)]
+
+
+# Everything that the result of a tick depends on, besides the map and its inputs. See Simulation.snapshot.
+SimulationState = collections.namedtuple('SimulationState', ('player_pos', 'fall_counter', 'speedmult', 'flight',
+                                                             'incorporeal', 'camera_offset', 'abs_move_command'))
+
+
 class Simulation:
     def __init__(self, game_objects, interface, clock, **kwargs):
         self.game_objects = game_objects
@@ -252,26 +799,84 @@ class Simulation:
 
         self._abs_move_command = None
         self._camera_offset = None
+        # What was drawn last frame; used to tell when only the player needs redrawing.
+        self._last_camera_topleft = None
+        self._last_screens = None
+        self._last_player_rect = None
+        # The player's position and the camera offset before the most recent tick; used for interpolation.
+        self._previous_player_pos = None
+        self._previous_camera_offset = None
+        self.scheduler = None  # Decides how many ticks to run each frame
+        self.recorder = None  # If set, records the inputs of every tick; see recording.py
         super(Simulation, self).__init__(**kwargs)
 
     def reset(self):
         self._abs_move_command = None
         self._camera_offset = tools.Object(x=0, y=0)
+        self._last_camera_topleft = None
+        self._last_screens = None
+        self._last_player_rect = None
+        self._previous_player_pos = None
+        self._previous_camera_offset = None
+        self.scheduler = TickScheduler()
 
-    def run(self):
-        """The main game loop."""
+    def run(self, frames=None):
+        """The main game loop. Runs forever, or for the given number of frames if 'frames' is passed."""
         with self.interface.use('game'):
-            accumulator = 0
-            physics_framelength = 1000 / config.PHYSICS_FRAMERATE
             self.clock.tick(config.RENDER_FRAMERATE)
             self._render()
-            while True:
-                while accumulator >= 0:
-                    inputs = self.interface.inp()
-                    self._tick(inputs)
-                    accumulator -= physics_framelength
-                accumulator += self.clock.tick(config.RENDER_FRAMERATE)
-                self._render()
+            while frames is None or self.scheduler.frames < frames:
+                self.scheduler.frame(self.clock.tick(config.RENDER_FRAMERATE))
+                self.scheduler.run_ticks(self._step)
+                self._render(self.scheduler.alpha)
+                self._prefetch()
+
+    def _step(self):
+        """Gets the input for, and runs, a single tick."""
+        inputs = self.interface.inp()
+        if self.recorder is not None:
+            self.recorder.record(self, inputs)
+        self._record_previous_state()
+        self._tick(inputs)
+
+    def snapshot(self):
+        """The current state of the simulation, as a SimulationState. Running the same ticks after restoring it gives
+        exactly the same results as running them now."""
+        player = self.game_objects.player
+        if self._abs_move_command is None:
+            abs_move_command = None
+        else:
+            abs_move_command = tuple(self._abs_move_command)
+        return SimulationState(player_pos=helpers.XYZPos(x=player.x, y=player.y, z=player.z),
+                               fall_counter=player.fall_counter,
+                               speedmult=player.speedmult,
+                               flight=bool(player.flight),
+                               incorporeal=bool(player.incorporeal),
+                               camera_offset=helpers.XYPos(x=self._camera_offset.x, y=self._camera_offset.y),
+                               abs_move_command=abs_move_command)
+
+    def restore(self, state):
+        """Restores the simulation to the given SimulationState, as returned by 'snapshot'."""
+        player = self.game_objects.player
+        player.pos = state.player_pos
+        player.fall_counter = state.fall_counter
+        self.restore_settings(state)
+        self.game_objects.entities.update(player)
+        self._camera_offset = tools.Object(x=state.camera_offset.x, y=state.camera_offset.y)
+        if state.abs_move_command is None:
+            self._abs_move_command = None
+        else:
+            self._abs_move_command = collections.deque(state.abs_move_command)
+        self._previous_player_pos = None
+        self._previous_camera_offset = None
+
+    def restore_settings(self, state):
+        """Restores just those parts of the given SimulationState which are only ever changed by console commands, not
+        by ticks."""
+        player = self.game_objects.player
+        player.speedmult = state.speedmult
+        player.flight = state.flight
+        player.incorporeal = state.incorporeal
 
     def _tick(self, inputs):
         """A single tick of the game."""
@@ -289,8 +894,9 @@ class Simulation:
             if not self.game_objects.map.fall(self.game_objects.player):
                 if input_type == internal.InputTypes.MOVE_ABS:
                     # play_inp is relative to the camera, so here we convert it to absolute coordinates.
-                    self._abs_move_command = helpers.XYPos(x=play_inp.x + self._camera_topleft.x,
-                                                           y=play_inp.y + self._camera_topleft.y)
+                    target = helpers.XYPos(x=play_inp.x + self._camera_topleft.x,
+                                           y=play_inp.y + self._camera_topleft.y)
+                    self._abs_move_command = self._waypoints(target, self.game_objects.player)
                 elif input_type == internal.InputTypes.ACTION:
                     self._abs_move_command = None
                     self._action_entity(play_inp, self.game_objects.player)
@@ -302,16 +908,72 @@ class Simulation:
         if self._abs_move_command is not None:
             self._move_entity_abs(self._abs_move_command, self.game_objects.player)
 
-    def _render(self):
-        """Outputs the current game state."""
-        self.interface.reset('game')
-        self.interface.out('game', self.game_objects.map.screens[self.game_objects.player.z],
-                           offset=self._camera_topleft)
-        self.interface.out('game', self.game_objects.player.appearance, (self.game_objects.player.topleft_x,
-                                                                         self.game_objects.player.topleft_y),
-                           offset=self._camera_topleft)
+    def _record_previous_state(self):
+        """Records what is needed to interpolate between the state before the next tick and the state after it."""
+        player = self.game_objects.player
+        self._previous_player_pos = helpers.XYZPos(x=player.x, y=player.y, z=player.z)
+        self._previous_camera_offset = helpers.XYPos(x=self._camera_offset.x, y=self._camera_offset.y)
+
+    def _interpolation_shift(self, alpha):
+        """How far the player and the camera should be drawn from where they currently are, to show them the given
+        fraction of the way from where they were before the most recent tick to where they are now. Returns a pair of
+        XYPos: one for the player, one for the camera."""
+
+        player = self.game_objects.player
+        previous_player_pos = self._previous_player_pos
+        no_shift = helpers.XYPos(x=0, y=0)
+        if (not config.RENDER_INTERPOLATION or previous_player_pos is None or alpha == 1
+                or previous_player_pos.z != player.z):  # Don't slide between z-levels
+            return no_shift, no_shift
+        player_shift = helpers.XYPos(x=(1 - alpha) * (previous_player_pos.x - player.x),
+                                     y=(1 - alpha) * (previous_player_pos.y - player.y))
+        camera_shift = helpers.XYPos(x=player_shift.x + (1 - alpha) * (self._previous_camera_offset.x -
+                                                                       self._camera_offset.x),
+                                     y=player_shift.y + (1 - alpha) * (self._previous_camera_offset.y -
+                                                                       self._camera_offset.y))
+        return player_shift, camera_shift
+
+    def _render(self, alpha=1):
+        """Outputs the current game state. If config.RENDER_INTERPOLATION is True then the player and camera are drawn
+        the given fraction 'alpha' of the way from where they were before the most recent tick to where they are now."""
+        player = self.game_objects.player
+        player_shift, camera_shift = self._interpolation_shift(alpha)
+        camera_topleft = self._camera_topleft
+        camera_topleft = helpers.XYPos(x=camera_topleft.x + camera_shift.x, y=camera_topleft.y + camera_shift.y)
+        screens = list(self.game_objects.map.screens(player.z, camera_topleft.x, camera_topleft.y,
+                                                     self.interface.screen_size.width,
+                                                     self.interface.screen_size.height))
+        if (config.DIRTY_RECT_RENDERING and self._last_player_rect is not None
+                and camera_topleft == self._last_camera_topleft and screens == self._last_screens):
+            # The map looks the same as last frame, so just paint over where the player was.
+            game_overlay = self.interface.overlays.game
+            with game_overlay.clip(self._last_player_rect):
+                game_overlay.wipe(self._last_player_rect)
+                for screen in screens:
+                    self.interface.out('game', screen, offset=camera_topleft)
+        else:
+            self.interface.reset('game')
+            for screen in screens:
+                self.interface.out('game', screen, offset=camera_topleft)
+        self._last_player_rect = self.interface.out('game', player.appearance,
+                                                    (player.topleft_x + player_shift.x,
+                                                     player.topleft_y + player_shift.y),
+                                                    offset=camera_topleft)
+        self._last_camera_topleft = camera_topleft
+        self._last_screens = screens
         self.interface.flush()
 
+    def _prefetch(self):
+        """Spends a little time drawing the z-levels that the player might be about to move to, so that the frame in
+        which they do so doesn't have to wait for them to be drawn."""
+        deadline = time.perf_counter() + config.MAP_PREFETCH_BUDGET / 1000
+        camera_topleft = self._camera_topleft
+        for z in self.game_objects.map.nearby_levels(self.game_objects.player):
+            if not self.game_objects.map.prefetch(z, camera_topleft.x, camera_topleft.y,
+                                                  self.interface.screen_size.width,
+                                                  self.interface.screen_size.height, deadline):
+                break
+
     @property
     def _camera_topleft(self):
         x = self.game_objects.player.x + self._camera_offset.x - self.interface.screen_size.width / 2
@@ -356,6 +1018,7 @@ class Simulation:
                     self.game_objects.map.floor_collide(entity, entity.pos):
                 return
         entity.z += direction
+        self.game_objects.entities.update(entity)
 
     def _move_entity_rel(self, action, entity):
         horz_actions = {internal.Move.LEFT: helpers.XYPos(x=-1, y=0),
@@ -365,37 +1028,252 @@ class Simulation:
         direction = horz_actions[action]
         self._move_entity(direction, entity)
 
-    def _move_entity_abs(self, pos, entity):
-        direction = helpers.XYPos(x=pos.x - entity.x, y=pos.y - entity.y)
-        if direction.x ** 2 + direction.y ** 2 < internal.move_tolerance:
-            self._abs_move_command = None
+    def _waypoints(self, target, entity):
+        """The positions that the entity should move through to get to the given target position on its z-level: the
+        centers of the tiles along a path through the map, if one can be found, and then the target itself."""
+        waypoints = collections.deque()
+        pathfinder = self.game_objects.map.pathfinder
+        if pathfinder is not None:
+            goal = helpers.XYZPos(x=math.floor(target.x / tiles.size), y=math.floor(target.y / tiles.size),
+                                  z=entity.z)
+            path = pathfinder.path(entity.tile_pos, goal)
+            if path is not None and len(path) > 1:
+                # No need to go via the center of the tile we're already in, unless we're about to change z-level
+                # there: there's not necessarily room to do that from anywhere in the tile.
+                start = 0 if path[1][2] != path[0][2] else 1
+                for x, y, z in path[start:-1]:
+                    waypoints.append(helpers.XYZPos(x=(x + 0.5) * tiles.size, y=(y + 0.5) * tiles.size, z=z))
+        waypoints.append(helpers.XYZPos(x=target.x, y=target.y, z=entity.z))
+        return waypoints
+
+    def _move_entity_abs(self, waypoints, entity):
+        waypoint = waypoints[0]
+        if waypoint.z != entity.z:
+            if waypoint.z > entity.z:
+                self._move_entity_vert(internal.Action.VERTICAL_UP, entity)
+            else:
+                self._move_entity_vert(internal.Action.VERTICAL_DOWN, entity)
+            if waypoint.z != entity.z:
+                # Couldn't move vertically
+                self._abs_move_command = None
+            return
+        direction = helpers.XYPos(x=waypoint.x - entity.x, y=waypoint.y - entity.y)
+        distance_squared = direction.x ** 2 + direction.y ** 2
+        if distance_squared < internal.move_tolerance:
+            waypoints.popleft()
+            if not waypoints:
+                self._abs_move_command = None
         else:
-            self._move_entity(direction, entity)
+            self._move_entity(direction, entity, max_distance=math.sqrt(distance_squared))
 
-    def _move_entity(self, direction, entity):
-        scaling = entity.speed / math.sqrt(direction.x ** 2 + direction.y ** 2)
+    def _move_entity(self, direction, entity, max_distance=math.inf):
+        """Moves the entity in the given direction, by as far as its speed allows (or by max_distance, if that's
+        less). If it runs into a wall on the way then it stops there, and then slides along the wall for however much of
+        the move is left."""
+        scaling = min(entity.speed, max_distance) / math.sqrt(direction.x ** 2 + direction.y ** 2)
         move_x = direction.x * scaling
         move_y = direction.y * scaling
-        new_entity_pos = helpers.XYZPos(x=entity.x + move_x, y=entity.y + move_y, z=entity.z)
-        if self.game_objects.map.wall_collide(entity, new_entity_pos):
+        pos = helpers.XYZPos(x=entity.x, y=entity.y, z=entity.z)
+        if self.game_objects.map.wall_collide(entity, pos):
+            # Already stuck in a wall (e.g. from having been incorporeal), so there's no sweeping through free space to
+            # do: only allow moves that get us out of it.
+            new_entity_pos = helpers.XYZPos(x=entity.x + move_x, y=entity.y + move_y, z=entity.z)
+            if not self.game_objects.map.wall_collide(entity, new_entity_pos):
+                pos = new_entity_pos
+        else:
+            for _ in range(internal.max_slides + 1):
+                fraction = self._sweep(entity, pos, move_x, move_y)
+                pos = helpers.XYZPos(x=pos.x + fraction * move_x, y=pos.y + fraction * move_y, z=pos.z)
+                if fraction == 1:
+                    break
+                normal = self._contact_normal(entity, pos)
+                if normal is None:
+                    break
+                # Slide: keep just the part of the rest of the move that's along the wall.
+                move_x *= 1 - fraction
+                move_y *= 1 - fraction
+                into_wall = move_x * normal.x + move_y * normal.y
+                if into_wall < 0:
+                    move_x -= into_wall * normal.x
+                    move_y -= into_wall * normal.y
+                if move_x ** 2 + move_y ** 2 < internal.contact_tolerance ** 2:
+                    break
+
+        moved_x = pos.x - entity.x
+        moved_y = pos.y - entity.y
+        if moved_x ** 2 + moved_y ** 2 < internal.contact_tolerance ** 2:
+            # Stuck
             self._abs_move_command = None
         else:
-            entity.x = new_entity_pos.x
-            entity.y = new_entity_pos.y
+            entity.x = pos.x
+            entity.y = pos.y
+            self.game_objects.entities.update(entity)
 
             if entity is self.game_objects.player:
-                self._move_camera_offset(-1 * move_x, -1 * move_y)
+                self._move_camera_offset(-1 * moved_x, -1 * moved_y)
+
+    def _sweep(self, entity, pos, move_x, move_y):
+        """How far the entity can move from the given position along the given move before running into a wall, as a
+        fraction of the move.
+
+        The entity is tested at points along the move no further apart than its radius, so that it can't skip over a
+        wall, however thin. Once it hits something then the point of impact is found by bisection."""
+        length = math.sqrt(move_x ** 2 + move_y ** 2)
+        steps = max(1, math.ceil(length / entity.radius))
+        free_fraction = 0
+        for step in range(1, steps + 1):
+            fraction = step / steps
+            step_pos = helpers.XYZPos(x=pos.x + fraction * move_x, y=pos.y + fraction * move_y, z=pos.z)
+            if self.game_objects.map.wall_collide(entity, step_pos):
+                break
+            free_fraction = fraction
+        else:
+            return 1
+        while (fraction - free_fraction) * length > internal.contact_tolerance:
+            middle = (free_fraction + fraction) / 2
+            middle_pos = helpers.XYZPos(x=pos.x + middle * move_x, y=pos.y + middle * move_y, z=pos.z)
+            if self.game_objects.map.wall_collide(entity, middle_pos):
+                fraction = middle
+            else:
+                free_fraction = middle
+        return free_fraction
+
+    # The directions to probe in by _contact_normal
+    _probe_directions = [helpers.XYPos(x=math.cos(2 * math.pi * i / internal.contact_probe_directions),
+                                       y=math.sin(2 * math.pi * i / internal.contact_probe_directions))
+                         for i in range(internal.contact_probe_directions)]
+
+    def _contact_normal(self, entity, pos):
+        """The direction pointing away from whatever walls the entity at the given position is touching, as a unit
+        vector; or None if it doesn't seem to be touching anything.
+
+        This is found by nudging the entity a little way in every direction, and seeing which directions would move it
+        into a wall."""
+        normal_x = 0
+        normal_y = 0
+        for direction in self._probe_directions:
+            probe_pos = helpers.XYZPos(x=pos.x + internal.contact_probe_distance * direction.x,
+                                       y=pos.y + internal.contact_probe_distance * direction.y,
+                                       z=pos.z)
+            if self.game_objects.map.wall_collide(entity, probe_pos):
+                normal_x -= direction.x
+                normal_y -= direction.y
+        length = math.sqrt(normal_x ** 2 + normal_y ** 2)
+        if length == 0:
+            return None
+        return helpers.XYPos(x=normal_x / length, y=normal_y / length)
 
 
 class GameObjects:
     def __init__(self, map_background_color):
         self.map = None
         self.player = None
+        self.entities = None  # Every entity, including the player
         self._map_background_color = map_background_color
 
     def reset(self):
         self.map = Map(self._map_background_color)
         self.player = entities.Player()
+        self.entities = entities.EntityRegistry()
+        self.entities.add(self.player)
+
+    def load_map(self, map_name):
+        """Loads the map with the given name, and puts the player at its starting position. Raises
+        exceptions.MapLoadException if the map can't be loaded."""
+        map_loader = self.map_loader(map_name)
+        map_loader.run()
+        map_loader.finish(self)
+
+    def map_loader(self, map_name, view_size=None):
+        """A MapLoader for loading the map with the given name into the game. See MapLoader."""
+        return MapLoader(map_name, self._map_background_color, view_size)
+
+
+class MapLoader:
+    """Loads a map, in the stages given in internal.MapLoadStages: reading the map file, parsing it, building the map
+    from it, and (if 'view_size' is given) drawing the part of the start level that will be in view to begin with.
+    Either all at once via 'run', or in a background thread via 'start', so that the menus stay responsive whilst a
+    large map loads.
+
+    Whilst it is loading, (stage, fraction of the way through that stage) pairs are sent via 'progress_events', and it
+    may be cancelled via 'cancel'. Once 'done' is True, 'finish' does the drawing and puts the map into the game. (The
+    drawing is left to 'finish' as it must happen on the main thread.) The rest of the map is drawn as and when it is
+    needed, so the game may start straight away."""
+
+    def __init__(self, map_name, map_background_color, view_size=None):
+        self.map_name = map_name
+        self.view_size = view_size
+        self._map = Map(map_background_color)
+        self._start_pos = None
+        self._exception = None  # Whatever went wrong whilst loading, to be raised by 'finish'
+        self._thread = None
+        self._progress_events = queue.Queue()
+        self._cancelled = threading.Event()
+        self._done = threading.Event()
+
+    @property
+    def done(self):
+        return self._done.is_set()
+
+    def start(self):
+        """Loads the map in a background thread."""
+        self._thread = threading.Thread(target=self.run, daemon=True)
+        self._thread.start()
+
+    def cancel(self):
+        """Stops loading the map, as soon as the current step of loading it is done."""
+        self._cancelled.set()
+
+    def progress_events(self):
+        """Iterates over the progress events sent since this was last called."""
+        while True:
+            try:
+                yield self._progress_events.get_nowait()
+            except queue.Empty:
+                break
+
+    def _progress(self, stage, stage_progress=0):
+        if self._cancelled.is_set():
+            raise exceptions.MapLoadCancelled
+        self._progress_events.put((stage, stage_progress))
+
+    def run(self):
+        """Loads the map."""
+        try:
+            self._progress(internal.MapLoadStages.READ)
+            contents = maps.read_map_file(self.map_name)
+            self._progress(internal.MapLoadStages.PARSE)
+            tile_types, tile_data, start_pos = maps.parse_map_data(contents, tiles.all_tiles())
+            self._progress(internal.MapLoadStages.BUILD)
+            self._map.load_tiles(tile_types, tile_data,
+                                 lambda stage_progress: self._progress(internal.MapLoadStages.BUILD, stage_progress))
+            self._start_pos = start_pos
+        except Exception as e:
+            self._exception = e
+        finally:
+            self._done.set()
+
+    def finish(self, game_objects):
+        """Puts the loaded map into the game, and puts the player at its starting position. Raises whatever exception
+        loading the map raised, e.g. exceptions.MapLoadException if the map can't be loaded, or
+        exceptions.MapLoadCancelled if it was cancelled."""
+        if self._thread is not None:
+            self._thread.join()
+        if self._cancelled.is_set():
+            raise exceptions.MapLoadCancelled
+        if self._exception is not None:
+            raise self._exception
+        if self.view_size is not None:
+            view_width, view_height = self.view_size
+            self._map.prefetch(self._start_pos.z, (self._start_pos.x + 0.5) * tiles.size - view_width / 2,
+                               (self._start_pos.y + 0.5) * tiles.size - view_height / 2, view_width, view_height,
+                               math.inf)
+        game_objects.map = self._map
+        # + 0.5 to move the player to center of the tile
+        game_objects.player.pos = helpers.XYZPos(x=(self._start_pos.x + 0.5) * tiles.size,
+                                                 y=(self._start_pos.y + 0.5) * tiles.size,
+                                                 z=self._start_pos.z)
+        game_objects.entities.update(game_objects.player)
 
 
 class GameRunner:
@@ -428,3 +1306,10 @@ class GameRunner:
                 break
             except exceptions.QuitException:
                 pass
+
+    def play(self, map_name, frames=None):
+        """Starts a game on the given map straight away, without going through the menus. If 'frames' is given then
+        returns once that many frames have been run."""
+        self.reset()
+        self.game_objects.load_map(map_name)
+        self.simulation.run(frames)
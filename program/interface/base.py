@@ -1,6 +1,9 @@
+import collections
+import contextlib
 import os
 
 
+import Game.config.config as config
 import Game.config.internal as internal
 
 import Game.program.misc.exceptions as exceptions
@@ -8,8 +11,14 @@ import Game.program.misc.sdl as sdl
 
 
 class BaseOverlay:
+    # Whether the overlay records which parts of its screen have changed, via mark_dirty. If not then its whole screen
+    # is assumed to have changed whenever anything has been drawn on it.
+    tracks_dirty = False
+
     def __init__(self, name, location, size, background_color, *args, **kwargs):
         super(BaseOverlay, self).__init__(*args, **kwargs)
+        # An interface (technical term) to the overall interface (non-technical term) (!)
+        self._interface_overlayer = None
         # Name of the overlay!
         self.name = name
         # Where it is visually on the screen.
@@ -20,19 +29,19 @@ class BaseOverlay:
         # The background colour of its screen
         self.background_color = background_color
         # The keys (on the keyboard) that should give KEYDOWN events whilst being *held* down.
-        self.listen_keys = set()
+        self.listen_keys = frozenset()
         # The mouse buttons that should give MOUSEBUTTONDOWN events whilst being *held* down.
-        self.listen_mouse = set()
+        self.listen_mouse = frozenset()
         # Whether the screen is visible
         self.screen_enabled = False
         # Whether the interface should listen for inputs
         self.listen_enabled = False
         # The game itself
         self._game_instance = None
-        # An interface (technical term) to the overall interface (non-technical term) (!)
-        self._interface_overlayer = None
         # Whether an overlay should be closed if it loses the selection
         self.must_be_top = False
+        # The rectangles of its screen which have changed since they were last pushed to the main screen.
+        self._dirty_rects = []
 
         self.reset()
 
@@ -43,15 +52,86 @@ class BaseOverlay:
     def register_interface(self, interface_overlayer):
         self._interface_overlayer = interface_overlayer
 
+    # Which overlays events are routed to depends on these, so setting any of them means working that out again. (So
+    # they should be assigned to rather than modified in place. To make sure of that, listen_keys and listen_mouse are
+    # stored as frozensets.)
+    @property
+    def location(self):
+        return self._location
+
+    @location.setter
+    def location(self, value):
+        self._location = value
+        self._routing_changed()
+
+    @property
+    def listen_keys(self):
+        return self._listen_keys
+
+    @listen_keys.setter
+    def listen_keys(self, value):
+        self._listen_keys = frozenset(value)
+        self._routing_changed()
+
+    @property
+    def listen_mouse(self):
+        return self._listen_mouse
+
+    @listen_mouse.setter
+    def listen_mouse(self, value):
+        self._listen_mouse = frozenset(value)
+        self._routing_changed()
+
+    @property
+    def screen_enabled(self):
+        return self._screen_enabled
+
+    @screen_enabled.setter
+    def screen_enabled(self, value):
+        self._screen_enabled = value
+        self._routing_changed()
+
+    @property
+    def listen_enabled(self):
+        return self._listen_enabled
+
+    @listen_enabled.setter
+    def listen_enabled(self, value):
+        self._listen_enabled = value
+        self._routing_changed()
+
+    def _routing_changed(self):
+        """Lets the interface know that it needs to work out afresh which overlays events should go to."""
+        if self._interface_overlayer is not None:
+            self._interface_overlayer.routing_changed()
+
     def handle(self, event):
         raise NotImplementedError
 
     def output(self, *args, **kwargs):
         raise NotImplementedError
 
-    def wipe(self):
-        """Fills the screen with its background color."""
-        self.screen.fill(self.background_color)
+    def wipe(self, rect=None):
+        """Fills the screen, or just the given rectangle of it, with its background color."""
+        self.mark_dirty(self.screen.fill(self.background_color, rect))
+
+    def mark_dirty(self, rect):
+        """Records that the given rectangle of the screen has changed."""
+        if rect:  # Empty Rects are falsy
+            self._dirty_rects.append(rect)
+
+    def pop_dirty(self):
+        """Returns the rectangles of the main screen that this overlay has changed since this was last called."""
+        if self.tracks_dirty:
+            dirty_rects = [rect.move(self.location.topleft) for rect in self._dirty_rects + self.screen.cutout_changes]
+        elif self.screen.dirty:
+            dirty_rects = [self.location.copy()]
+        else:
+            dirty_rects = []
+        self._dirty_rects = []
+        self.screen.cutout_changes = []
+        self.screen.dirty = False
+        return dirty_rects
 
     def enable(self, state=True):
         """Sets the enabled attributes to 'state', or True if no 'state' argument is passed."""
@@ -81,10 +161,25 @@ class BaseOverlay:
 
 
 class GraphicsOverlay(BaseOverlay):
+    tracks_dirty = True
+
     def output(self, source, dest=(0, 0), area=None, special_flags=0, offset=None, *args, **kwargs):
+        """Blits the source onto the screen. Returns the rectangle of the screen which was changed."""
         if offset is not None:
             dest = dest[0] - offset.x, dest[1] - offset.y
-        self.screen.blit_offset(source, dest, area, special_flags)
+        changed_rect = self.screen.blit_offset(source, dest, area, special_flags)
+        self.mark_dirty(changed_rect)
+        return changed_rect
+
+    @contextlib.contextmanager
+    def clip(self, rect):
+        """Within this context, only the given rectangle of the screen may be drawn on."""
+        old_clip = self.screen.get_clip()
+        self.screen.set_clip(rect)
+        try:
+            yield
+        finally:
+            self.screen.set_clip(old_clip)
 
 
 class AlignmentMixin:
@@ -149,6 +244,60 @@ def font(font_filepath, font_size, font_color):
     return font
 
 
+class TextCache:
+    """Remembers rendered text, so that the same text needn't be rendered again every time that it is drawn: e.g. every
+    time that a menu is rebuilt, or the console is redrawn.
+
+    Rendered text is kept until it uses more than config.TEXT_CACHE_MEMORY_BUDGET, at which point the least recently
+    used is forgotten first. The Surfaces returned are shared, so they must not be drawn on."""
+
+    def __init__(self, memory_budget=config.TEXT_CACHE_MEMORY_BUDGET):
+        self.memory_budget = memory_budget
+        self._surfaces = collections.OrderedDict()  # {key: Surface}, from least to most recently used
+        self._memory = 0
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def _key(font, text):
+        return font.path, font.size, tuple(font.fgcolor), text
+
+    @staticmethod
+    def _surface_memory(surf):
+        """How much memory (in bytes) a Surface uses."""
+        return surf.get_bytesize() * surf.get_width() * surf.get_height()
+
+    def render(self, font, text):
+        """The given text, rendered in the given font."""
+        key = self._key(font, text)
+        try:
+            surf = self._surfaces[key]
+        except KeyError:
+            self.misses += 1
+            surf, rect = font.render(text)
+            self._surfaces[key] = surf
+            self._memory += self._surface_memory(surf)
+            while self._memory > self.memory_budget and len(self._surfaces) > 1:
+                _, old_surf = self._surfaces.popitem(last=False)
+                self._memory -= self._surface_memory(old_surf)
+        else:
+            self.hits += 1
+            self._surfaces.move_to_end(key)
+        return surf
+
+    def clear(self):
+        self._surfaces.clear()
+        self._memory = 0
+
+    def nbytes(self):
+        """How much memory the rendered text is using, in bytes."""
+        return self._memory
+
+
+# Shared between every overlay
+text_cache = TextCache()
+
+
 class FontMixin:
     """Allows for using fonts, for text."""
     def __init__(self, font, *args, **kwargs):
@@ -156,10 +305,12 @@ class FontMixin:
         super(FontMixin, self).__init__(*args, **kwargs)
 
     def render_text(self, text):
-        surf, rect = self.font.render(text)
-        return surf
+        """The given text, rendered in this overlay's font. The result is shared with anything else that has rendered
+        the same text, so must not be drawn on."""
+        return text_cache.render(self.font, text)
 
     def render_text_with_newlines(self, text_pieces, background=(255, 255, 255)):
+        """Renders each of the given pieces of text on a line of its own, one beneath the other."""
         if len(text_pieces) == 0:
             raise exceptions.ProgrammingException
         rendered_pieces = []
@@ -1,12 +1,63 @@
+import collections
 import Tools as tools
 
 
 import Game.config.config as config
+import Game.config.internal as internal
 
+import Game.program.misc.assets as assets
 import Game.program.misc.exceptions as exceptions
 import Game.program.misc.sdl as sdl
 
 
+class _EventRouting:
+    """Which overlays events should go to, given which overlays are currently enabled and selected. Is created afresh
+    whenever that changes, rather than being worked out again for every event."""
+
+    def __init__(self, overlays, selected_overlays, debug_overlay):
+        if debug_overlay.listen_enabled:
+            self.selected = debug_overlay
+        else:
+            self.selected = [x for x in selected_overlays if x is None or x.listen_enabled][-1]
+        # The keys and mouse buttons whose events are repeated whilst held down, as {key code: key} and [button].
+        if self.selected is None:
+            self.held_keys = {}
+            self.held_mouse = []
+        else:
+            self.held_keys = {key.key: key for key in self.selected.listen_keys}
+            self.held_mouse = list(self.selected.listen_mouse)
+        # The overlays which are visible (so which a click could select) and which are listening (so which a mouse event
+        # could be handled by), in order, for each cell of the screen that they cover.
+        self._shown_cells = self._cells(overlay for overlay in overlays if overlay.screen_enabled)
+        self._listening_cells = self._cells(overlay for overlay in overlays if overlay.listen_enabled)
+
+    @staticmethod
+    def _cells(overlays):
+        cell_size = internal.event_routing_cell_size
+        cells = collections.defaultdict(list)
+        for overlay in overlays:
+            location = overlay.location
+            for cell_x in range(location.left // cell_size, (location.right - 1) // cell_size + 1):
+                for cell_y in range(location.top // cell_size, (location.bottom - 1) // cell_size + 1):
+                    cells[cell_x, cell_y].append(overlay)
+        return cells
+
+    @staticmethod
+    def _overlays_at(cells, pos):
+        cell_size = internal.event_routing_cell_size
+        x, y = pos
+        return [overlay for overlay in cells.get((x // cell_size, y // cell_size), ())
+                if overlay.location.collidepoint(pos)]
+
+    def shown_overlays_at(self, pos):
+        """The visible overlays at the given position on the screen, from the topmost down."""
+        return self._overlays_at(self._shown_cells, pos)
+
+    def listening_overlays_at(self, pos):
+        """The listening overlays at the given position on the screen, from the topmost down."""
+        return self._overlays_at(self._listening_cells, pos)
+
+
 class Interface:
     def __init__(self, overlays):
         self.overlays = overlays
@@ -14,32 +65,52 @@ class Interface:
         for overlay in overlays.values():
             overlay.register_interface(interface_overlayer)
         self._selected_overlay = [None]
+        # Which overlays events should go to. None if that needs working out again.
+        self._routing = None
 
         self.screen = sdl.display.set_mode(config.SCREEN_SIZE)
+        # Now that there's a display, the images can be converted to its pixel format.
+        assets.manager.convert()
         sdl.event.set_grab(True)
         self.screen_size = self.screen.get_rect()
         self._inner_rect = sdl.Rect(config.SCREEN_EDGE_WIDTH, config.SCREEN_EDGE_WIDTH,
                                     self.screen_size.width - 2 * config.SCREEN_EDGE_WIDTH,
                                     self.screen_size.height - 2 * config.SCREEN_EDGE_WIDTH)
         sdl.display.set_caption(config.WINDOW_NAME)
+        # Whether each overlay was visible as of the last flush.
+        self._overlays_shown = {}
+        # How many pixels were pushed to the display in the last flush.
+        self.pixels_pushed = 0
+        # How many cutouts were reblitted in the last flush (only those that had changed), and how many there are. (The
+        # latter being how many would be reblitted if they were all reblitted every time.)
+        self.cutout_blits = 0
+        self.cutouts = 0
 
     def reset(self, overlay_to_reset=None):
         """Resets and disables all overlays. If passed an argument, it will instead reset (and not disable) just that
         overlay."""
         if overlay_to_reset is None:
             self._selected_overlay = [None]
+            self.routing_changed()
             for overlay in self.overlays.values():
                 overlay.reset()
                 overlay.disable()
         else:
             self.overlays[overlay_to_reset].reset()
 
+    def routing_changed(self):
+        """Should be called whenever an overlay is enabled or disabled, or the selected overlay changes, so that which
+        overlays events should go to is worked out again."""
+        self._routing = None
+
+    def _route(self):
+        if self._routing is None:
+            self._routing = _EventRouting(self.overlays.values(), self._selected_overlay, self.overlays.debug)
+        return self._routing
+
     @property
     def selected_overlay(self):
-        if self.overlays.debug.listen_enabled:
-            return self.overlays.debug
-        else:
-            return [x for x in self._selected_overlay if x is None or x.listen_enabled][-1]
+        return self._route().selected
 
     @selected_overlay.setter
     def selected_overlay(self, value):
@@ -54,9 +125,10 @@ class Interface:
             except ValueError:
                 pass
             self._selected_overlay.append(value)
+            self.routing_changed()
 
     def out(self, overlay_name, *args, **kwargs):
-        self.overlays[overlay_name].output(*args, **kwargs)
+        return self.overlays[overlay_name].output(*args, **kwargs)
 
     def inp(self):
         inp_results = []
@@ -67,22 +139,19 @@ class Interface:
         events_to_handle = []
         pressed_keys = sdl.key.get_pressed()
         pressed_mouse = sdl.mouse.get_pressed()
-        if self.selected_overlay is not None:
-            listened_keys = {x for x in self.selected_overlay.listen_keys if pressed_keys[x.key]}
-            listened_mouse = {x for x in self.selected_overlay.listen_mouse if pressed_mouse[x - 1]}
-        else:
-            listened_keys = set()
-            listened_mouse = set()
+        routing = self._route()
+        listened_keys = {key_code: key for key_code, key in routing.held_keys.items() if pressed_keys[key_code]}
+        listened_mouse = {button for button in routing.held_mouse if pressed_mouse[button - 1]}
 
         for event in events:
             # Avoid duplication
-            if sdl.event.is_key(event) and event.key in (x.key for x in listened_keys):
+            if sdl.event.is_key(event) and event.key in listened_keys:
                 continue
             elif sdl.event.is_mouse(event, valid_buttons=listened_mouse) and event.type == sdl.MOUSEBUTTONDOWN:
                 continue
             elif event.type != sdl.NOEVENT:
                 events_to_handle.append(event)
-        for listen_key in listened_keys:
+        for listen_key in listened_keys.values():
             events_to_handle.append(sdl.event.Event(sdl.KEYDOWN, unicode=listen_key.unicode, key=listen_key.key))
         mouse_pos = sdl.mouse.get_pos()
         for listen_mouse in listened_mouse:
@@ -104,34 +173,33 @@ class Interface:
 
             # Change which overlay is selected for text input
             if event.type == sdl.MOUSEBUTTONDOWN:
-                for overlay in self.overlays.values():
-                    if overlay.screen_enabled and overlay.location.collidepoint(event.pos):
-                        overlay.enable_listener()
-                        self.selected_overlay = overlay
-                        break
+                for overlay in self._route().shown_overlays_at(event.pos):
+                    overlay.enable_listener()
+                    self.selected_overlay = overlay
+                    break
 
             # Here we let the various overlays try to handle the event.
             if not handled:
                 inp_result = None
                 # If it's a mouse event...
                 if sdl.event.is_mouse(event):
-                    for overlay in self.overlays.values():
-                        # ... work through all the overlays that the mouse is over, in order
-                        if overlay.listen_enabled and overlay.location.collidepoint(event.pos):
-                            try:
-                                # Let the overlay try to handle it
-                                inp_result = overlay.handle(event)
-                            except exceptions.UnhandledInput:
-                                # Let the next overlay try instead
-                                pass
-                            else:
-                                break
+                    # ... work through all the overlays that the mouse is over, in order
+                    for overlay in self._route().listening_overlays_at(event.pos):
+                        try:
+                            # Let the overlay try to handle it
+                            inp_result = overlay.handle(event)
+                        except exceptions.UnhandledInput:
+                            # Let the next overlay try instead
+                            pass
+                        else:
+                            break
                 # If it's not (probably a text event) ...
                 else:
                     # ... let the selected overlay try to handle it.
-                    if self.selected_overlay is not None and self.selected_overlay.listen_enabled:
+                    selected_overlay = self._route().selected
+                    if selected_overlay is not None and selected_overlay.listen_enabled:
                         try:
-                            inp_result = self.selected_overlay.handle(event)
+                            inp_result = selected_overlay.handle(event)
                         except exceptions.UnhandledInput:
                             pass
                 if inp_result is not None:
@@ -139,13 +207,47 @@ class Interface:
         return inp_results
 
     def flush(self):
-        """Pushes the changes from the overlays to the main screen."""
-        for overlay in list(self.overlays.values())[::-1]:  # Reverse order, so the topmost stuff is blitted last.
+        """Pushes the changes from the overlays to the main screen.
+
+        If config.DIRTY_RECT_RENDERING is True then only those regions of the main screen which have changed are
+        redrawn and pushed to the display. Otherwise the whole screen is."""
+
+        overlays = list(self.overlays.values())[::-1]  # Reverse order, so the topmost stuff is blitted last.
+        self.cutout_blits = 0
+        self.cutouts = 0
+        for overlay in overlays:
             if overlay.screen_enabled:
-                overlay.screen.update_cutouts()
-                self.screen.blit(overlay.screen, overlay.location)
+                cutout_blits, cutouts = overlay.screen.update_cutouts()
+                self.cutout_blits += cutout_blits
+                self.cutouts += cutouts
 
-        sdl.display.update()
+        if config.DIRTY_RECT_RENDERING:
+            dirty_rects = []
+            for overlay in overlays:
+                overlay_dirty_rects = overlay.pop_dirty()
+                if overlay.screen_enabled != self._overlays_shown.get(overlay.name, False):
+                    # It's been shown or hidden, which changes everything underneath it as well.
+                    dirty_rects.append(overlay.location)
+                elif overlay.screen_enabled:
+                    dirty_rects.extend(overlay_dirty_rects)
+                self._overlays_shown[overlay.name] = overlay.screen_enabled
+            dirty_rects = sdl.merge_rects(dirty_rects)
+            for overlay in overlays:
+                if overlay.screen_enabled:
+                    for dirty_rect in dirty_rects:
+                        dest = dirty_rect.clip(overlay.location)
+                        if dest:
+                            area = dest.move(-overlay.location.x, -overlay.location.y)
+                            self.screen.blit(overlay.screen, dest, area)
+            sdl.display.update(dirty_rects)
+        else:
+            for overlay in overlays:
+                if overlay.screen_enabled:
+                    self.screen.blit(overlay.screen, overlay.location)
+            dirty_rects = [self.screen_size]
+            sdl.display.update()
+
+        self.pixels_pushed = sum(rect.width * rect.height for rect in dirty_rects)
 
     def use(self, overlay_name):
         return self.use_background(overlay_name) + self.select_overlay(overlay_name)
@@ -175,3 +277,6 @@ class InterfaceOverlayer:
 
     def disable_overlay(self, overlay_name):
         self._get_overlay(overlay_name).disable()
+
+    def routing_changed(self):
+        self._interface.routing_changed()
@@ -1,8 +1,9 @@
-import collections
+import math
 import Tools as tools
 
 
 import Game.config.config as config
+import Game.config.internal as internal
 
 import Game.program.misc.helpers as helpers
 import Game.program.misc.sdl as sdl
@@ -201,16 +202,25 @@ class Button(MenuElement, base.FontMixin, base.AlignmentMixin):
         button_select = 'button/button_select.png'
 
     def __init__(self, text, *args, **kwargs):
-        align_kwargs = tools.extract_keys(kwargs, ['horz_alignment', 'vert_alignment'])
+        self._align_kwargs = tools.extract_keys(kwargs, ['horz_alignment', 'vert_alignment'])
         super(Button, self).__init__(*args, **kwargs)
 
-        self.text = text
+        self.text = None
+        self.set_text(text)
 
+    def set_text(self, text, selected=False, disabled=False):
+        """Redraws the button with the given text on it, either selected or not, and either grayed out or not."""
+        self.text = text
         self.screen.blit(self.appearances.button_base)
-        self.screen.blit(self.appearances.button_deselect)
+        if selected:
+            self.screen.blit(self.appearances.button_select)
+        else:
+            self.screen.blit(self.appearances.button_deselect)
         button_text = self.render_text(text)
-        text_centered = self._align(button_text.get_rect(), **align_kwargs)
+        text_centered = self._align(button_text.get_rect(), **self._align_kwargs)
         self.screen.blit(button_text, text_centered)
+        if disabled:
+            self.screen.fill(config.MENU_DISABLED_TINT, special_flags=sdl.BLEND_RGB_MULT)
 
     def __str__(self):
         default = super(Button, self).__str__()
@@ -235,31 +245,119 @@ class Entry(Button):
         button_deselect = 'list/list_entry_deselected.png'
         button_select = 'list/list_entry_selected.png'
 
+    # Which entry is shown by which Entry changes as the list is scrolled, so it's up to Entries to draw them as
+    # selected or not (see Entries._draw_slot), rather than this drawing itself as selected when clicked on.
+    def mousedown(self, menu_results, pos):
+        return super(Button, self).mousedown(menu_results, pos)
+
+    def un_mousedown(self, menu_results):
+        return super(Button, self).un_mousedown(menu_results)
+
 
 class Entries(MultipleComponentMixin, MenuElement, base.FontMixin):
+    """The entries of a List.
+
+    Only the entries in view are drawn, plus internal.list_overscan_rows either side of them so that scrolling a little
+    needn't draw any more. They are drawn onto a fixed number of Entry elements ('slots'), one beneath the other, which
+    are reused for different entries as the list is scrolled. So how long it takes to create the list, and how much
+    memory it uses, doesn't depend on how many entries there are.
+
+    Its screen should be created with the size given by 'screen_size', and with a viewport the size of the view of the
+    entries. Slot i shows entry self._first_row + i, and how far the entries have been scrolled is set via
+    'scroll_top'.
+
+    The entries with indices in 'disabled' are grayed out, and can't be selected."""
 
     horz_text_offset = 18
 
-    def __init__(self, entry_text, *args, **kwargs):
+    def __init__(self, entry_text, *args, disabled=(), **kwargs):
         super(Entries, self).__init__(*args, **kwargs)
 
-        self._components = collections.OrderedDict()
+        self._components = {}  # Used with MultipleComponentMixin: {slot index: Entry}
+        self._entry_text = entry_text
+        self._disabled = set(disabled)
+        self._row_height = Entry.size.height
+        self._first_row = 0  # Which entry is drawn in the first slot
+        self._scroll_top = 0  # How far (in pixels) the entries have been scrolled
+        self._selected_row = None  # Which entry was last clicked on
 
         # TODO: Handle cutout backgrounds in a better fashion
         # (having a background for a cutout, and then blitting a transparent-background surface on top, is too slow.)
         # Maybe color keys? Should then go through and use that consistently throughout, though.
         self.screen.fill((239, 228, 176))
-        for count, text in enumerate(entry_text):
-            entry_rect = Entry.size.move(0, Entry.size.height * count)
+        for slot in range(self.screen.get_height() // self._row_height):
+            entry_rect = Entry.size.move(0, self._row_height * slot)
             entry_screen = self.screen.subsurface(entry_rect)
-            entry = Entry(screen=entry_screen, text=text, font=self.font, horz_alignment=self.horz_text_offset)
-            entry.on_mousedown(lambda menu_results, pos, count_=count: (count_, True))
-            self._components[count] = entry
+            entry = Entry(screen=entry_screen, text=entry_text[slot], font=self.font,
+                          horz_alignment=self.horz_text_offset)
+            entry.on_mousedown(lambda menu_results, pos, slot_=slot: self._select(slot_))
+            self._components[slot] = entry
+            if slot in self._disabled:
+                self._draw_slot(slot)
 
     def __str__(self):
         default = super(Entries, self).__str__()
         return default.format(args='')
 
+    @classmethod
+    def screen_size(cls, num_entries, view_height):
+        """The size that the screen should be, for the given number of entries and height of the view of them."""
+        slots = math.ceil(view_height / Entry.size.height) + 1 + 2 * internal.list_overscan_rows
+        return Entry.size.width, Entry.size.height * min(num_entries, slots)
+
+    @property
+    def scroll_height(self):
+        """How tall (in pixels) all of the entries are, one beneath the other."""
+        return len(self._entry_text) * self._row_height
+
+    @property
+    def view_height(self):
+        """How tall (in pixels) the view of the entries is."""
+        return self.screen.viewport.height
+
+    @property
+    def scroll_top(self):
+        return self._scroll_top
+
+    @scroll_top.setter
+    def scroll_top(self, value):
+        self._scroll_top = value
+        top = value - self._first_row * self._row_height
+        if top < 0 or top + self.view_height > self.screen.get_height():
+            # The slots don't cover all of the view any more, so move them to be around it.
+            first_row = math.floor(value / self._row_height) - internal.list_overscan_rows
+            first_row = max(0, min(first_row, len(self._entry_text) - len(self._components)))
+            if first_row != self._first_row:
+                self._first_row = first_row
+                for slot in self._components:
+                    self._draw_slot(slot)
+            top = value - self._first_row * self._row_height
+        self.screen.viewport.top = top
+
+    def _draw_slot(self, slot):
+        row = self._first_row + slot
+        self._components[slot].set_text(self._entry_text[row], selected=row == self._selected_row,
+                                        disabled=row in self._disabled)
+
+    def _select(self, slot):
+        old_slot = None if self._selected_row is None else self._selected_row - self._first_row
+        row = self._first_row + slot
+        self._selected_row = None if row in self._disabled else row
+        # The slot that the previously selected entry is in now needn't be the slot that was clicked on to select it,
+        # so deselect it here.
+        if old_slot != slot and old_slot in self._components:
+            self._draw_slot(old_slot)
+        self._draw_slot(slot)
+        return self._selected_row, True
+
+    def _find_element(self, pos):
+        x, y = pos
+        slot = y // self._row_height
+        if 0 <= x < self.screen.get_width() and slot in self._components:
+            return self._components[slot]
+        else:
+            return None
+
 
 class Scrollbar(MenuElement):
 
@@ -312,19 +410,19 @@ class Scrollbar(MenuElement):
             scroll_handle_pos = self.move(pos[1])
 
             # Move the entries
-            excess_height = max(0, self.scrollable.screen.get_height() - self.scrollable.screen.viewport.height)
+            excess_height = max(0, self.scrollable.scroll_height - self.scrollable.view_height)
             entries_offset = (excess_height * scroll_handle_pos) / self.clamp_length
 
-            self.scrollable.screen.viewport.top = entries_offset
+            self.scrollable.scroll_top = int(entries_offset)
         return super(Scrollbar, self).mousemotion(menu_results, pos)
 
     def scroll(self, menu_results, is_scroll_up, pos):
         if not self._scrolling:
-            excess_height = self.scrollable.screen.get_height() - self.scrollable.screen.viewport.height
+            excess_height = self.scrollable.scroll_height - self.scrollable.view_height
             if excess_height > 0:
-                moved_list_pos = self.scrollable.screen.viewport.top + {True: -1, False: 1}[is_scroll_up] * config.SCROLL_SPEED
-                self.scrollable.screen.viewport.top = tools.clamp(moved_list_pos, 0, excess_height)
-                moved_scrollbar_pos = (self.scrollable.screen.viewport.top * self.scrollable.screen.viewport.height) / excess_height
+                moved_list_pos = self.scrollable.scroll_top + {True: -1, False: 1}[is_scroll_up] * config.SCROLL_SPEED
+                self.scrollable.scroll_top = tools.clamp(moved_list_pos, 0, excess_height)
+                moved_scrollbar_pos = (self.scrollable.scroll_top * self.scrollable.view_height) / excess_height
                 self.move(moved_scrollbar_pos)
         return super(Scrollbar, self).scroll(menu_results, is_scroll_up, pos)
 
@@ -345,7 +443,7 @@ class List(MultipleComponentMixin, MenuElement, base.FontMixin):
 
         title_offset = (8, 8)
 
-    def __init__(self, title, entry_text, **kwargs):
+    def __init__(self, title, entry_text, disabled=(), **kwargs):
         super(List, self).__init__(**kwargs)
 
         self._components = tools.Object()  # Used with MultipleComponentMixin; the components making up this list
@@ -357,15 +455,15 @@ class List(MultipleComponentMixin, MenuElement, base.FontMixin):
         self.screen.blit(title_text, self.Alignment.title_offset)
 
         # The surface we'll put the entries on
-        entry_size = Entry.size
-        self.entry_view = sdl.Surface((entry_size.width, entry_size.height * len(entry_text)),
-                                      viewport=self.Alignment.entry_view)
+        self.entry_view = sdl.Surface(Entries.screen_size(len(entry_text), self.Alignment.entry_view.height),
+                                      viewport=self.Alignment.entry_view.copy())
         self.screen.cutout(location=self.Alignment.entry_cutout, target=self.entry_view)
         # The surface we'll put the scrollbar on
         scrollbar_screen = self.screen.subsurface(self.Alignment.scrollbar_rect)
 
         # Record the components making up this menu element
-        self._components.entries = Entries(screen=self.entry_view, font=self.font, entry_text=entry_text)
+        self._components.entries = Entries(screen=self.entry_view, font=self.font, entry_text=entry_text,
+                                           disabled=disabled)
         self._components.scrollbar = Scrollbar(screen=scrollbar_screen, scrollable=self._components.entries)
 
     def __str__(self):
@@ -39,7 +39,9 @@ class MenuOverlay(base.FontMixin, base.AlignmentMixin, base.GraphicsOverlay):
         self._menu_results = tools.deldefaultdict(lambda: None)
 
     def remove(self, element):
-        self.screen.discard_cutout(element.screen)
+        location = self.screen.discard_cutout(element.screen)
+        if location is not None:
+            self.wipe(location)
         self.menu_elements.remove(element)
         self.necessary_elements.discard(element)
         self.submit_elements.discard(element)
@@ -161,11 +163,13 @@ class MenuOverlay(base.FontMixin, base.AlignmentMixin, base.GraphicsOverlay):
             if menu_element.screen.point_within_abs_offset(pos):
                 return menu_element
 
-    def list(self, title, entry_text, necessary=False, **kwargs):
+    def list(self, title, entry_text, disabled=(), necessary=False, **kwargs):
         """Creates a list with the given title, entries, and alignment.
 
         :str title: The title to put at the top of the list.
         :iter[str] entries: The entries to put in the list.
+        :iter[int] disabled: Optional argument. The indices of those entries which should be grayed out, and not be
+            selectable. If not passed, defaults to none of them.
         :bool necessary: Optional argument determining whether or not this element must have non-None data set before
             the menu can be submitted. If not passed, defaults to False..
         :str horz_alignment: Optional argument. An internal.Alignment attribute defining the horizontal
@@ -179,7 +183,8 @@ class MenuOverlay(base.FontMixin, base.AlignmentMixin, base.GraphicsOverlay):
         list_screen = sdl.Surface.from_rect(menu_elements.List.size)
         list_screen.fill(self.background_color)
         self._view_cutout(list_screen, **align_kwargs)
-        created_list = menu_elements.List(screen=list_screen, title=title, entry_text=entry_text, font=self.font)
+        created_list = menu_elements.List(screen=list_screen, title=title, entry_text=entry_text, disabled=disabled,
+                                          font=self.font)
         self.menu_elements.appendleft(created_list)
         if necessary:
             self.necessary_elements.add(created_list)
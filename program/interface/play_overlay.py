@@ -23,8 +23,8 @@ class PlayOverlay(base.GraphicsOverlay):
         super(PlayOverlay, self).__init__(*args, **kwargs)
         listen_codes = (sdl.key.code(key_name) for key_name in config.Move.values())
         Key = collections.namedtuple('Key', ['unicode', 'key'])
-        self.listen_keys.update(Key(unicode=sdl.key.name(code), key=code) for code in listen_codes)
-        self.listen_mouse.add(3)
+        self.listen_keys = self.listen_keys.union(Key(unicode=sdl.key.name(code), key=code) for code in listen_codes)
+        self.listen_mouse = self.listen_mouse.union({3})
         self.screen_size = self.screen.get_rect()
         self._inner_rect = sdl.Rect(config.SCREEN_EDGE_WIDTH, config.SCREEN_EDGE_WIDTH,
                                     self.screen_size.width - 2 * config.SCREEN_EDGE_WIDTH,
@@ -1,3 +1,6 @@
+import collections
+import itertools
+import re
 import Tools as tools
 
 
@@ -11,13 +14,30 @@ import Game.program.interface.base as base
 
 
 class TextOverlay(base.BaseOverlay, base.FontMixin):
-    """Handles outputting text to the screen."""
+    """Handles outputting text to the screen.
+
+    The text is stored line by line, and only the most recent config.CONSOLE_SCROLLBACK lines are kept. Each line is
+    rendered just once, when it is finished; only the last line, which is the one still being added to, is rendered
+    again when it changes. So how long it takes to output some text doesn't depend on how much has been output
+    before."""
 
     def reset(self):
-        self.text = ''
+        self._lines = collections.deque(maxlen=config.CONSOLE_SCROLLBACK)  # The finished lines...
+        self._rendered_lines = collections.deque(maxlen=config.CONSOLE_SCROLLBACK)  # ...and the rendered rows of each
+        self._current_line = ''  # The last line, which is still being added to
+        self._pending_text = ''  # Text which has been output but not yet processed
+        self._lines_changes = 0  # Incremented whenever the finished lines change
+        # What the above was, and how many rows the current line took up, when the screen was last drawn
+        self._drawn_lines_changes = None
+        self._drawn_current_rows = None
         self.flush = True
         super(TextOverlay, self).reset()
 
+    @property
+    def text(self):
+        """All of the text currently remembered."""
+        return '\n'.join(itertools.chain(self._lines, [self._current_line]))
+
     def handle(self, event):
         if sdl.event.is_key(event):
             self.output(event.unicode)
@@ -36,25 +56,65 @@ class TextOverlay(base.BaseOverlay, base.FontMixin):
         if width is not None:
             output_val = '{{:{}}}'.format(width).format(output_val)
         output_val += end
-        self.text += output_val
+        self._pending_text += output_val
 
         if self.flush:
             self.flush_output()
 
     def flush_output(self):
-        # Handle backspaces
-        self.text = tools.re_sub_recursive(r'[^\x08]\x08', '', self.text)  # \x08 = backspace. \b doesn't work.
-        self.text.lstrip('\b')
-
-        text_with_newlines = []
-        split_text = self.text.split('\n')
-        for line in split_text:
-            text_with_newlines.extend(list(tools.slice_pieces(line, config.CONSOLE_LINE_LENGTH)))
-
-        self.wipe()
-
-        text = self.render_text_with_newlines(text_with_newlines, background=self.background_color)
-        self.screen.blit(text, (0, self.screen.get_height() - text.get_rect().height))
+        """Processes the text that has been output since this was last called, and draws the result."""
+        for piece in re.split('([\n\x08])', self._pending_text):  # \x08 = backspace. \b doesn't work.
+            if piece == '\x08':
+                if self._current_line:
+                    self._current_line = self._current_line[:-1]
+                elif self._lines:
+                    # Backspacing over a newline
+                    self._current_line = self._lines.pop()
+                    self._rendered_lines.pop()
+                    self._lines_changes += 1
+            elif piece == '\n':
+                self._lines.append(self._current_line)
+                self._rendered_lines.append(self._render_rows(self._current_line))
+                self._current_line = ''
+                self._lines_changes += 1
+            else:
+                self._current_line += piece
+        self._pending_text = ''
+        self._draw()
+
+    def _render_rows(self, line):
+        """Wraps the given line into rows of config.CONSOLE_LINE_LENGTH characters, and renders each of them. (Empty
+        rows are given as None.)"""
+        length = config.CONSOLE_LINE_LENGTH
+        rows = [line[i:i + length] for i in range(0, len(line), length)] or ['']
+        return [self.render_text(row) if row else None for row in rows]
+
+    def _draw(self):
+        """Draws the most recent lines, from the bottom of the screen upwards."""
+        font_height = self.font.get_sized_height()
+        screen_width, screen_height = self.screen.get_size()
+        current_rows = self._render_rows(self._current_line)
+        top = screen_height - font_height * len(current_rows)
+        if self._drawn_lines_changes == self._lines_changes and self._drawn_current_rows == len(current_rows):
+            # Only the current line has changed, so only it needs redrawing.
+            self.wipe(sdl.Rect(0, top, screen_width, screen_height - top))
+            self._draw_rows(current_rows, top)
+        else:
+            self.wipe()
+            self._draw_rows(current_rows, top)
+            for rows in reversed(self._rendered_lines):
+                if top <= 0:
+                    break
+                top -= font_height * len(rows)
+                self._draw_rows(rows, top)
+        self._drawn_lines_changes = self._lines_changes
+        self._drawn_current_rows = len(current_rows)
+
+    def _draw_rows(self, rows, top):
+        font_height = self.font.get_sized_height()
+        for i, row in enumerate(rows):
+            if row is not None:
+                self.screen.blit(row, (0, top + i * font_height))
 
     def bulk_output(self):
         return tools.set_context_variables(self, ('flush',), False, self.flush_output)
@@ -136,10 +196,6 @@ class TextOverlay(base.BaseOverlay, base.FontMixin):
 
 
 class DebugOverlay(TextOverlay):
-    def __init__(self, **kwargs):
-        self._screen_enabled = False
-        super(DebugOverlay, self).__init__(**kwargs)
-
     @property
     def screen_enabled(self):
         return self._screen_enabled
@@ -151,6 +207,7 @@ class DebugOverlay(TextOverlay):
         else:
             sdl.event.set_grab(True)
         self._screen_enabled = value
+        self._routing_changed()
 
     def reset(self, prompt=True):
         super(DebugOverlay, self).reset()
@@ -0,0 +1,135 @@
+"""Loads every image the game uses once, and packs them together into a few large Surfaces ('atlases'). Each image is
+then handed out as a subsurface of the atlas that it is in.
+
+Images are loaded whilst classes are being defined, which is before there is a display. So once there is one, 'convert'
+should be called: this converts the atlases to the display's pixel format, so that blitting from them doesn't need to
+convert every pixel on every blit. Every image handed out via 'load_into' is then swapped for the converted one."""
+
+import os
+
+
+import Game.config.internal as internal
+
+import Game.program.misc.sdl as sdl
+
+
+class _Page:
+    """A single atlas. Images are packed into it left to right, in rows ('shelves'), top to bottom."""
+
+    def __init__(self, width, height):
+        self.surface = sdl.Surface((width, height), sdl.SRCALPHA, 32)
+        self.surface.fill((0, 0, 0, 0))
+        self._shelf_top = 0     # Where the current shelf starts
+        self._shelf_height = 0  # How tall the current shelf is
+        self._shelf_left = 0    # Where the next image on the current shelf will go
+
+    def place(self, width, height):
+        """Finds room for an image of the given size. Returns the Rect that it should go in, or None if there isn't room
+        left for it."""
+
+        page_width, page_height = self.surface.get_size()
+        shelf_top, shelf_height, shelf_left = self._shelf_top, self._shelf_height, self._shelf_left
+        if shelf_left + width > page_width:
+            # Start a new shelf
+            shelf_top, shelf_height, shelf_left = shelf_top + shelf_height, 0, 0
+        if width > page_width or shelf_top + height > page_height:
+            return None
+        self._shelf_top = shelf_top
+        self._shelf_height = max(shelf_height, height)
+        self._shelf_left = shelf_left + width
+        return sdl.Rect(shelf_left, shelf_top, width, height)
+
+
+class AssetManager:
+    """Loads images and packs them into atlases. See the module docstring."""
+
+    def __init__(self, image_root=internal.Helpers.IMAGE_ROOT, page_size=internal.atlas_page_size):
+        self.image_root = image_root
+        self.page_size = page_size
+        self._pages = []
+        self._images = {}      # {(path, rotation): (page, Rect)}
+        self._bindings = []    # [(container, key, path, rotation)], from 'load_into'
+        self._preloaded = False
+        self.converted = False
+
+    @staticmethod
+    def _key(path, rotation):
+        return os.path.normcase(os.path.abspath(path)), rotation % 360
+
+    def _preload(self):
+        """Loads every image beneath the image root."""
+        self._preloaded = True
+        loaded_images = []
+        for dirpath, _, filenames in os.walk(self.image_root):
+            for filename in filenames:
+                if filename.lower().endswith('.png'):
+                    path = os.path.join(dirpath, filename)
+                    loaded_images.append((path, sdl.image.load(path)))
+        # Tallest first packs more tightly onto shelves
+        loaded_images.sort(key=lambda path_image: path_image[1].get_height(), reverse=True)
+        for path, image in loaded_images:
+            self._pack(self._key(path, 0), image)
+
+    def _pack(self, key, image):
+        """Copies the given image into an atlas."""
+        width, height = image.get_size()
+        for page in self._pages:
+            rect = page.place(width, height)
+            if rect is not None:
+                break
+        else:
+            # Images bigger than a page get a page to themselves
+            page = _Page(max(width, self.page_size), max(height, self.page_size))
+            if self.converted:
+                page.surface = sdl.Surface.from_pygame(page.surface.convert_alpha())
+            self._pages.append(page)
+            rect = page.place(width, height)
+        # The page is transparent, so this copies the image's pixels (including their alpha) exactly, rather than
+        # blending them with what's underneath.
+        page.surface.blit(image, rect, special_flags=sdl.BLEND_RGBA_MAX)
+        self._images[key] = page, rect
+        return page, rect
+
+    def image(self, path, rotation=0):
+        """The image at the given path, rotated anticlockwise by the given number of degrees (which should be a multiple
+        of 90)."""
+
+        if not self._preloaded:
+            self._preload()
+        key = self._key(path, rotation)
+        try:
+            page, rect = self._images[key]
+        except KeyError:
+            if key[1] == 0:
+                image = sdl.image.load(path)
+            else:
+                image = sdl.transform.rotate(self.image(path), rotation)
+            page, rect = self._pack(key, image)
+        return page.surface.subsurface(rect)
+
+    def load_into(self, container, key, path, rotation=0):
+        """Sets container[key] to be the image at the given path (rotated as in 'image'), and replaces it with the
+        converted image if 'convert' is later called."""
+        container[key] = self.image(path, rotation)
+        self._bindings.append((container, key, path, rotation))
+
+    def convert(self):
+        """Converts the atlases to the display's pixel format. Must be called after the display mode has been set."""
+        if self.converted:
+            return
+        for page in self._pages:
+            page.surface = sdl.Surface.from_pygame(page.surface.convert_alpha())
+        self.converted = True
+        for container, key, path, rotation in self._bindings:
+            container[key] = self.image(path, rotation)
+
+    def nbytes(self):
+        """How much memory the atlases are using, in bytes."""
+        return sum(page.surface.get_bytesize() * page.surface.get_width() * page.surface.get_height()
+                   for page in self._pages)
+
+    def num_pages(self):
+        return len(self._pages)
+
+
+manager = AssetManager()
@@ -9,9 +9,10 @@ import Game.program.misc.sdl as sdl
 
 
 class CommandRunner:
-    def __init__(self, game_objects, interface):
+    def __init__(self, game_objects, interface, simulation=None):
         self.game_objects = game_objects
         self.interface = interface
+        self.simulation = simulation
         self.debug_mode = False
 
     def run_command(self, command_name, command_args):
@@ -222,3 +223,27 @@ class Get(SpecialInput):
             return strings.Debug.VARIABLE_GET_FAILED.format(variable=variable_name)
         else:
             return strings.Debug.VARIABLE_GET.format(variable=variable_name, value=repr(variable_value))
+
+
+@tools.register(config.DebugCommands.TIMING, Debug.commands)
+class Timing(SpecialInput):
+    """Displays how well the game is keeping up with real time."""
+    inp = config.DebugCommands.TIMING
+    needs_debug = True
+
+    @classmethod
+    def do(cls, inp_args, command_runner):
+        if command_runner.simulation is None or not command_runner.game_objects.map.initialised:
+            return strings.Debug.GAME_NOT_STARTED
+        scheduler = command_runner.simulation.scheduler
+        names = [strings.Debug.TIMING_FRAMES, strings.Debug.TIMING_LATE_FRAMES, strings.Debug.TIMING_TICKS,
+                 strings.Debug.TIMING_DROPPED_TICKS]
+        values = [str(scheduler.frames), str(scheduler.late_frames), str(scheduler.ticks), str(scheduler.dropped_ticks)]
+        for percentile in (50, 90, 99):
+            names.append(strings.Debug.TIMING_TICK_TIME.format(percentile=percentile))
+            tick_time = scheduler.tick_time_percentile(percentile)
+            if tick_time is None:
+                values.append(strings.Debug.TIMING_NO_VALUE)
+            else:
+                values.append(strings.Debug.TIMING_MILLISECONDS.format(tick_time))
+        command_runner.interface.overlays.debug.table(title=strings.Debug.TIMING_HEADER, columns=[names, values])
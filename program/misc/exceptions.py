@@ -19,6 +19,14 @@ class MapLoadException(Exception):
     """Indicates that the given string cannot be deserialised into a tile."""
 
 
+class MapLoadCancelled(Exception):
+    """Indicates that loading a map was cancelled before it finished."""
+
+
+class RecordingLoadException(Exception):
+    """Indicates that a file isn't a recording that can be replayed."""
+
+
 class UnhandledInput(Exception):
     """Indicates that the listener did not handle the input."""
 
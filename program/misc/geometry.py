@@ -0,0 +1,57 @@
+"""Vectorised versions of the geometry used for collisions, for testing many discs at once.
+
+Each function takes arrays of disc radii and centers, and returns a boolean array of whether each disc intersects the
+given shape. Discs that merely touch a shape are not counted as intersecting it."""
+
+import numpy as np
+
+
+def disc_rect(radii, xs, ys, rect):
+    """Whether each disc intersects the given Rect."""
+    dist_x = np.maximum(np.maximum(rect.left - xs, 0), xs - rect.right)
+    dist_y = np.maximum(np.maximum(rect.top - ys, 0), ys - rect.bottom)
+    return dist_x ** 2 + dist_y ** 2 < radii ** 2
+
+
+def disc_disc(radii, xs, ys, center, radius):
+    """Whether each disc intersects the disc with the given center and radius."""
+    return (xs - center.x) ** 2 + (ys - center.y) ** 2 < (radii + radius) ** 2
+
+
+def _dist_segment(xs, ys, start_x, start_y, end_x, end_y):
+    """The distance from each point to the line segment between the given start and end points."""
+    seg_x = end_x - start_x
+    seg_y = end_y - start_y
+    t = ((xs - start_x) * seg_x + (ys - start_y) * seg_y) / (seg_x ** 2 + seg_y ** 2)
+    t = np.clip(t, 0, 1)
+    return np.hypot(xs - start_x - t * seg_x, ys - start_y - t * seg_y)
+
+
+def disc_irat(radii, xs, ys, corner, size, direction):
+    """Whether each disc intersects the isosceles right angled triangle whose right angle is at 'corner', and whose two
+    equal sides have length 'size' and go from the corner in the directions given by the signs of 'direction'. (So for
+    example direction=(-1, -1) is a triangle whose sides go up and to the left of its corner.)"""
+    # Reflect everything so that the triangle's sides go right and down from the origin.
+    us = (xs - corner.x) * direction[0]
+    vs = (ys - corner.y) * direction[1]
+    inside = (us >= 0) & (vs >= 0) & (us + vs <= size)
+    dist = np.minimum(np.minimum(_dist_segment(us, vs, 0, 0, size, 0), _dist_segment(us, vs, 0, 0, 0, size)),
+                      _dist_segment(us, vs, size, 0, 0, size))
+    return inside | (dist < radii)
+
+
+def disc_arc(radii, xs, ys, center, radius, start_angle, end_angle):
+    """Whether each disc intersects the arc of the circle with the given center and radius, going from 'start_angle' to
+    'end_angle'. Angles are in degrees, measured clockwise from the positive x axis (i.e. with the y axis pointing
+    down the screen, as usual)."""
+    rel_xs = xs - center.x
+    rel_ys = ys - center.y
+    angles = np.degrees(np.arctan2(rel_ys, rel_xs))
+    within_angles = np.mod(angles - start_angle, 360) <= end_angle - start_angle
+    dist_circle = np.abs(np.hypot(rel_xs, rel_ys) - radius)
+    start_radians = np.radians(start_angle)
+    end_radians = np.radians(end_angle)
+    dist_start = np.hypot(rel_xs - radius * np.cos(start_radians), rel_ys - radius * np.sin(start_radians))
+    dist_end = np.hypot(rel_xs - radius * np.cos(end_radians), rel_ys - radius * np.sin(end_radians))
+    dist = np.where(within_angles, dist_circle, np.minimum(dist_start, dist_end))
+    return dist < radii
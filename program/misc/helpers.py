@@ -6,8 +6,8 @@ import Tools as tools
 import Game.config.internal as internal
 import Game.config.strings as strings
 
+import Game.program.misc.assets as assets
 import Game.program.misc.exceptions as exceptions
-import Game.program.misc.sdl as sdl
 
 
 _sentinel = object()
@@ -18,7 +18,8 @@ class HasAppearances:
     class. If 'appearance_filename' is of type str then it is treated as being the value in a dict type input, with key
     None. The class will then have a (dict type | tools.Container subclass) 'appearances' attribute automagically added,
     whose keys are the same as that of 'appearance_filename', and whose values will be pygame.Surfaces containing the
-    image(s) specified.
+    image(s) specified. (These are provided by the asset manager; see assets.py.) The paths of the images are stored
+    in the same way in an '_appearance_paths' dict attribute.
 
     'appearance_files_location' should be passed as a keyword argument to the class constructor, specifying the folder
     to look for appearance files in. Once this has been set on a parent class, all child classes will automatically use
@@ -68,8 +69,11 @@ class HasAppearances:
             else:
                 raise exceptions.ProgrammingException
 
+            cls._appearance_paths = {}
             for name, appearance_filename in appearance_filenames.items():
-                cls.appearances[name] = cls._image_from_filename(appearance_files_location, appearance_filename)
+                appearance_path = cls._path_from_filename(appearance_files_location, appearance_filename)
+                cls._appearance_paths[name] = appearance_path
+                assets.manager.load_into(cls.appearances, name, appearance_path)
 
             if hasattr(cls, 'size_image'):
                 cls.size = cls.appearances[cls.size_image].get_rect()
@@ -89,11 +93,10 @@ class HasAppearances:
         return self.appearances[self.appearance_lookup]
 
     @staticmethod
-    def _image_from_filename(file_location, filename):
-        """Takes a file location and name and returns a Surface with the specified image on it."""
+    def _path_from_filename(file_location, filename):
+        """Takes a file location and name and returns the path to the specified image."""
 
-        appearance_file_path = os.path.join(internal.Helpers.IMAGE_LOC, *file_location.split('/'), *filename.split('/'))
-        return sdl.image.load(appearance_file_path)
+        return os.path.join(internal.Helpers.IMAGE_LOC, *file_location.split('/'), *filename.split('/'))
 
 
 # It's about twice as quick to use namedtuples over tools.Object, so it feels like we should probably use these where
@@ -1,4 +1,7 @@
 import ast
+import collections
+import hashlib
+import io
 import os
 
 
@@ -21,23 +24,143 @@ def map_names():
     return map_names
 
 
+# What the catalogue knows about each map. 'valid' is whether it can be loaded; if not then the dimensions and counts
+# are all None.
+MapInfo = collections.namedtuple('MapInfo', ('name', 'mtime', 'size', 'content_hash', 'width', 'height', 'z_levels',
+                                             'tile_count', 'valid'))
+
+
+class Catalogue:
+    """An index of the maps in internal.Maps.MAP_LOC, which records some information about each map (see MapInfo),
+    including whether it can be loaded at all.
+
+    The index is saved to internal.Maps.CATALOGUE_LOC, and kept up to date by 'update'. This only reads those map files
+    which have changed (i.e. whose modification time or size has changed) since it was last called, so that the
+    information about every map is available straight away without parsing all of them."""
+
+    _version = 1
+
+    def __init__(self, map_loc=internal.Maps.MAP_LOC, catalogue_loc=internal.Maps.CATALOGUE_LOC):
+        self.map_loc = map_loc
+        self.catalogue_loc = catalogue_loc
+        self._maps = None  # {map name: MapInfo}. None until loaded from file.
+        # How many maps were parsed by the last call to 'update'
+        self.parsed = 0
+
+    def _load(self):
+        """Loads the saved index, if there is one."""
+        self._maps = {}
+        try:
+            with open(self.catalogue_loc, 'r') as file:
+                catalogue_data = ast.literal_eval(file.read())
+            if catalogue_data['version'] == self._version:
+                self._maps = {map_name: MapInfo(map_name, *map_info)
+                              for map_name, map_info in catalogue_data['maps'].items()}
+        # The index is just a cache: if it can't be read then it'll be created afresh.
+        except (OSError, KeyError, TypeError, ValueError, SyntaxError):
+            pass
+
+    def _save(self):
+        catalogue_data = {'version': self._version,
+                          'maps': {map_name: tuple(map_info[1:]) for map_name, map_info in self._maps.items()}}
+        temp_loc = self.catalogue_loc + '.tmp'
+        try:
+            with open(temp_loc, 'w') as file:
+                file.write(repr(catalogue_data))
+            os.replace(temp_loc, self.catalogue_loc)
+        except OSError:
+            pass  # E.g. the maps folder is read-only. Not a problem, we'll just have to parse the maps again next time.
+
+    def update(self, tile_types):
+        """Brings the index up to date with the map files, and returns the MapInfo of every map, sorted by name."""
+        if self._maps is None:
+            self._load()
+        self.parsed = 0
+        changed = False
+        maps = {}
+        for dirpath, dirnames, filenames in os.walk(self.map_loc):
+            for filename in filenames:
+                if filename.endswith('.' + config.MAP_FILE_EXTENSION):
+                    map_name = os.path.splitext(filename)[0]
+                    stat = os.stat(os.path.join(dirpath, filename))
+                    map_info = self._maps.get(map_name)
+                    if map_info is None or map_info.mtime != stat.st_mtime or map_info.size != stat.st_size:
+                        map_info = self._map_info(map_name, os.path.join(dirpath, filename), stat, map_info,
+                                                  tile_types)
+                        changed = True
+                    maps[map_name] = map_info
+        if changed or maps.keys() != self._maps.keys():
+            self._maps = maps
+            self._save()
+        return sorted(maps.values())
+
+    def _map_info(self, map_name, file_path, stat, old_map_info, tile_types):
+        """Works out the information about the given map file."""
+        with open(file_path, 'rb') as file:
+            contents = file.read()
+        content_hash = hashlib.sha1(contents).hexdigest()
+        if old_map_info is not None and old_map_info.content_hash == content_hash:
+            # Just touched, not actually changed.
+            return old_map_info._replace(mtime=stat.st_mtime, size=stat.st_size)
+
+        self.parsed += 1
+        try:
+            _, tile_data, _ = parse_map_data(contents.decode(), tile_types)
+        except (exceptions.MapLoadException, UnicodeDecodeError):
+            return MapInfo(map_name, stat.st_mtime, stat.st_size, content_hash, None, None, None, None, False)
+        xs = [x for z_level_data in tile_data.values() for x, y in z_level_data]
+        ys = [y for z_level_data in tile_data.values() for x, y in z_level_data]
+        return MapInfo(map_name, stat.st_mtime, stat.st_size, content_hash,
+                       width=max(xs) - min(xs) + 1,
+                       height=max(ys) - min(ys) + 1,
+                       z_levels=len(tile_data),
+                       tile_count=len(xs),
+                       valid=True)
+
+
+catalogue = Catalogue()
+
+
 def get_map_data_from_map_name(map_name, tile_types):
+    """Loads the map with the given name, for use in the game.
+
+    Returns the map name, a list of callbacks for creating each type of tile used in the map, the map's tile data as a
+    dict of the form {z: {(x, y): index into that list}}, and the start position."""
+    return (map_name, *parse_map_data(read_map_file(map_name), tile_types))
+
+
+def read_map_file(map_name):
+    """Reads the contents of the map file with the given name."""
     file_path = os.path.join(internal.Maps.MAP_LOC, map_name + '.' + config.MAP_FILE_EXTENSION)
     try:
         with open(file_path, 'r') as file:
-            return (map_name, *_get_map_data(file, tile_types))
+            return file.read()
     except OSError:
         raise exceptions.MapLoadException
 
 
+def parse_map_data(contents, tile_types):
+    """As get_map_data_from_map_name, given the contents of the map file rather than its name, and without returning
+    the map name."""
+    return _get_map_data(io.StringIO(contents), tile_types)
+
+
 def get_map_data_from_file(file, tile_types):
+    """Loads a map from an open file, for use in the map editor. Unlike in the game, every tile is created as its own
+    object here, so that each one may be edited independently."""
     map_name = os.path.basename(file.name)
     map_name = os.path.splitext(map_name)[0]
-    tile_data_dict, start_pos = _get_map_data(file, tile_types)
+    tile_type_callbacks, tile_data, start_pos = _get_map_data(file, tile_types)
+    tile_data_dict = {}
+    for z, z_level_data in tile_data.items():
+        tile_data_dict[z] = {(x, y): tile_type_callbacks[tile_def]() for (x, y), tile_def in z_level_data.items()}
     return map_name, tile_data_dict, start_pos
 
 
 def _get_map_data(file, tile_types):
+    """Parses and validates the contents of a map file. Returns a list of callbacks for creating each type of tile used
+    in the map, the map's tile data as a dict of the form {z: {(x, y): index into that list}}, and the start position.
+    """
     try:
         map_file_contents = file.read()
         mapdata = ast.literal_eval(map_file_contents)  # ast.literal_eval is safe to use on untrusted sources.
@@ -50,7 +173,6 @@ def _get_map_data(file, tile_types):
             raise exceptions.MapLoadException
         start_pos = helpers.XYZPos(x=start_pos[0], y=start_pos[1], z=start_pos[2])
 
-        return_tile_data = {}
         tile_data = mapdata['tile_data']
         if not tile_data:
             raise exceptions.MapLoadException
@@ -58,15 +180,16 @@ def _get_map_data(file, tile_types):
             if not z_level_data:
                 raise exceptions.MapLoadException
             for (x, y), tile_def in z_level_data.items():
-                if any(type(i) is not int for i in (x, y, z)):
+                if any(type(i) is not int for i in (x, y, z, tile_def)):
+                    raise exceptions.MapLoadException
+                if not 0 <= tile_def < len(tile_types):
                     raise exceptions.MapLoadException
-                return_tile_data.setdefault(z, {})[(x, y)] = tile_types[tile_def](pos=helpers.XYZPos(x=x, y=y, z=z))
 
     # SyntaxError from ast.literal_eval
     except (KeyError, TypeError, ValueError, SyntaxError) as e:
         raise exceptions.MapLoadException from e
     else:
-        return return_tile_data, start_pos
+        return tile_types, tile_data, start_pos
 
 
 def _deserialize_tile_type(serial, tile_types):
@@ -1,6 +1,7 @@
 """Basically just a pygame wrapper, to make it easier to change it out later if need be."""
 
 import math
+import os
 import pygame
 import pygame.freetype
 
@@ -10,12 +11,26 @@ import Game.config.strings as strings
 
 import Game.program.misc.exceptions as exceptions
 
+
+def _init_display():
+    pygame.display.init()
+    pygame.event.set_allowed(None)
+    pygame.event.set_allowed([pygame.QUIT, pygame.KEYDOWN, pygame.MOUSEBUTTONDOWN, pygame.MOUSEBUTTONUP,
+                              pygame.MOUSEMOTION])
+    pygame.key.set_repeat(config.KEY_REPEAT_DELAY, config.KEY_REPEAT)
+
+
+def use_dummy_display():
+    """Switches to SDL's dummy video driver, which needs no actual display: nothing is shown, and there is no input.
+    Must be called before the display mode is set."""
+    pygame.display.quit()
+    os.environ['SDL_VIDEODRIVER'] = 'dummy'
+    _init_display()
+
+
 # Initialise the pygame modules
 pygame.freetype.init()
-pygame.display.init()
-pygame.event.set_allowed(None)
-pygame.event.set_allowed([pygame.QUIT, pygame.KEYDOWN, pygame.MOUSEBUTTONDOWN, pygame.MOUSEBUTTONUP, pygame.MOUSEMOTION])
-pygame.key.set_repeat(config.KEY_REPEAT_DELAY, config.KEY_REPEAT)
+_init_display()
 
 
 class Surface(pygame.Surface):
@@ -38,6 +53,11 @@ class Surface(pygame.Surface):
         surface should be (in the same way as cutouts), and the second argument being the 'child' surface. Unlike true
         subsurfaces, blitting to one won't automatically update the other: 'update_cutouts' should be called on the
         parent surface to have it pick up changes made to the child. A converse hasn't yet been implemented.
+    - Keeps track of whether it has been drawn on, via the attribute 'dirty'. This is set to True by any blit or fill
+        onto it, or onto any subsurface or cutout of it (recursively). 'update_cutouts' uses this to only reblit those
+        cutouts which have changed (or which have had something drawn over them); anything else using it should set it
+        back to False itself once it has picked up the changes. Similarly each call to 'update_cutouts' records where it
+        reblitted or removed cutouts in the list 'cutout_changes'.
     - Can be created from a Rect via the new 'from_rect' method.
     """
 
@@ -55,8 +75,13 @@ class Surface(pygame.Surface):
         self.viewport = viewport
         self._cutout_locations = []
         self._cutouts = []
+        self._cutout_viewports = []  # The viewport of each cutout when it was last blitted, or None if it hasn't been
+        self._removed_locations = []  # Where cutouts have been removed from since update_cutouts was last called
+        self.cutout_changes = []  # Where the last call to update_cutouts reblitted or removed cutouts
         self._is_subsurface = is_subsurface
         self._is_cutout = False
+        self.dirty = True
+        self._drawn_on = True  # Whether it has been drawn on directly (not via update_cutouts) since update_cutouts
         self._parent = None
 
     @classmethod
@@ -64,6 +89,18 @@ class Surface(pygame.Surface):
         """Returns a new Surface using the given rectangle to define its width, height and offset."""
         return cls((rect.width, rect.height), *args, offset=(rect.left, rect.top), **kwargs)
 
+    @classmethod
+    def from_pygame(cls, surface, **kwargs):
+        """Returns a new Surface which is a copy of the given pygame.Surface, with the same pixel format. For wrapping
+        the plain pygame.Surfaces that some pygame functions return, e.g. 'convert_alpha'."""
+        new_surface = cls(surface.get_size(), surface.get_flags(), surface, **kwargs)
+        new_surface.fill((0, 0, 0, 0))
+        # The new surface is transparent, so this copies the pixels (including their alpha) exactly, rather than
+        # blending them with what's underneath. The area is given explicitly as (depending on the version of pygame)
+        # 'surface' may be an instance of this class whose _init was never called, so has no viewport.
+        new_surface.blit(surface, (0, 0), surface.get_rect(), special_flags=BLEND_RGBA_MAX)
+        return new_surface
+
     def cutout(self, location, target):
         """See description in Surface class docstring."""
 
@@ -72,34 +109,81 @@ class Surface(pygame.Surface):
         target._parent = self
         self._cutout_locations.append(location)
         self._cutouts.append(target)
+        self._cutout_viewports.append(None)
 
     def remove_cutout(self, target):
-        """Removes a particular cutout."""
+        """Removes a particular cutout. Returns where it was. (Its pixels are left where they are, but any other cutouts
+        that it overlapped will be reblitted by the next update_cutouts.)"""
 
         i = self._cutouts.index(target)
+        location = self._cutout_locations[i]
         del self._cutouts[i]
         del self._cutout_locations[i]
+        del self._cutout_viewports[i]
+        self._removed_locations.append(location)
+        self._mark_dirty(direct=False)
+        return location
 
     def discard_cutout(self, target):
-        """Removes a particular cutout; does not through an error if the target is not a current cutout."""
+        """Removes a particular cutout; does not through an error if the target is not a current cutout. Returns where
+        it was, or None if it wasn't a cutout."""
 
         try:
-            self.remove_cutout(target)
+            return self.remove_cutout(target)
         except ValueError:
-            pass
+            return None
 
     def clear_cutouts(self):
         """Clears tracking of all cutouts."""
 
         self._cutout_locations = []
         self._cutouts = []
+        self._cutout_viewports = []
+        self._removed_locations = []
+        self._mark_dirty(direct=False)
 
     def update_cutouts(self):
-        """See description in Surface class docstring."""
-
-        for location, cutout in zip(self._cutout_locations, self._cutouts):
-            cutout.update_cutouts()
-            self.blit(cutout, location)
+        """See description in Surface class docstring. Returns how many cutouts were blitted, and how many cutouts there
+        are in total, both counting the cutouts of cutouts (and so on) as well."""
+
+        blits = 0
+        total = 0
+        # Cutouts underneath a removed cutout need reblitting, just as if another cutout had been reblitted over them.
+        reblitted_locations = self._removed_locations
+        self._removed_locations = []
+        for i, (location, cutout) in enumerate(zip(self._cutout_locations, self._cutouts)):
+            cutout_blits, cutout_total = cutout.update_cutouts()
+            blits += cutout_blits
+            total += cutout_total + 1
+            viewport = tuple(cutout.viewport)
+            # Reblit it if it's changed, or if anything's been drawn over it: either directly onto this surface, or by
+            # reblitting an earlier cutout that overlaps it.
+            if (cutout.dirty or viewport != self._cutout_viewports[i] or self._drawn_on or
+                    location.collidelist(reblitted_locations) != -1):
+                self._blit(cutout, location)
+                cutout.dirty = False
+                self._cutout_viewports[i] = viewport
+                reblitted_locations.append(location)
+                blits += 1
+        if blits:
+            self._mark_dirty(direct=False)
+        self.cutout_changes = reblitted_locations
+        self._drawn_on = False
+        return blits, total
+
+    def _mark_dirty(self, direct=True):
+        """Records that this surface has been drawn on, and so have the surfaces that it is a subsurface or a cutout of.
+        'direct' is whether it has been drawn on directly, rather than via update_cutouts."""
+
+        surface = self
+        while isinstance(surface, Surface):
+            surface.dirty = True
+            if direct:
+                surface._drawn_on = True
+            # A subsurface's pixels are its parent's pixels, so its parent has been drawn on directly as well. Whereas a
+            # cutout will need reblitting into its parent, which is what the parent's dirty flag is for.
+            direct = direct and surface._is_subsurface
+            surface = surface.get_parent()
 
     def set_offset(self, offset):
         """Set the offset of a non-subsurface Surface."""
@@ -144,11 +228,21 @@ class Surface(pygame.Surface):
     def get_viewport_offset(self):
         return self.viewport.topleft
 
+    def fill(self, *args, **kwargs):
+        self._mark_dirty()
+        return super(Surface, self).fill(*args, **kwargs)
+
     def blit(self, source, dest=(0, 0), area=None, *args, **kwargs):  # Added default argument to dest.
         """Enhanced version of blit. If 'dest' is a Rect then the blitting will be clipped to the rectangular area it
         specifies. If 'area' is not passed as an argument then the blitting will be clipped to the viewport of the
         source."""
 
+        self._mark_dirty()
+        return self._blit(source, dest, area, *args, **kwargs)
+
+    def _blit(self, source, dest=(0, 0), area=None, *args, **kwargs):
+        """As blit, without marking this surface as dirty."""
+
         # Instance check so that we don't try doing this with the original pygame.Surfaces which some pygame functions
         # still return.
         if isinstance(source, Surface) and area is None:
@@ -207,6 +301,11 @@ Rect = pygame.Rect
 quit = pygame.quit
 error = pygame.error
 
+# Surface flags
+SRCALPHA = pygame.SRCALPHA
+BLEND_RGBA_MAX = pygame.BLEND_RGBA_MAX
+BLEND_RGB_MULT = pygame.BLEND_RGB_MULT
+
 # Event types
 NOEVENT = pygame.NOEVENT
 QUIT = pygame.QUIT
@@ -273,6 +372,7 @@ class event:
     set_grab = pygame.event.set_grab
     wait = pygame.event.wait
     poll = pygame.event.poll
+    post = pygame.event.post
     Event = pygame.event.Event
 
     @classmethod
@@ -377,3 +477,20 @@ class key:
 K_SHIFT = (K_LSHIFT, K_RSHIFT)
 K_ENTER = (K_KP_ENTER, K_RETURN)
 MOUSEEVENTS = (MOUSEBUTTONUP, MOUSEBUTTONDOWN, MOUSEMOTION)
+
+
+def merge_rects(rects):
+    """Takes a list of Rects and returns a list of Rects covering (at least) the same area, in which none of them
+    overlap, by merging together those that do. Empty Rects are dropped."""
+
+    merged_rects = []
+    for rect in rects:
+        if not rect:
+            continue
+        rect = Rect(rect)
+        index = rect.collidelist(merged_rects)
+        while index != -1:
+            rect.union_ip(merged_rects.pop(index))
+            index = rect.collidelist(merged_rects)
+        merged_rects.append(rect)
+    return merged_rects
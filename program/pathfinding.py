@@ -0,0 +1,365 @@
+"""Finding paths through a map, for entities to follow.
+
+Paths are found over the grid of cells of the map, moving only between cells that a (corporeal, flightless) entity can
+stand in without falling. An entity may move from a cell to any of the eight cells around it (moving diagonally only
+if the two cells either side of the diagonal can also be stood in), or up or down a z-level wherever Simulation would
+let it do so; in practice this means by stairs.
+
+Searching the whole grid for a long path is slow, so paths are found hierarchically, in the style of HPA*. The map is
+split up into square clusters of config.PATHFINDING_CLUSTER_SIZE by config.PATHFINDING_CLUSTER_SIZE cells on each
+z-level. When the map is loaded, we find the places at which it is possible to move between neighbouring clusters, and
+the shortest paths between those places within each cluster. A path is then found by searching this (much smaller)
+graph of places, and then joining up the precomputed paths.
+
+Paths are cached. When a tile changes (via Map.set) just the clusters around it are recomputed, and just the cached
+paths going through those clusters are forgotten."""
+
+import collections
+import heapq
+import itertools
+import math
+
+
+import Game.config.config as config
+
+
+_orthogonal_moves = ((1, 0), (-1, 0), (0, 1), (0, -1))
+_diagonal_moves = ((1, 1), (1, -1), (-1, 1), (-1, -1))
+_diagonal_cost = math.sqrt(2)
+# How long a run of cells along the border between two clusters has to be, to be crossable at both ends rather than just
+# in the middle.
+_long_run = 6
+
+# Stands in for the goal when searching the graph of places.
+_GOAL = object()
+
+
+def cluster_of(cell):
+    """The cluster that the given cell is in."""
+    x, y, z = cell
+    return x // config.PATHFINDING_CLUSTER_SIZE, y // config.PATHFINDING_CLUSTER_SIZE, z
+
+
+def _neighbouring_clusters(cluster):
+    cluster_x, cluster_y, z = cluster
+    return ((cluster_x + 1, cluster_y, z), (cluster_x - 1, cluster_y, z), (cluster_x, cluster_y + 1, z),
+            (cluster_x, cluster_y - 1, z), (cluster_x, cluster_y, z + 1), (cluster_x, cluster_y, z - 1))
+
+
+def _estimate(cell, other):
+    """A lower bound on the cost of moving between the two cells."""
+    dist_x = abs(cell[0] - other[0])
+    dist_y = abs(cell[1] - other[1])
+    return max(dist_x, dist_y) + (_diagonal_cost - 1) * min(dist_x, dist_y) + abs(cell[2] - other[2])
+
+
+def _trace(parents, cell):
+    """Follows the given parents back from the given cell to give a path."""
+    path = []
+    while cell is not None:
+        path.append(cell)
+        cell = parents[cell]
+    path.reverse()
+    return path
+
+
+class Pathfinder:
+    """Finds paths through a map. See the module docstring for details."""
+
+    def __init__(self, map_, progress=None):
+        """If 'progress' is given then it is called every so often with how far through the precomputing described in
+        the module docstring (which can take a while on a large map) this is, as a fraction between 0 and 1."""
+        self._map = map_
+        self._standable = {}  # Cache of which cells can be stood in
+        self._stairs = collections.defaultdict(set)  # {cluster: cells with stairs in them}
+        self._links = {}  # {(cluster, other cluster): [(cell, other cell, cost)]} ways of moving between clusters
+        self._out_links = {}  # {cluster: {cell: [(other cell, cost)]}} the above, by where they start from
+        self._intra = {}  # {cluster: {cell: {other cell: (cost, path)}}} paths within a cluster between the above
+        self._cache = collections.OrderedDict()  # {(start, goal): path}, from least to most recently used
+        self._cache_by_cluster = collections.defaultdict(set)  # {cluster: keys of cached paths going through it}
+        self._failures = set()  # (start, goal) pairs with no path between them
+
+        for pos, tile in map_:
+            if tile.suspend_up or tile.suspend_down:
+                self._stairs[cluster_of(pos)].add(tuple(pos))
+        bounds = map_.bounds
+        size = config.PATHFINDING_CLUSTER_SIZE
+        self._rebuild({(cluster_x, cluster_y, z)
+                       for z in range(bounds.min_z, bounds.max_z + 1)
+                       for cluster_x in range(bounds.min_x // size, bounds.max_x // size + 1)
+                       for cluster_y in range(bounds.min_y // size, bounds.max_y // size + 1)}, progress)
+
+    def standable(self, cell):
+        """Whether an entity can stand in the given cell without falling."""
+        try:
+            return self._standable[cell]
+        except KeyError:
+            x, y, z = cell
+            tile = self._map.get(x, y, z)
+            if tile.solid or tile.boundary:
+                result = False
+            elif tile.floor or tile.suspend_up or tile.suspend_down:
+                result = True
+            else:
+                below = self._map.get(x, y, z - 1)
+                result = below.solid or below.boundary
+            self._standable[cell] = result
+            return result
+
+    def moves(self, cell):
+        """Iterates over the (cell, cost) of every cell that an entity standing in the given cell can move straight
+        to."""
+        x, y, z = cell
+        standable = self.standable
+        for offset_x, offset_y in _orthogonal_moves:
+            other = (x + offset_x, y + offset_y, z)
+            if standable(other):
+                yield other, 1
+        for offset_x, offset_y in _diagonal_moves:
+            other = (x + offset_x, y + offset_y, z)
+            if standable(other) and standable((x + offset_x, y, z)) and standable((x, y + offset_y, z)):
+                yield other, _diagonal_cost
+        # The same conditions as Simulation._move_entity_vert
+        up = (x, y, z + 1)
+        if standable(up) and not self._map.get(x, y, z + 1).floor:
+            yield up, 1
+        down = (x, y, z - 1)
+        if standable(down) and not self._map.get(x, y, z).floor:
+            yield down, 1
+
+    def path(self, start, goal):
+        """The shortest path between the given cells, as a list of cells starting with 'start' and ending with 'goal';
+        or None if there is no such path. (Strictly speaking, a short path rather than the shortest: paths between
+        clusters have to go via the places found between them, so may be a little longer than necessary.)"""
+        start = tuple(start)
+        goal = tuple(goal)
+        key = (start, goal)
+        if key in self._failures:
+            return None
+        try:
+            path = self._cache[key]
+        except KeyError:
+            pass
+        else:
+            self._cache.move_to_end(key)
+            return path
+
+        path = self._find_path(start, goal)
+        if path is None:
+            if len(self._failures) >= config.PATHFINDING_CACHE_SIZE:
+                self._failures.clear()
+            self._failures.add(key)
+        else:
+            self._cache[key] = path
+            for cluster in {cluster_of(cell) for cell in path}:
+                self._cache_by_cluster[cluster].add(key)
+            if len(self._cache) > config.PATHFINDING_CACHE_SIZE:
+                old_key, old_path = self._cache.popitem(last=False)
+                for cluster in {cluster_of(cell) for cell in old_path}:
+                    self._cache_by_cluster[cluster].discard(old_key)
+        return path
+
+    def tiles_changed(self, x, y, z):
+        """Should be called whenever the tile at the given position changes."""
+        cell = (x, y, z)
+        self._standable.pop(cell, None)
+        self._standable.pop((x, y, z + 1), None)
+        tile = self._map.get(x, y, z)
+        if tile.suspend_up or tile.suspend_down:
+            self._stairs[cluster_of(cell)].add(cell)
+        else:
+            self._stairs[cluster_of(cell)].discard(cell)
+
+        clusters = {cluster_of(cell), cluster_of((x, y, z + 1))}
+        changed_clusters = self._rebuild(clusters)
+        for cluster in changed_clusters:
+            for key in self._cache_by_cluster.pop(cluster, ()):
+                self._cache.pop(key, None)
+        self._failures.clear()
+
+    def _find_path(self, start, goal):
+        if not (self.standable(start) and self.standable(goal)):
+            return None
+        if start == goal:
+            return [start]
+        start_cluster = cluster_of(start)
+        if start_cluster == cluster_of(goal):
+            # Usually the shortest path, if there is one, stays within the cluster.
+            path = self._search(start, goal, start_cluster)
+            if path is not None:
+                return path
+        return self._hierarchical_search(start, goal)
+
+    def _search(self, start, goal, cluster=None):
+        """A* search for a path between two cells, optionally only moving within the given cluster."""
+        costs = {start: 0}
+        parents = {start: None}
+        counter = itertools.count()
+        heap = [(_estimate(start, goal), next(counter), start)]
+        while heap:
+            _, _, cell = heapq.heappop(heap)
+            if cell == goal:
+                return _trace(parents, cell)
+            cost = costs[cell]
+            for other, step_cost in self.moves(cell):
+                if cluster is not None and cluster_of(other) != cluster:
+                    continue
+                other_cost = cost + step_cost
+                if other_cost < costs.get(other, math.inf):
+                    costs[other] = other_cost
+                    parents[other] = cell
+                    heapq.heappush(heap, (other_cost + _estimate(other, goal), next(counter), other))
+        return None
+
+    def _paths_within(self, start, cluster, targets):
+        """Dijkstra's algorithm: the shortest paths from the start cell to each of the target cells, moving only within
+        the given cluster. Returns {target: (cost, path)} for those targets that can be reached."""
+        targets = set(targets)
+        costs = {start: 0}
+        parents = {start: None}
+        found = {}
+        heap = [(0, start)]
+        while heap and len(found) < len(targets):
+            cost, cell = heapq.heappop(heap)
+            if cost > costs[cell]:
+                continue
+            if cell in targets:
+                found[cell] = (cost, _trace(parents, cell))
+            for other, step_cost in self.moves(cell):
+                if cluster_of(other) != cluster:
+                    continue
+                other_cost = cost + step_cost
+                if other_cost < costs.get(other, math.inf):
+                    costs[other] = other_cost
+                    parents[other] = cell
+                    heapq.heappush(heap, (other_cost, other))
+        return found
+
+    def _hierarchical_search(self, start, goal):
+        """A* search over the graph of places at which it is possible to move between clusters."""
+        start_cluster = cluster_of(start)
+        goal_cluster = cluster_of(goal)
+        from_start = self._paths_within(start, start_cluster, self._intra.get(start_cluster, {}).keys())
+        # Moving within a cluster is symmetric, so paths from the goal can be reversed to give paths to it.
+        to_goal = self._paths_within(goal, goal_cluster, self._intra.get(goal_cluster, {}).keys())
+
+        costs = {}
+        parents = {}  # {place: (previous place, path from it)}
+        counter = itertools.count()
+        heap = []
+
+        def relax(place, cost, previous, path):
+            if cost < costs.get(place, math.inf):
+                costs[place] = cost
+                parents[place] = (previous, path)
+                estimate = 0 if place is _GOAL else _estimate(place, goal)
+                heapq.heappush(heap, (cost + estimate, next(counter), place))
+
+        for place, (cost, path) in from_start.items():
+            relax(place, cost, None, path)
+        if start in to_goal:
+            relax(_GOAL, to_goal[start][0], None, to_goal[start][1][::-1])
+
+        while heap:
+            _, _, place = heapq.heappop(heap)
+            if place is _GOAL:
+                return self._join(parents, place)
+            cost = costs[place]
+            if place in to_goal:
+                goal_cost, goal_path = to_goal[place]
+                relax(_GOAL, cost + goal_cost, place, goal_path[::-1])
+            cluster = cluster_of(place)
+            for other, (step_cost, path) in self._intra.get(cluster, {}).get(place, {}).items():
+                relax(other, cost + step_cost, place, path)
+            for other, step_cost in self._out_links.get(cluster, {}).get(place, ()):
+                relax(other, cost + step_cost, place, [place, other])
+        return None
+
+    @staticmethod
+    def _join(parents, place):
+        """Joins up the paths found by _hierarchical_search."""
+        paths = []
+        while place is not None:
+            place, path = parents[place]
+            paths.append(path)
+        joined = list(paths.pop())
+        while paths:
+            joined.extend(paths.pop()[1:])
+        return joined
+
+    def _rebuild(self, clusters, progress=None):
+        """Recomputes the ways of moving between the given clusters and their neighbours, and the paths within all of
+        those clusters. Returns every cluster that has changed. If 'progress' is given then it is called after each
+        cluster with how far through it is, as a fraction between 0 and 1."""
+        changed_clusters = set(clusters)
+        for cluster in clusters:
+            changed_clusters.update(_neighbouring_clusters(cluster))
+        work = len(clusters) + len(changed_clusters)
+        done = 0
+
+        for cluster in clusters:
+            for other in _neighbouring_clusters(cluster):
+                self._links[(cluster, other)] = self._find_links(cluster, other)
+                # If the other cluster is being rebuilt too then this is done when we get to it.
+                if other not in clusters:
+                    self._links[(other, cluster)] = self._find_links(other, cluster)
+            done += 1
+            if progress is not None:
+                progress(done / work)
+        for cluster in changed_clusters:
+            out_links = collections.defaultdict(list)
+            places = set()
+            for other in _neighbouring_clusters(cluster):
+                for cell, other_cell, cost in self._links.get((cluster, other), ()):
+                    out_links[cell].append((other_cell, cost))
+                    places.add(cell)
+                for other_cell, cell, cost in self._links.get((other, cluster), ()):
+                    places.add(cell)
+            self._out_links[cluster] = dict(out_links)
+            self._intra[cluster] = {place: self._paths_within(place, cluster, places) for place in places}
+            done += 1
+            if progress is not None:
+                progress(done / work)
+        return changed_clusters
+
+    def _find_links(self, cluster, other):
+        """The places at which it is possible to move from one cluster to another, as a list of (cell in cluster, cell
+        in other, cost)."""
+        cluster_x, cluster_y, z = cluster
+        other_x, other_y, other_z = other
+        size = config.PATHFINDING_CLUSTER_SIZE
+        if z != other_z:
+            # Moving vertically: only possible via stairs, in either cluster.
+            candidates = set(self._stairs.get(cluster, ()))
+            candidates.update((x, y, z) for x, y, _ in self._stairs.get(other, ()))
+            return [(cell, other_cell, cost) for cell in sorted(candidates)
+                    for other_cell, cost in self.moves(cell) if other_cell[2] == other_z]
+
+        # Moving horizontally: find the runs of cells along the border between the clusters which can be moved across,
+        # and use just the middle of each short run, or both ends of each long one. (Diagonal moves across the border
+        # are only possible next to orthogonal ones, so don't add any new ways of getting across.)
+        if other_x > cluster_x:
+            border = [((other_x * size - 1, cluster_y * size + i, z), (other_x * size, cluster_y * size + i, z))
+                      for i in range(size)]
+        elif other_x < cluster_x:
+            border = [((cluster_x * size, cluster_y * size + i, z), (cluster_x * size - 1, cluster_y * size + i, z))
+                      for i in range(size)]
+        elif other_y > cluster_y:
+            border = [((cluster_x * size + i, other_y * size - 1, z), (cluster_x * size + i, other_y * size, z))
+                      for i in range(size)]
+        else:
+            border = [((cluster_x * size + i, cluster_y * size, z), (cluster_x * size + i, cluster_y * size - 1, z))
+                      for i in range(size)]
+        links = []
+        run = []
+        for cell, other_cell in border + [(None, None)]:
+            if cell is not None and self.standable(cell) and self.standable(other_cell):
+                run.append((cell, other_cell, 1))
+            elif run:
+                if len(run) >= _long_run:
+                    links.append(run[0])
+                    links.append(run[-1])
+                else:
+                    links.append(run[len(run) // 2])
+                run = []
+        return links
@@ -0,0 +1,259 @@
+"""Records the inputs of a play session, so that the session can be replayed exactly, without a display and as fast as
+possible. (Which makes for a reproducible workload when profiling changes to e.g. collision detection.)
+
+Every tick depends only on the state of the simulation (see game.SimulationState) and on the inputs given to it. So a
+recording is just the inputs of every tick, plus the state every config.RECORDING_KEYFRAME_INTERVAL ticks ('keyframes')
+so that a replay may start from partway through, plus the state at the very end, to check a replay against. Console
+commands can change the state too (e.g. noclip or setspeed), so a keyframe is also recorded on any tick at which they
+have, and a replay picks up those changes from it. The config settings that affect physics are saved in the header, and
+must match for a recording to be replayed.
+
+The file is a header followed by a sequence of chunks. Each chunk starts with a keyframe, followed by the inputs of the
+ticks after it, and is compressed separately, so that a replay starting partway through needn't decompress any of the
+chunks before the one it starts in. The last chunk holds just the final state. Floats are stored exactly, as doubles,
+so replaying gives the same results bit for bit."""
+
+import ast
+import collections
+import struct
+import zlib
+
+
+import Game.config.config as config
+import Game.config.internal as internal
+
+import Game.program.misc.exceptions as exceptions
+import Game.program.misc.helpers as helpers
+
+import Game.program.game as game
+
+
+_magic = b'AGREC'
+_version = 2
+
+_header_format = struct.Struct('<BI')  # version, length of the header dict
+_chunk_format = struct.Struct('<III')  # first tick, number of ticks, length of the compressed chunk
+# Player x, y, z, fall counter, speed multiplier, flight, incorporeal, camera offset x, y, number of waypoints in the
+# move command
+_state_format = struct.Struct('<ddiid??ddI')
+_waypoint_format = struct.Struct('<ddi')
+_tick_format = struct.Struct('<B')  # Number of inputs
+_input_type_format = struct.Struct('<B')
+_action_format = struct.Struct('<B')
+_pos_format = struct.Struct('<dd')
+
+# The numbers that each input type and action are stored as are their indices in these.
+_input_types = (internal.InputTypes.ACTION, internal.InputTypes.MOVE_ABS, internal.InputTypes.MOVE_CAMERA)
+_actions = (internal.Move.UP, internal.Move.DOWN, internal.Move.LEFT, internal.Move.RIGHT,
+            internal.Action.VERTICAL_UP, internal.Action.VERTICAL_DOWN)
+
+
+def _physics_settings():
+    """The config settings which affect the results of ticks."""
+    return {'physics_framerate': config.PHYSICS_FRAMERATE,
+            'fall_ticks': config.FALL_TICKS,
+            'use_distance_fields': config.USE_DISTANCE_FIELDS,
+            'distance_field_resolution': config.DISTANCE_FIELD_RESOLUTION,
+            'distance_field_exact_fallback': config.DISTANCE_FIELD_EXACT_FALLBACK}
+
+
+def _settings(player):
+    """Those parts of the state which only console commands change. (See game.Simulation.restore_settings.)"""
+    return player.speedmult, bool(player.flight), bool(player.incorporeal)
+
+
+def _pack_state(state):
+    abs_move_command = state.abs_move_command or ()
+    pieces = [_state_format.pack(state.player_pos.x, state.player_pos.y, state.player_pos.z, state.fall_counter,
+                                 state.speedmult, state.flight, state.incorporeal, state.camera_offset.x,
+                                 state.camera_offset.y, len(abs_move_command))]
+    pieces.extend(_waypoint_format.pack(*waypoint) for waypoint in abs_move_command)
+    return b''.join(pieces)
+
+
+def _unpack_state(data, offset):
+    """Returns the SimulationState stored at the given offset, and the offset just after it."""
+    (x, y, z, fall_counter, speedmult, flight, incorporeal, camera_x, camera_y,
+     num_waypoints) = _state_format.unpack_from(data, offset)
+    offset += _state_format.size
+    waypoints = []
+    for _ in range(num_waypoints):
+        waypoint_x, waypoint_y, waypoint_z = _waypoint_format.unpack_from(data, offset)
+        offset += _waypoint_format.size
+        waypoints.append(helpers.XYZPos(x=waypoint_x, y=waypoint_y, z=waypoint_z))
+    state = game.SimulationState(player_pos=helpers.XYZPos(x=x, y=y, z=z),
+                                 fall_counter=fall_counter,
+                                 speedmult=speedmult,
+                                 flight=flight,
+                                 incorporeal=incorporeal,
+                                 camera_offset=helpers.XYPos(x=camera_x, y=camera_y),
+                                 # None rather than empty, as Simulation uses None for there being no such command
+                                 abs_move_command=tuple(waypoints) if waypoints else None)
+    return state, offset
+
+
+def _pack_inputs(inputs):
+    pieces = [_tick_format.pack(len(inputs))]
+    for play_inp, input_type in inputs:
+        pieces.append(_input_type_format.pack(_input_types.index(input_type)))
+        if input_type == internal.InputTypes.ACTION:
+            pieces.append(_action_format.pack(_actions.index(play_inp)))
+        else:
+            pieces.append(_pos_format.pack(play_inp.x, play_inp.y))
+    return b''.join(pieces)
+
+
+def _unpack_inputs(data, offset):
+    """Returns the inputs of the tick stored at the given offset, and the offset just after them."""
+    num_inputs, = _tick_format.unpack_from(data, offset)
+    offset += _tick_format.size
+    inputs = []
+    for _ in range(num_inputs):
+        input_type_index, = _input_type_format.unpack_from(data, offset)
+        offset += _input_type_format.size
+        input_type = _input_types[input_type_index]
+        if input_type == internal.InputTypes.ACTION:
+            action_index, = _action_format.unpack_from(data, offset)
+            offset += _action_format.size
+            inputs.append((_actions[action_index], input_type))
+        else:
+            x, y = _pos_format.unpack_from(data, offset)
+            offset += _pos_format.size
+            inputs.append((helpers.XYPos(x=x, y=y), input_type))
+    return inputs, offset
+
+
+class Recorder:
+    """Records the inputs of every tick to a file. Set it as Simulation.recorder to use it, and call 'close' once
+    finished, to save the final state of the simulation."""
+
+    def __init__(self, file_path, map_name, screen_size, keyframe_interval=config.RECORDING_KEYFRAME_INTERVAL):
+        self.keyframe_interval = keyframe_interval
+        self.ticks = 0
+        self._chunk = []
+        self._chunk_first_tick = 0
+        self._simulation = None
+        self._settings = None  # The settings as of the last tick, to tell when a console command has changed them
+        self._file = open(file_path, 'wb')
+        header = repr({'map_name': map_name,
+                       'screen_size': tuple(screen_size),
+                       'physics_settings': _physics_settings(),
+                       'keyframe_interval': keyframe_interval}).encode()
+        self._file.write(_magic + _header_format.pack(_version, len(header)) + header)
+
+    def record(self, simulation, inputs):
+        """Records the inputs of a tick. Should be called just before the tick is run."""
+        self._simulation = simulation
+        settings = _settings(simulation.game_objects.player)
+        # A keyframe every keyframe_interval ticks, plus one whenever a console command has changed the settings.
+        if self.ticks - self._chunk_first_tick >= self.keyframe_interval or settings != self._settings:
+            self._settings = settings
+            self._write_chunk()
+            self._chunk.append(_pack_state(simulation.snapshot()))
+        self._chunk.append(_pack_inputs(inputs))
+        self.ticks += 1
+
+    def _write_chunk(self):
+        if self._chunk:
+            compressed = zlib.compress(b''.join(self._chunk))
+            num_ticks = self.ticks - self._chunk_first_tick
+            self._file.write(_chunk_format.pack(self._chunk_first_tick, num_ticks, len(compressed)) + compressed)
+        self._chunk = []
+        self._chunk_first_tick = self.ticks
+
+    def close(self):
+        """Finishes the recording, saving the state of the simulation after the last tick."""
+        if self._file.closed:
+            return
+        self._write_chunk()
+        if self._simulation is not None:
+            self._chunk.append(_pack_state(self._simulation.snapshot()))
+            self._write_chunk()
+        self._file.close()
+
+
+class Recording:
+    """A recording made by a Recorder."""
+
+    def __init__(self, file_path):
+        with open(file_path, 'rb') as file:
+            self._data = file.read()
+        data = self._data
+        try:
+            if not data.startswith(_magic):
+                raise exceptions.RecordingLoadException
+            offset = len(_magic)
+            version, header_length = _header_format.unpack_from(data, offset)
+            if version != _version:
+                raise exceptions.RecordingLoadException
+            offset += _header_format.size
+            header = ast.literal_eval(data[offset:offset + header_length].decode())
+            offset += header_length
+            self.map_name = header['map_name']
+            self.screen_size = header['screen_size']
+            self.physics_settings = header['physics_settings']
+            self.keyframe_interval = header['keyframe_interval']
+
+            # {first tick: (number of ticks, where the compressed chunk starts, how long it is)}
+            self._chunks = collections.OrderedDict()
+            while offset < len(data):
+                first_tick, num_ticks, length = _chunk_format.unpack_from(data, offset)
+                offset += _chunk_format.size
+                self._chunks[first_tick] = num_ticks, offset, length
+                offset += length
+        # SyntaxError from ast.literal_eval
+        except (struct.error, KeyError, TypeError, ValueError, SyntaxError) as e:
+            raise exceptions.RecordingLoadException from e
+        if not self._chunks:
+            raise exceptions.RecordingLoadException
+        self.ticks = sum(num_ticks for num_ticks, _, _ in self._chunks.values())
+
+    def _chunk(self, first_tick):
+        num_ticks, offset, length = self._chunks[first_tick]
+        return zlib.decompress(self._data[offset:offset + length])
+
+    @property
+    def final_state(self):
+        """The state of the simulation after the last tick, or None if nothing was recorded."""
+        last_tick, (num_ticks, _, _) = next(reversed(self._chunks.items()))
+        if num_ticks != 0:
+            return None  # The recording wasn't closed properly
+        state, _ = _unpack_state(self._chunk(last_tick), 0)
+        return state
+
+    def keyframes(self):
+        """The ticks at which there are keyframes."""
+        return [first_tick for first_tick, (num_ticks, _, _) in self._chunks.items() if num_ticks != 0]
+
+    def replay(self, simulation, start_tick=0, end_tick=None):
+        """Runs the recorded ticks from 'start_tick' up to (but not including) 'end_tick' on the given simulation, as
+        fast as possible. The map should already be loaded. If 'start_tick' isn't 0 then the simulation is restored to
+        the keyframe before it, and the ticks between the keyframe and 'start_tick' are run as well. Returns the number
+        of ticks run."""
+
+        if self.physics_settings != _physics_settings():
+            raise exceptions.RecordingLoadException
+        if end_tick is None:
+            end_tick = self.ticks
+        keyframe = max((tick for tick in self.keyframes() if tick <= start_tick), default=None)
+        if keyframe is None:
+            return 0
+        ticks_run = 0
+        restored = False
+        for first_tick, (num_ticks, _, _) in self._chunks.items():
+            if first_tick < keyframe or num_ticks == 0:
+                continue
+            if first_tick >= end_tick:
+                break
+            data = self._chunk(first_tick)
+            state, offset = _unpack_state(data, 0)
+            if restored:
+                simulation.restore_settings(state)
+            else:
+                simulation.restore(state)
+                restored = True
+            for tick in range(first_tick, min(first_tick + num_ticks, end_tick)):
+                inputs, offset = _unpack_inputs(data, offset)
+                simulation._tick(inputs)
+                ticks_run += 1
+        return ticks_run
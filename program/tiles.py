@@ -1,5 +1,6 @@
 import collections
 import math
+import numpy as np
 import Tools as tools
 
 
@@ -7,7 +8,9 @@ import Game.config.config as config
 import Game.config.internal as internal
 import Game.config.strings as strings
 
+import Game.program.misc.assets as assets
 import Game.program.misc.exceptions as exceptions
+import Game.program.misc.geometry as geometry
 import Game.program.misc.helpers as helpers
 import Game.program.misc.sdl as sdl
 
@@ -20,11 +23,17 @@ def all_tiles():
     return {key: val for key, val in TileBase.subclasses().items() if val not in omit_tiles}
 
 
-class TileBase(helpers.HasAppearances, tools.HasPositionMixin, tools.SubclassTrackerMixin('definition'),
+class TileBase(helpers.HasAppearances, tools.SubclassTrackerMixin('definition'),
                appearance_files_location=config.TILE_FOLDER):
     """Base class for all tiles. Subclasses should:
     - Define an appearance. This is done either by setting a string type 'appearance_filename' attribute, or by setting
-    a collections.OrderedDict type 'appearance_filenames' attribute."""
+    a collections.OrderedDict type 'appearance_filenames' attribute.
+
+    Tiles do not know where they are. A map creates just one tile for each type of tile it uses (each type being a
+    kind of tile together with its rotation and appearance), which is then shared between every cell of that type. As
+    such tiles should not be modified once created. (The map editor, which creates a separate tile for every cell, is
+    the exception.) Their geometry is defined relative to the top left corner of the tile, and the positions passed to
+    their collision methods should be relative to that same corner."""
 
     solid = False         # Whether corporeal entities cannot pass through it
     floor = False         # Whether entities can move downwards through it vertically
@@ -36,10 +45,11 @@ class TileBase(helpers.HasAppearances, tools.HasPositionMixin, tools.SubclassTra
 
     def __init__(self, **kwargs):
         super(TileBase, self).__init__(**kwargs)
-        self._geom_rect = sdl.Rect(self.x * size, self.y * size, size, size)
+        self._geom_rect = sdl.Rect(0, 0, size, size)
 
     def wall_collide(self, entity, pos):
-        """Whether or not the given entity at the given position will collide with this tile's wall."""
+        """Whether or not the given entity at the given position (relative to the tile) will collide with this tile's
+        wall."""
         # If the tile has a wall to collide with
         if self.boundary or (self.solid and not entity.incorporeal):
             # And the entity collides with the square that is the tile
@@ -49,7 +59,8 @@ class TileBase(helpers.HasAppearances, tools.HasPositionMixin, tools.SubclassTra
         return False
 
     def floor_collide(self, entity, pos):
-        """Whether or not the given entity at the given position will collide (i.e. can stand on) this tile's wall."""
+        """Whether or not the given entity at the given position (relative to the tile) will collide (i.e. can stand
+        on) this tile's wall."""
         # If the tile has a floor to collide with
         if self.floor and not entity.incorporeal:
             # And the entity collides with the square that is the tile
@@ -59,8 +70,8 @@ class TileBase(helpers.HasAppearances, tools.HasPositionMixin, tools.SubclassTra
         return False
 
     def suspend_collide(self, entity, pos):
-        """Whether or not the given entity at the given position will collide (i.e. can hold on to) this tile's
-        suspension."""
+        """Whether or not the given entity at the given position (relative to the tile) will collide (i.e. can hold
+        on to) this tile's suspension."""
         # If the tile has a suspension to collide with
         if self.suspend_up or self.suspend_down:
             # And the entity collides with the square that is the tile
@@ -74,6 +85,32 @@ class TileBase(helpers.HasAppearances, tools.HasPositionMixin, tools.SubclassTra
                 return True
         return False
 
+    def wall_collide_many(self, radii, xs, ys, incorporeal):
+        """As wall_collide, but for many entities at once. The entities are given as arrays of their radii, their
+        positions (relative to the tile), and whether they are incorporeal. Returns a boolean array."""
+        if self.boundary:
+            return self._wall_geom_collide_many(radii, xs, ys)
+        elif self.solid:
+            return np.logical_not(incorporeal) & self._wall_geom_collide_many(radii, xs, ys)
+        else:
+            return np.zeros(np.shape(xs), dtype=bool)
+
+    def floor_collide_many(self, radii, xs, ys, incorporeal):
+        """As floor_collide, but for many entities at once, in the same way as wall_collide_many."""
+        if self.floor:
+            return np.logical_not(incorporeal) & self._floor_geom_collide_many(radii, xs, ys)
+        else:
+            return np.zeros(np.shape(xs), dtype=bool)
+
+    def suspend_collide_many(self, radii, xs, ys, incorporeal):
+        """As suspend_collide, but for many entities at once, in the same way as wall_collide_many."""
+        collide = np.zeros(np.shape(xs), dtype=bool)
+        if self.suspend_up or self.suspend_down:
+            collide |= self._wall_geom_collide_many(radii, xs, ys)
+        if self.floor:
+            collide |= incorporeal & self._floor_geom_collide_many(radii, xs, ys)
+        return collide
+
     def _wall_geom_collide(self, entity, pos):
         """Whether or not the given entity at the given position intersects with the wall geometry of the tile."""
         entity_circle = tools.Disc(entity.radius, pos)
@@ -84,6 +121,14 @@ class TileBase(helpers.HasAppearances, tools.HasPositionMixin, tools.SubclassTra
         entity_circle = tools.Disc(entity.radius, pos)
         return entity_circle.colliderect(self._geom_rect)
 
+    def _wall_geom_collide_many(self, radii, xs, ys):
+        """As _wall_geom_collide, for many discs at once."""
+        return geometry.disc_rect(radii, xs, ys, self._geom_rect)
+
+    def _floor_geom_collide_many(self, radii, xs, ys):
+        """As _floor_geom_collide, for many discs at once."""
+        return geometry.disc_rect(radii, xs, ys, self._geom_rect)
+
 
 class Empty(TileBase):
     """Represents a single empty tile of the map."""
@@ -113,10 +158,10 @@ class Rotatable(TileBase):
             cls.left_appearances = collections.OrderedDict()
             cls.down_appearances = collections.OrderedDict()
             cls.right_appearances = collections.OrderedDict()
-            for key, appearance in cls.appearances.items():
-                cls.left_appearances[key] = sdl.transform.rotate(appearance, 90)
-                cls.down_appearances[key] = sdl.transform.rotate(appearance, 180)
-                cls.right_appearances[key] = sdl.transform.rotate(appearance, -90)
+            for key, appearance_path in cls._appearance_paths.items():
+                assets.manager.load_into(cls.left_appearances, key, appearance_path, 90)
+                assets.manager.load_into(cls.down_appearances, key, appearance_path, 180)
+                assets.manager.load_into(cls.right_appearances, key, appearance_path, -90)
 
     def __init__(self, rotation=internal.TileRotation.UP, **kwargs):
         self.rotation = rotation
@@ -233,6 +278,40 @@ class Wall(Rotatable, Floor, TileBase):
                   internal.Geometry.CIRCLE: circle, internal.Geometry.DOUBLE_CONCAVE: double_concave,
                   internal.Geometry.DOUBLE_CONVEX: double_convex, internal.Geometry.RECTANGLE: rectangle}
 
+    # As CollisionFunctions, but testing many discs at once; see TileBase.wall_collide_many. These must give the same
+    # answers as their counterparts above.
+    class BatchCollisionFunctions:
+        def square(self, radii, xs, ys):
+            return geometry.disc_rect(radii, xs, ys, self._geom_rect)
+
+        def rectangle(self, radii, xs, ys):
+            return geometry.disc_rect(radii, xs, ys, self._geom_rect)
+
+        def angled(self, radii, xs, ys):
+            return geometry.disc_irat(radii, xs, ys, self._geom_irat_corner, size, self._geom_irat_direction)
+
+        def concave(self, radii, xs, ys):
+            collide_interior = geometry.disc_rect(radii, xs, ys, self._geom_rect) & np.logical_not(
+                geometry.disc_disc(radii, xs, ys, self._geom_circle_center, self._geom_circle_radius))
+            return collide_interior | geometry.disc_arc(radii, xs, ys, self._geom_circle_center,
+                                                        self._geom_circle_radius, *self._geom_arc_angles)
+
+        def convex(self, radii, xs, ys):
+            return geometry.disc_rect(radii, xs, ys, self._geom_rect) & \
+                geometry.disc_disc(radii, xs, ys, self._geom_circle_center, self._geom_circle_radius)
+
+        def circle(self, radii, xs, ys):
+            return geometry.disc_disc(radii, xs, ys, self._geom_circle_center, self._geom_circle_radius)
+
+        # The same geometry as concave and convex respectively, just with differently placed rects and discs.
+        double_concave = concave
+        double_convex = convex
+
+        lookup = {internal.Geometry.SQUARE: square, internal.Geometry.ANGLED: angled,
+                  internal.Geometry.CONCAVE: concave, internal.Geometry.CONVEX: convex,
+                  internal.Geometry.CIRCLE: circle, internal.Geometry.DOUBLE_CONCAVE: double_concave,
+                  internal.Geometry.DOUBLE_CONVEX: double_convex, internal.Geometry.RECTANGLE: rectangle}
+
     def __init__(self, **kwargs):
         super(Wall, self).__init__(**kwargs)
         self.geometry = self.appearance_lookup
@@ -241,28 +320,35 @@ class Wall(Rotatable, Floor, TileBase):
         # determine collisions. By necessity, then, this is a little involved.
         if self.geometry in {internal.Geometry.RECTANGLE, internal.Geometry.DOUBLE_CONCAVE}:
             if self.rotation == internal.TileRotation.UP:
-                self._geom_rect = sdl.Rect(self.x * size, self.y * size, size, size * 0.5)
+                self._geom_rect = sdl.Rect(0, 0, size, size * 0.5)
             elif self.rotation == internal.TileRotation.LEFT:
-                self._geom_rect = sdl.Rect(self.x * size, self.y * size, size * 0.5, size)
+                self._geom_rect = sdl.Rect(0, 0, size * 0.5, size)
             elif self.rotation == internal.TileRotation.DOWN:
-                self._geom_rect = sdl.Rect(self.x * size, (self.y + 0.5) * size, size, size * 0.5)
+                self._geom_rect = sdl.Rect(0, 0.5 * size, size, size * 0.5)
             elif self.rotation == internal.TileRotation.RIGHT:
-                self._geom_rect = sdl.Rect((self.x + 0.5) * size, self.y * size, size * 0.5, size)
+                self._geom_rect = sdl.Rect(0.5 * size, 0, size * 0.5, size)
             else:
                 raise exceptions.ProgrammingException
 
         if self.geometry == internal.Geometry.ANGLED:
             if self.rotation == internal.TileRotation.UP:
-                irat_kwargs = {'pos': helpers.XYPos(x=(self.x + 1) * size, y=(self.y + 1) * size), 'upleft': True}
+                irat_kwargs = {'pos': helpers.XYPos(x=size, y=size), 'upleft': True}
+                irat_direction = (-1, -1)
             elif self.rotation == internal.TileRotation.LEFT:
-                irat_kwargs = {'pos': helpers.XYPos(x=(self.x + 1) * size, y=self.y * size), 'downleft': True}
+                irat_kwargs = {'pos': helpers.XYPos(x=size, y=0), 'downleft': True}
+                irat_direction = (-1, 1)
             elif self.rotation == internal.TileRotation.DOWN:
-                irat_kwargs = {'pos': helpers.XYPos(x=self.x * size, y=self.y * size), 'downright': True}
+                irat_kwargs = {'pos': helpers.XYPos(x=0, y=0), 'downright': True}
+                irat_direction = (1, 1)
             elif self.rotation == internal.TileRotation.RIGHT:
-                irat_kwargs = {'pos': helpers.XYPos(x=self.x * size, y=(self.y + 1) * size), 'upright': True}
+                irat_kwargs = {'pos': helpers.XYPos(x=0, y=size), 'upright': True}
+                irat_direction = (1, -1)
             else:
                 raise exceptions.ProgrammingException
             self._geom_irat = tools.Irat(size, **irat_kwargs)
+            # The same again, for BatchCollisionFunctions
+            self._geom_irat_corner = irat_kwargs['pos']
+            self._geom_irat_direction = irat_direction
 
         if self.geometry in {internal.Geometry.CONCAVE, internal.Geometry.CONVEX, internal.Geometry.CIRCLE,
                         internal.Geometry.DOUBLE_CONCAVE, internal.Geometry.DOUBLE_CONVEX}:
@@ -290,8 +376,10 @@ class Wall(Rotatable, Floor, TileBase):
                 else:
                     raise exceptions.ProgrammingException
                 radius = size / 2
-            circle_center = helpers.XYPos(x=(self.x + x_offset) * size, y=(self.y + y_offset) * size)
+            circle_center = helpers.XYPos(x=x_offset * size, y=y_offset * size)
             self._geom_circle = tools.Disc(radius, circle_center)
+            self._geom_circle_center = circle_center
+            self._geom_circle_radius = radius
 
             if self.geometry == internal.Geometry.CONCAVE:
                 if self.rotation == internal.TileRotation.UP:
@@ -305,6 +393,7 @@ class Wall(Rotatable, Floor, TileBase):
                 else:
                     raise exceptions.ProgrammingException
                 self._geom_arc = tools.Arc.from_disc(self._geom_circle, theta, theta + 90)
+                self._geom_arc_angles = (theta, theta + 90)
             elif self.geometry == internal.Geometry.DOUBLE_CONCAVE:
                 if self.rotation == internal.TileRotation.UP:
                     theta = 180
@@ -317,13 +406,18 @@ class Wall(Rotatable, Floor, TileBase):
                 else:
                     raise exceptions.ProgrammingException
                 self._geom_arc = tools.Arc.from_disc(self._geom_circle, theta, theta + 180)
+                self._geom_arc_angles = (theta, theta + 180)
 
         self._collision_func = self.CollisionFunctions.lookup[self.geometry]
+        self._batch_collision_func = self.BatchCollisionFunctions.lookup[self.geometry]
 
     def _wall_geom_collide(self, entity, pos):
         entity_circle = tools.Disc(entity.radius, pos)
         return self._collision_func(self, entity_circle)
 
+    def _wall_geom_collide_many(self, radii, xs, ys):
+        return self._batch_collision_func(self, radii, xs, ys)
+
 
 class FloorlessWall(Wall):
     """Corporeal entities cannot move horizontally through this tile.
@@ -344,6 +438,9 @@ class FloorlessWall(Wall):
     def _floor_geom_collide(self, entity, pos):
         return self._wall_geom_collide(entity, pos)
 
+    def _floor_geom_collide_many(self, radii, xs, ys):
+        return self._wall_geom_collide_many(radii, xs, ys)
+
 
 class Boundary(TileBase):
     """Represents a wall that is never passable, to any entity, ever."""
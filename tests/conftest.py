@@ -0,0 +1,21 @@
+"""Makes the game importable as the 'Game' package (which is how it imports itself), whatever the directory holding
+this repository is called; and has pygame use a dummy display, so that the tests need no actual display."""
+
+import importlib.util
+import os
+import sys
+
+
+os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
+
+_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if 'Game' not in sys.modules:
+    _spec = importlib.util.spec_from_file_location('Game', os.path.join(_root, '__init__.py'),
+                                                   submodule_search_locations=[_root])
+    _game_package = importlib.util.module_from_spec(_spec)
+    sys.modules['Game'] = _game_package
+    try:
+        _spec.loader.exec_module(_game_package)
+    except ImportError:
+        # e.g. pygame isn't installed. Each test module skips itself if so.
+        del sys.modules['Game']
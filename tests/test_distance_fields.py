@@ -0,0 +1,111 @@
+import random
+import pytest
+
+pytest.importorskip('pygame')
+pytest.importorskip('Tools')
+
+import Tools as tools
+
+
+import Game.config.config as config
+
+import Game.program.misc.helpers as helpers
+import Game.program.misc.maps as maps
+
+import Game.program.distance_fields as distance_fields
+import Game.program.game as game
+import Game.program.tiles as tiles
+
+
+_wall_types = ["{'def':'W','opts':{'rotation':'up','appearance_lookup':'square'}}",
+               "{'def':'W','opts':{'rotation':'left','appearance_lookup':'convex'}}",
+               "{'def':'W','opts':{'rotation':'down','appearance_lookup':'circle'}}",
+               "{'def':'W','opts':{'rotation':'right','appearance_lookup':'angled'}}",
+               "{'def':'f','opts':{'rotation':'up','appearance_lookup':'concave'}}"]
+
+
+def _map(progress=None):
+    """A small map: floor, with walls of various shapes dotted about, and with a gap in the floor."""
+    tile_data = {(x, y): 0 for x in range(8) for y in range(8)}
+    for i in range(len(_wall_types)):
+        tile_data[(1 + i, 1 + (i % 2) * 3)] = i + 1
+    del tile_data[(6, 6)]
+    contents = repr({'tile_types': ["{'def':'.'}"] + _wall_types, 'tile_data': {0: tile_data}, 'start_pos': (0, 0, 0)})
+    tile_types, tile_data, _ = maps.parse_map_data(contents, tiles.all_tiles())
+    map_ = game.Map(config.GRAPHICS_BACKGROUND_COLOR)
+    map_.load_tiles(tile_types, tile_data, progress)
+    return map_
+
+
+def _positions(number, seed=0):
+    """Random positions over the map, and a little way beyond its edges."""
+    rng = random.Random(seed)
+    return [helpers.XYZPos(x=rng.uniform(-tiles.size, 9 * tiles.size), y=rng.uniform(-tiles.size, 9 * tiles.size), z=0)
+            for _ in range(number)]
+
+
+def _exact_distance(map_, collide_name, incorporeal, pos, max_distance, tolerance=1e-4):
+    """The distance from the given position to the geometry, found by bisecting on the radius of the entity."""
+    lower, upper = 0, max_distance
+    while upper - lower > tolerance:
+        middle = (lower + upper) / 2
+        if map_.tile_collide(collide_name, tools.Object(radius=middle, incorporeal=incorporeal), pos):
+            upper = middle
+        else:
+            lower = middle
+    return (lower + upper) / 2
+
+
+@pytest.mark.parametrize('resolution', [2, 4])
+def test_error_bound(resolution):
+    """Every distance looked up from a field is within error_bound of the true distance."""
+    map_ = _map()
+    fields = distance_fields.DistanceFields(map_, resolution=resolution)
+    for collide_name in fields.collide_names:
+        for incorporeal in (False, True):
+            field = fields._field(collide_name, 0, incorporeal)
+            for pos in _positions(100):
+                distance = field.distance(pos.x, pos.y)
+                if distance is None:
+                    continue
+                exact = _exact_distance(map_, collide_name, incorporeal, pos, fields.max_distance)
+                assert abs(distance - exact) <= fields.error_bound + 1e-4
+
+
+def test_collide_matches_exact():
+    """With the exact fallback, the fields give exactly the same answers as testing against the tiles."""
+    map_ = _map()
+    fields = distance_fields.DistanceFields(map_, exact_fallback=True)
+    rng = random.Random(1)
+    for pos in _positions(300):
+        entity = tools.Object(radius=rng.uniform(1, 1.5 * tiles.size), incorporeal=rng.random() < 0.5)
+        for collide_name in fields.collide_names:
+            assert fields.collide(collide_name, entity, pos) == map_.tile_collide(collide_name, entity, pos)
+    assert fields.fallbacks < fields.tests
+
+
+def test_fields_computed_on_load(monkeypatch):
+    """With config.USE_DISTANCE_FIELDS, every field is computed whilst loading the map, reporting progress as it goes,
+    and they're stored as 32-bit floats."""
+    monkeypatch.setattr(config, 'USE_DISTANCE_FIELDS', True)
+    progress = []
+    map_ = _map(progress.append)
+    fields = map_._distance_fields
+    assert len(fields._fields) == 2 * len(fields.collide_names)
+    assert all(field.values.typecode == 'f' for field in fields._fields.values())
+    assert progress == sorted(progress)
+    assert progress[-1] == 1
+
+
+def test_tiles_changed():
+    """After changing some tiles, the fields are the same as if they'd been computed from scratch."""
+    map_ = _map()
+    fields = distance_fields.DistanceFields(map_)
+    fields.compute_all()
+    map_._distance_fields = fields
+    map_.set(3, 3, 0, 1)
+    map_.set(6, 2, 0, 5)
+    map_.set(1, 1, 0, None)
+    fresh_fields = distance_fields.DistanceFields(map_)
+    for key, field in fields._fields.items():
+        assert field.values == fresh_fields._field(*key).values
@@ -0,0 +1,87 @@
+import random
+import pytest
+
+pytest.importorskip('pygame')
+pytest.importorskip('Tools')
+
+
+import Game.program.misc.helpers as helpers
+
+import Game.program.entities as entities
+import Game.program.tiles as tiles
+
+
+def _entity(rng):
+    entity = entities.Entity()
+    entity.pos = helpers.XYZPos(x=rng.uniform(-5 * tiles.size, 5 * tiles.size),
+                                y=rng.uniform(-5 * tiles.size, 5 * tiles.size),
+                                z=rng.randrange(2))
+    entity.radius = rng.uniform(1, tiles.size)
+    return entity
+
+
+def _intersect(entity, pos, radius):
+    return (pos.z == entity.z and
+            (entity.x - pos.x) ** 2 + (entity.y - pos.y) ** 2 < (entity.radius + radius) ** 2)
+
+
+def _registry(seed=0):
+    rng = random.Random(seed)
+    registry = entities.EntityRegistry()
+    for _ in range(200):
+        registry.add(_entity(rng))
+    return registry, rng
+
+
+def test_near():
+    """'near' finds exactly those entities that a brute force search does."""
+    registry, rng = _registry()
+    for _ in range(200):
+        pos = helpers.XYZPos(x=rng.uniform(-6 * tiles.size, 6 * tiles.size),
+                             y=rng.uniform(-6 * tiles.size, 6 * tiles.size),
+                             z=rng.randrange(2))
+        radius = rng.uniform(0, 2 * tiles.size)
+        expected = {id(entity) for entity in registry if _intersect(entity, pos, radius)}
+        assert {id(entity) for entity in registry.near(pos, radius)} == expected
+
+
+def test_collide():
+    """An entity doesn't collide with itself, only with others."""
+    registry, rng = _registry()
+    for entity in registry:
+        expected = any(other is not entity and _intersect(other, entity.pos, entity.radius) for other in registry)
+        assert registry.collide(entity, entity.pos) == expected
+
+
+def test_update():
+    """Entities are still found after they've moved, once 'update' has been called, and not where they were."""
+    registry, rng = _registry()
+    moved = list(registry)[:50]
+    for entity in moved:
+        old_pos = helpers.XYZPos(x=entity.x, y=entity.y, z=entity.z)
+        entity.pos = helpers.XYZPos(x=old_pos.x + 3 * tiles.size, y=old_pos.y - 2 * tiles.size, z=old_pos.z)
+        registry.update(entity)
+        assert any(other is entity for other in registry.near(entity.pos, 0))
+        assert all(other is not entity for other in registry.near(old_pos, 0))
+
+
+def test_remove():
+    registry, rng = _registry()
+    removed = list(registry)[:50]
+    for entity in removed:
+        registry.remove(entity)
+        assert entity not in registry
+        assert all(other is not entity for other in registry.near(entity.pos, entity.radius))
+    assert len(registry) == 150
+
+
+def test_collisions():
+    """'collisions' gives every colliding pair exactly once."""
+    registry, rng = _registry()
+    all_entities = list(registry)
+    expected = {frozenset((id(entity), id(other)))
+                for i, entity in enumerate(all_entities) for other in all_entities[i + 1:]
+                if _intersect(other, entity.pos, entity.radius)}
+    pairs = [frozenset((id(entity), id(other))) for entity, other in registry.collisions()]
+    assert len(pairs) == len(set(pairs))
+    assert set(pairs) == expected
@@ -0,0 +1,53 @@
+import pytest
+
+pytest.importorskip('pygame')
+pytest.importorskip('Tools')
+
+
+import Game.config.config as config
+
+import Game.program.interface.play_overlay as play_overlay
+
+
+class _Interface:
+    """Stands in for interface.Interface, just counting how many times it's told that event routing has changed."""
+
+    def __init__(self):
+        self.routing_changes = 0
+
+    def routing_changed(self):
+        self.routing_changes += 1
+
+
+def _overlay():
+    overlay = play_overlay.PlayOverlay(name='game', location=config.GRAPHICS_SCREEN_LOC,
+                                       size=config.GRAPHICS_SCREEN_SIZE,
+                                       background_color=config.GRAPHICS_BACKGROUND_COLOR)
+    interface = _Interface()
+    overlay.register_interface(interface)
+    return overlay, interface
+
+
+def test_held_inputs():
+    overlay, interface = _overlay()
+    assert {key.unicode for key in overlay.listen_keys} == set(config.Move.values())
+    assert overlay.listen_mouse == {3}
+
+
+def test_held_inputs_cannot_be_modified_in_place():
+    """Modifying them in place would leave the interface routing events as before, so isn't possible."""
+    overlay, interface = _overlay()
+    with pytest.raises(AttributeError):
+        overlay.listen_mouse.add(1)
+    with pytest.raises(AttributeError):
+        overlay.listen_keys.clear()
+    assert interface.routing_changes == 0
+
+
+def test_assigning_changes_routing():
+    overlay, interface = _overlay()
+    overlay.listen_mouse = overlay.listen_mouse | {1}
+    overlay.listen_keys = set()
+    assert interface.routing_changes == 2
+    assert overlay.listen_mouse == {1, 3}
+    assert isinstance(overlay.listen_keys, frozenset)
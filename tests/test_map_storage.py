@@ -0,0 +1,93 @@
+import random
+import numpy as np
+import pytest
+
+pytest.importorskip('pygame')
+pytest.importorskip('Tools')
+
+import Tools as tools
+
+
+import Game.config.config as config
+
+import Game.program.misc.helpers as helpers
+import Game.program.misc.maps as maps
+
+import Game.program.distance_fields as distance_fields
+import Game.program.game as game
+import Game.program.tiles as tiles
+
+
+def _level_data(seed=0):
+    """Random tile data for a level, spread over several chunks, including ones at negative positions."""
+    rng = random.Random(seed)
+    extent = 2 * config.MAP_CHUNK_SIZE
+    return {(rng.randrange(-extent, extent), rng.randrange(-extent, extent)): rng.randrange(5) for _ in range(500)}
+
+
+def test_level_get():
+    level_data = _level_data()
+    level = game.Level(0, level_data)
+    extent = 2 * config.MAP_CHUNK_SIZE
+    for x in range(-extent - 1, extent + 1):
+        for y in range(-extent - 1, extent + 1):
+            assert level.get(x, y) == level_data.get((x, y))
+
+
+def test_level_only_stores_chunks_with_tiles():
+    level = game.Level(0, {(0, 0): 0, (10 * config.MAP_CHUNK_SIZE, 0): 1})
+    assert len(level.chunks) == 2
+
+
+def test_level_iteration():
+    level_data = _level_data()
+    level = game.Level(0, level_data)
+    assert {(x, y): tile_index for x, y, tile_index in level} == level_data
+
+    left, top, width, height = -5, 3, config.MAP_CHUNK_SIZE + 7, 11
+    expected = {(x, y): tile_index for (x, y), tile_index in level_data.items()
+                if left <= x < left + width and top <= y < top + height}
+    assert {(x, y): tile_index for x, y, tile_index in level.iter_region(left, top, width, height)} == expected
+
+
+def test_level_get_many():
+    level_data = _level_data()
+    level = game.Level(0, level_data)
+    rng = np.random.RandomState(0)
+    extent = 2 * config.MAP_CHUNK_SIZE
+    xs = rng.randint(-extent - 1, extent + 1, 1000)
+    ys = rng.randint(-extent - 1, extent + 1, 1000)
+    expected = [-1 if level_data.get((x, y)) is None else level_data[(x, y)] for x, y in zip(xs.tolist(), ys.tolist())]
+    assert level.get_many(xs, ys).tolist() == expected
+
+
+def test_level_set():
+    level_data = _level_data()
+    level = game.Level(0, level_data)
+    level.set(0, 0, 3)
+    level.set(5 * config.MAP_CHUNK_SIZE, -5 * config.MAP_CHUNK_SIZE, 2)
+    some_x, some_y = next(pos for pos in level_data if pos != (0, 0))
+    level.set(some_x, some_y, None)
+    assert level.get(0, 0) == 3
+    assert level.get(5 * config.MAP_CHUNK_SIZE, -5 * config.MAP_CHUNK_SIZE) == 2
+    assert level.get(some_x, some_y) is None
+    assert level.max_x == 5 * config.MAP_CHUNK_SIZE
+    assert level.min_y == -5 * config.MAP_CHUNK_SIZE
+
+
+def test_map_bounds_change_forgets_distance_fields():
+    """Changing the map's bounds forgets every distance field, as each one covers the whole map."""
+    contents = repr({'tile_types': ["{'def':'.'}"], 'tile_data': {0: {(x, y): 0 for x in range(4) for y in range(4)}},
+                     'start_pos': (0, 0, 0)})
+    tile_types, tile_data, _ = maps.parse_map_data(contents, tiles.all_tiles())
+    map_ = game.Map(config.GRAPHICS_BACKGROUND_COLOR)
+    map_.load_tiles(tile_types, tile_data)
+    fields = distance_fields.DistanceFields(map_)
+    map_._distance_fields = fields
+    entity = tools.Object(radius=10, incorporeal=False)
+    pos = helpers.XYZPos(x=1.5 * tiles.size, y=1.5 * tiles.size, z=0)
+
+    map_.wall_collide(entity, pos)
+    assert fields.nbytes() > 0
+    map_.set(2, 2, 1, 0)  # On a new z-level, so the bounds change, although the fields for z-level 0 are unaffected.
+    assert fields.nbytes() == 0
@@ -0,0 +1,85 @@
+import os
+import pytest
+
+pytest.importorskip('pygame')
+pytest.importorskip('Tools')
+
+
+import Game.program.misc.maps as maps
+
+import Game.program.tiles as tiles
+
+
+_good_map = repr({'tile_types': ["{'def':'.'}"],
+                  'tile_data': {0: {(0, 0): 0, (2, 1): 0}, 1: {(1, 3): 0}},
+                  'start_pos': (0, 0, 0)})
+_other_map = repr({'tile_types': ["{'def':'.'}"],
+                   'tile_data': {0: {(0, 0): 0}},
+                   'start_pos': (0, 0, 0)})
+_bad_map = 'not a map'
+
+
+@pytest.fixture
+def map_loc(tmp_path):
+    map_loc = tmp_path / 'maps'
+    map_loc.mkdir()
+    (map_loc / 'good.map').write_text(_good_map)
+    (map_loc / 'bad.map').write_text(_bad_map)
+    (map_loc / 'not a map file.txt').write_text(_good_map)
+    return map_loc
+
+
+def _catalogue(map_loc):
+    return maps.Catalogue(str(map_loc), str(map_loc / '.catalogue'))
+
+
+def test_update(map_loc):
+    catalogue = _catalogue(map_loc)
+    bad, good = catalogue.update(tiles.all_tiles())
+    assert catalogue.parsed == 2
+    assert (bad.name, bad.valid, bad.tile_count) == ('bad', False, None)
+    assert (good.name, good.valid) == ('good', True)
+    assert (good.width, good.height, good.z_levels, good.tile_count) == (3, 4, 2, 3)
+    assert good.size == len(_good_map)
+    assert os.path.exists(catalogue.catalogue_loc)
+
+
+def test_saved_index_is_used(map_loc):
+    map_infos = _catalogue(map_loc).update(tiles.all_tiles())
+    catalogue = _catalogue(map_loc)
+    assert catalogue.update(tiles.all_tiles()) == map_infos
+    assert catalogue.parsed == 0
+
+
+def test_touched_map_is_not_parsed_again(map_loc):
+    catalogue = _catalogue(map_loc)
+    catalogue.update(tiles.all_tiles())
+    good_loc = str(map_loc / 'good.map')
+    stat = os.stat(good_loc)
+    os.utime(good_loc, (stat.st_atime + 10, stat.st_mtime + 10))
+    bad, good = catalogue.update(tiles.all_tiles())
+    assert catalogue.parsed == 0
+    assert good.mtime == os.stat(good_loc).st_mtime
+
+
+def test_changes_are_picked_up(map_loc):
+    catalogue = _catalogue(map_loc)
+    catalogue.update(tiles.all_tiles())
+    (map_loc / 'bad.map').write_text(_other_map)
+    (map_loc / 'good.map').unlink()
+    (map_loc / 'new.map').write_text(_good_map)
+    map_infos = catalogue.update(tiles.all_tiles())
+    assert catalogue.parsed == 2
+    assert [(map_info.name, map_info.valid, map_info.tile_count) for map_info in map_infos] == [('bad', True, 1),
+                                                                                                ('new', True, 3)]
+    # And the saved index is up to date too.
+    catalogue = _catalogue(map_loc)
+    assert catalogue.update(tiles.all_tiles()) == map_infos
+    assert catalogue.parsed == 0
+
+
+def test_unreadable_index_is_rebuilt(map_loc):
+    (map_loc / '.catalogue').write_text('{not valid')
+    catalogue = _catalogue(map_loc)
+    assert len(catalogue.update(tiles.all_tiles())) == 2
+    assert catalogue.parsed == 2
@@ -0,0 +1,151 @@
+import heapq
+import math
+import random
+import pytest
+
+pytest.importorskip('pygame')
+pytest.importorskip('Tools')
+
+
+import Game.config.config as config
+
+import Game.program.misc.maps as maps
+
+import Game.program.game as game
+import Game.program.pathfinding as pathfinding
+import Game.program.tiles as tiles
+
+
+_size = 40
+_wall_x = 20
+_gap_y = 35
+_enclosed = (5, 5, 0)
+
+
+def _map(progress=None):
+    """Floor everywhere, split in two by a wall with a single gap in it, plus a cell walled in on all sides."""
+    tile_data = {(x, y): 0 for x in range(_size) for y in range(_size)}
+    for y in range(_size):
+        if y != _gap_y:
+            tile_data[(_wall_x, y)] = 1
+    enclosed_x, enclosed_y, _ = _enclosed
+    for offset_x in (-1, 0, 1):
+        for offset_y in (-1, 0, 1):
+            if offset_x or offset_y:
+                tile_data[(enclosed_x + offset_x, enclosed_y + offset_y)] = 1
+    contents = repr({'tile_types': ["{'def':'.'}", "{'def':'W','opts':{'rotation':'up','appearance_lookup':'square'}}"],
+                     'tile_data': {0: tile_data}, 'start_pos': (0, 0, 0)})
+    tile_types, tile_data, _ = maps.parse_map_data(contents, tiles.all_tiles())
+    map_ = game.Map(config.GRAPHICS_BACKGROUND_COLOR)
+    map_.load_tiles(tile_types, tile_data, progress)
+    return map_
+
+
+def _cost(pathfinder, path):
+    """The cost of following the given path, checking that each step of it is a valid move."""
+    cost = 0
+    for cell, next_cell in zip(path, path[1:]):
+        move_costs = dict(pathfinder.moves(cell))
+        assert next_cell in move_costs
+        cost += move_costs[next_cell]
+    return cost
+
+
+def _shortest_cost(pathfinder, start, goal):
+    """The cost of the shortest path, by a plain Dijkstra search over every cell; or None if there's no path."""
+    costs = {start: 0}
+    queue = [(0, start)]
+    while queue:
+        cost, cell = heapq.heappop(queue)
+        if cell == goal:
+            return cost
+        if cost > costs[cell]:
+            continue
+        for other, move_cost in pathfinder.moves(cell):
+            other_cost = cost + move_cost
+            if other_cost < costs.get(other, math.inf):
+                costs[other] = other_cost
+                heapq.heappush(queue, (other_cost, other))
+    return None
+
+
+def _random_cell(rng, pathfinder):
+    while True:
+        cell = (rng.randrange(_size), rng.randrange(_size), 0)
+        if pathfinder.standable(cell):
+            return cell
+
+
+def test_paths_are_valid():
+    """Paths are made of valid moves, and exist exactly when some path does."""
+    pathfinder = _map().pathfinder
+    rng = random.Random(0)
+    for _ in range(50):
+        start = _random_cell(rng, pathfinder)
+        goal = _random_cell(rng, pathfinder)
+        path = pathfinder.path(start, goal)
+        shortest_cost = _shortest_cost(pathfinder, start, goal)
+        if shortest_cost is None:
+            assert path is None
+        else:
+            assert path[0] == start
+            assert path[-1] == goal
+            assert _cost(pathfinder, path) >= shortest_cost - 1e-9
+
+
+def test_paths_within_a_cluster_are_shortest():
+    pathfinder = _map().pathfinder
+    start = (22, 1, 0)
+    goal = (31, 14, 0)
+    path = pathfinder.path(start, goal)
+    assert _cost(pathfinder, path) == pytest.approx(_shortest_cost(pathfinder, start, goal))
+
+
+def test_paths_go_through_the_gap():
+    pathfinder = _map().pathfinder
+    path = pathfinder.path((2, 2, 0), (38, 2, 0))
+    assert path is not None
+    assert all(cell[1] == _gap_y for cell in path if cell[0] == _wall_x)
+
+
+def test_no_path():
+    pathfinder = _map().pathfinder
+    assert pathfinder.path((2, 20, 0), _enclosed) is None
+    assert pathfinder.path((2, 20, 0), (_wall_x, 2, 0)) is None  # Can't stand in a wall
+
+
+def test_tiles_changed():
+    """Changing the map updates the paths found, including those that have been cached."""
+    map_ = _map()
+    pathfinder = map_.pathfinder
+    start = (2, 2, 0)
+    goal = (38, 2, 0)
+    assert pathfinder.path(start, goal) is not None
+    map_.set(_wall_x, _gap_y, 0, 1)  # Close the gap
+    assert pathfinder.path(start, goal) is None
+    map_.set(_wall_x, 2, 0, 0)  # Open a new one
+    path = pathfinder.path(start, goal)
+    assert path is not None
+    assert (_wall_x, 2, 0) in path
+
+
+def test_links_found_once(monkeypatch):
+    """Whilst loading the map, the ways of moving from each cluster to each of its neighbours are only found once, and
+    progress is reported as it goes."""
+    found = []
+    find_links = pathfinding.Pathfinder._find_links
+
+    def counted_find_links(self, cluster, other):
+        found.append((cluster, other))
+        return find_links(self, cluster, other)
+
+    monkeypatch.setattr(pathfinding.Pathfinder, '_find_links', counted_find_links)
+    progress = []
+    _map(progress.append)
+    clusters = {pathfinding.cluster_of((x, y, 0)) for x in range(_size) for y in range(_size)}
+    expected = {pair for cluster in clusters for other in pathfinding._neighbouring_clusters(cluster)
+                for pair in ((cluster, other), (other, cluster))}
+    assert len(found) == len(set(found))
+    assert set(found) == expected
+    assert progress == sorted(progress)
+    assert progress[-1] == 1
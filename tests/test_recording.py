@@ -0,0 +1,172 @@
+import random
+import pytest
+
+pytest.importorskip('pygame')
+pytest.importorskip('Tools')
+
+
+import Game.config.config as config
+import Game.config.internal as internal
+
+import Game.program.misc.exceptions as exceptions
+import Game.program.misc.helpers as helpers
+
+import Game.program.game as game
+import Game.program.recording as recording
+
+
+_keyframe_interval = 7
+_ticks = 50
+_setting_changes = {20: ('speedmult', 2.5), 33: ('flight', True), 41: ('incorporeal', True)}
+
+
+class _Player:
+    def __init__(self):
+        self.x = 0.25
+        self.y = 0.5
+        self.z = 0
+        self.fall_counter = 0
+        self.speedmult = 1
+        self.flight = False
+        self.incorporeal = False
+
+
+class _GameObjects:
+    def __init__(self):
+        self.player = _Player()
+
+
+class _Simulation:
+    """Stands in for game.Simulation, with some simple rules for how its state changes each tick (which depend on every
+    part of its state, so that getting any of it wrong changes the results)."""
+
+    def __init__(self):
+        self.game_objects = _GameObjects()
+        self.camera_offset = helpers.XYPos(x=0.0, y=0.0)
+        self.abs_move_command = None
+
+    def snapshot(self):
+        player = self.game_objects.player
+        return game.SimulationState(player_pos=helpers.XYZPos(x=player.x, y=player.y, z=player.z),
+                                    fall_counter=player.fall_counter,
+                                    speedmult=player.speedmult,
+                                    flight=player.flight,
+                                    incorporeal=player.incorporeal,
+                                    camera_offset=self.camera_offset,
+                                    abs_move_command=self.abs_move_command)
+
+    def restore(self, state):
+        player = self.game_objects.player
+        player.x, player.y, player.z = state.player_pos
+        player.fall_counter = state.fall_counter
+        self.restore_settings(state)
+        self.camera_offset = state.camera_offset
+        self.abs_move_command = state.abs_move_command
+
+    def restore_settings(self, state):
+        player = self.game_objects.player
+        player.speedmult = state.speedmult
+        player.flight = state.flight
+        player.incorporeal = state.incorporeal
+
+    def _tick(self, inputs):
+        player = self.game_objects.player
+        for play_inp, input_type in inputs:
+            if input_type == internal.InputTypes.ACTION:
+                if play_inp == internal.Move.RIGHT:
+                    player.x += 0.1 * player.speedmult * (2 if player.incorporeal else 1)
+                elif play_inp == internal.Move.DOWN:
+                    player.y += 0.1 * player.speedmult
+                elif play_inp == internal.Action.VERTICAL_UP and player.flight:
+                    player.z += 1
+            elif input_type == internal.InputTypes.MOVE_ABS:
+                self.abs_move_command = (helpers.XYZPos(x=play_inp.x, y=play_inp.y, z=player.z),)
+            else:
+                self.camera_offset = helpers.XYPos(x=self.camera_offset.x + play_inp.x,
+                                                   y=self.camera_offset.y + play_inp.y)
+        if self.abs_move_command is not None:
+            player.fall_counter += 1
+            if player.fall_counter % 5 == 0:
+                self.abs_move_command = None
+
+
+def _random_inputs(rng):
+    return rng.choice([[],
+                       [(internal.Move.RIGHT, internal.InputTypes.ACTION)],
+                       [(internal.Move.DOWN, internal.InputTypes.ACTION),
+                        (internal.Action.VERTICAL_UP, internal.InputTypes.ACTION)],
+                       [(helpers.XYPos(x=rng.random(), y=rng.random()), internal.InputTypes.MOVE_ABS)],
+                       [(helpers.XYPos(x=rng.random(), y=-rng.random()), internal.InputTypes.MOVE_CAMERA)]])
+
+
+@pytest.fixture
+def recorded(tmp_path):
+    """Records a session, changing the settings partway through as console commands would. Returns the path of the
+    recording, the simulation that it was recorded from, and its state at every tick."""
+    file_path = str(tmp_path / 'session.rec')
+    simulation = _Simulation()
+    recorder = recording.Recorder(file_path, 'a', (1600, 900), keyframe_interval=_keyframe_interval)
+    rng = random.Random(0)
+    states = []
+    for tick in range(_ticks):
+        if tick in _setting_changes:
+            setattr(simulation.game_objects.player, *_setting_changes[tick])
+        states.append(simulation.snapshot())
+        inputs = _random_inputs(rng)
+        recorder.record(simulation, inputs)
+        simulation._tick(inputs)
+    recorder.close()
+    return file_path, simulation, states
+
+
+def test_header(recorded):
+    file_path, simulation, states = recorded
+    recording_ = recording.Recording(file_path)
+    assert recording_.map_name == 'a'
+    assert tuple(recording_.screen_size) == (1600, 900)
+    assert recording_.ticks == _ticks
+    assert recording_.final_state == simulation.snapshot()
+
+
+def test_keyframes(recorded):
+    """There's a keyframe at least every keyframe_interval ticks, and wherever the settings changed."""
+    file_path, simulation, states = recorded
+    keyframes = recording.Recording(file_path).keyframes()
+    assert keyframes[0] == 0
+    assert all(later - earlier <= _keyframe_interval for earlier, later in zip(keyframes, keyframes[1:]))
+    assert set(_setting_changes) <= set(keyframes)
+
+
+@pytest.mark.parametrize('start_tick', [0, 5, 20, 21, 33, 45, _ticks - 1])
+def test_replay(recorded, start_tick):
+    """Replaying from any tick gives exactly the same results as the session that was recorded."""
+    file_path, simulation, states = recorded
+    recording_ = recording.Recording(file_path)
+    replay_simulation = _Simulation()
+    ticks_run = recording_.replay(replay_simulation, start_tick)
+    assert replay_simulation.snapshot() == recording_.final_state
+    keyframe = max(tick for tick in recording_.keyframes() if tick <= start_tick)
+    assert ticks_run == _ticks - keyframe
+
+
+def test_replay_part(recorded):
+    file_path, simulation, states = recorded
+    recording_ = recording.Recording(file_path)
+    replay_simulation = _Simulation()
+    assert recording_.replay(replay_simulation, 0, 30) == 30
+    assert replay_simulation.snapshot() == states[30]
+
+
+def test_physics_settings_must_match(recorded, monkeypatch):
+    file_path, simulation, states = recorded
+    recording_ = recording.Recording(file_path)
+    monkeypatch.setattr(config, 'PHYSICS_FRAMERATE', config.PHYSICS_FRAMERATE + 1)
+    with pytest.raises(exceptions.RecordingLoadException):
+        recording_.replay(_Simulation())
+
+
+def test_bad_file(tmp_path):
+    file_path = tmp_path / 'bad.rec'
+    file_path.write_bytes(b'not a recording')
+    with pytest.raises(exceptions.RecordingLoadException):
+        recording.Recording(str(file_path))
@@ -0,0 +1,21 @@
+import pytest
+
+pytest.importorskip('pygame')
+pytest.importorskip('Tools')
+
+
+import Game.program.misc.sdl as sdl
+
+
+def test_from_pygame():
+    """Converting a surface and wrapping the result copies its pixels exactly, including their alpha."""
+    sdl.display.set_mode((1, 1))
+    surface = sdl.Surface((4, 3), sdl.SRCALPHA)
+    surface.fill((0, 0, 0, 0))
+    surface.fill((200, 100, 50, 128), sdl.Rect(1, 1, 2, 1))
+    converted = sdl.Surface.from_pygame(surface.convert_alpha())
+    assert isinstance(converted, sdl.Surface)
+    assert converted.viewport == surface.get_rect()
+    for x in range(4):
+        for y in range(3):
+            assert converted.get_at((x, y)) == surface.get_at((x, y))
@@ -0,0 +1,68 @@
+import pytest
+
+pytest.importorskip('pygame')
+pytest.importorskip('Tools')
+
+
+import Game.config.config as config
+
+import Game.program.interface.base as base
+
+
+def _font(color=(0, 0, 0), size=config.MENU_FONT_SIZE):
+    return base.font(config.MENU_FONT, size, color)
+
+
+def _text_memory(font, text):
+    """How much memory the given text takes up once rendered."""
+    text_cache = base.TextCache()
+    text_cache.render(font, text)
+    return text_cache.nbytes()
+
+
+def test_hits_and_misses():
+    text_cache = base.TextCache()
+    font = _font()
+    surf = text_cache.render(font, 'hello')
+    assert (text_cache.hits, text_cache.misses) == (0, 1)
+    assert text_cache.render(font, 'hello') is surf
+    assert (text_cache.hits, text_cache.misses) == (1, 1)
+    text_cache.render(font, 'goodbye')
+    text_cache.render(_font(color=(255, 0, 0)), 'hello')
+    text_cache.render(_font(size=config.MENU_FONT_SIZE + 1), 'hello')
+    assert (text_cache.hits, text_cache.misses) == (1, 4)
+
+
+def test_least_recently_used_is_forgotten():
+    # The same text in different colors, so that each takes up the same amount of memory.
+    fonts = [_font(color=(i, 0, 0)) for i in range(3)]
+    memory = _text_memory(fonts[0], 'hello')
+    text_cache = base.TextCache(memory_budget=2 * memory)
+    text_cache.render(fonts[0], 'hello')
+    text_cache.render(fonts[1], 'hello')
+    text_cache.render(fonts[0], 'hello')  # Now fonts[1] is the least recently used
+    text_cache.render(fonts[2], 'hello')
+    assert text_cache.nbytes() == 2 * memory
+    misses = text_cache.misses
+    text_cache.render(fonts[0], 'hello')
+    text_cache.render(fonts[2], 'hello')
+    assert text_cache.misses == misses
+    text_cache.render(fonts[1], 'hello')
+    assert text_cache.misses == misses + 1
+
+
+def test_keeps_the_latest_even_if_over_budget():
+    text_cache = base.TextCache(memory_budget=0)
+    font = _font()
+    surf = text_cache.render(font, 'hello')
+    assert text_cache.nbytes() > 0
+    assert text_cache.render(font, 'hello') is surf
+    text_cache.render(font, 'goodbye')
+    assert text_cache.nbytes() == _text_memory(font, 'goodbye')
+
+
+def test_clear():
+    text_cache = base.TextCache()
+    text_cache.render(_font(), 'hello')
+    text_cache.clear()
+    assert text_cache.nbytes() == 0
@@ -0,0 +1,64 @@
+import pytest
+
+pytest.importorskip('pygame')
+pytest.importorskip('Tools')
+
+
+import Game.config.config as config
+
+import Game.program.game as game
+
+
+class _Clock:
+    """Stands in for sdl.time.Clock, claiming that exactly one render frame's worth of time passes every frame."""
+
+    def tick(self, framerate=0):
+        return 1000 / framerate
+
+
+def _run(monkeypatch, physics_framerate, render_framerate, frames=60):
+    """Runs the scheduler in the same way as Simulation.run does. Returns the number of ticks run and the alpha, for
+    each frame."""
+    monkeypatch.setattr(config, 'PHYSICS_FRAMERATE', physics_framerate)
+    monkeypatch.setattr(config, 'RENDER_FRAMERATE', render_framerate)
+    scheduler = game.TickScheduler()
+    clock = _Clock()
+    results = []
+    for _ in range(frames):
+        ticks = scheduler.ticks
+        scheduler.frame(clock.tick(render_framerate))
+        scheduler.run_ticks(lambda: None)
+        results.append((scheduler.ticks - ticks, scheduler.alpha))
+    return results
+
+
+@pytest.mark.parametrize('physics_framerate, render_framerate', [(120, 60), (30, 60), (50, 60), (60, 60), (45, 60),
+                                                                  (60, 144)])
+def test_alpha_is_even(monkeypatch, physics_framerate, render_framerate):
+    """Each frame the alpha moves on by the same fraction of a tick, wrapping round whenever a tick is run."""
+    results = _run(monkeypatch, physics_framerate, render_framerate)
+    step = physics_framerate / render_framerate
+    alpha = 0
+    for ticks, next_alpha in results:
+        assert 0 <= next_alpha < 1
+        assert ticks + next_alpha == pytest.approx(alpha + step)
+        alpha = next_alpha
+    assert sum(ticks for ticks, alpha in results) == pytest.approx(len(results) * step, abs=1)
+
+
+def test_alpha_sequences(monkeypatch):
+    assert _run(monkeypatch, 120, 60, frames=4) == [(2, pytest.approx(0, abs=1e-9))] * 4
+    assert _run(monkeypatch, 30, 60, frames=4) == [(0, pytest.approx(0.5)), (1, pytest.approx(0, abs=1e-9)),
+                                                   (0, pytest.approx(0.5)), (1, pytest.approx(0, abs=1e-9))]
+
+
+def test_falling_behind(monkeypatch):
+    """After a slow frame, at most MAX_TICKS_PER_FRAME ticks are run, and the rest are dropped."""
+    monkeypatch.setattr(config, 'PHYSICS_FRAMERATE', 120)
+    scheduler = game.TickScheduler()
+    scheduler.frame(100.5 * scheduler.physics_framelength)
+    scheduler.run_ticks(lambda: None)
+    assert scheduler.ticks == config.MAX_TICKS_PER_FRAME
+    assert scheduler.ticks + scheduler.dropped_ticks == 100
+    assert scheduler.late_frames == 1
+    assert scheduler.alpha == pytest.approx(0.5)
@@ -0,0 +1,669 @@
+"""Benchmarks for the performance-sensitive parts of the game.
+
+Run them via 'python main.py benchmark', optionally followed by the names of the benchmarks to run."""
+
+import collections
+import collections.abc
+import functools
+import math
+import numpy as np
+import random
+import time
+import tracemalloc
+import Tools as tools
+
+
+import Game.config.config as config
+import Game.config.internal as internal
+
+import Game.program.misc.assets as assets
+import Game.program.misc.helpers as helpers
+import Game.program.misc.maps as maps
+import Game.program.misc.sdl as sdl
+
+import Game.program.interface.base as base
+import Game.program.interface.interface as interface
+import Game.program.interface.menu_elements as menu_elements
+import Game.program.interface.play_overlay as play_overlay
+import Game.program.interface.text_overlay as text_overlay
+
+import Game.program.distance_fields as distance_fields
+import Game.program.entities as entities
+import Game.program.pathfinding as pathfinding
+import Game.program.game as game
+import Game.program.tiles as tiles
+
+
+all_benchmarks = tools.SortedDict()
+
+# The map used for benchmarks that want a real map.
+benchmark_map_name = 'throneroom'
+# How many times to repeat each timed operation.
+repeats = 100000
+
+
+def _measure_memory(func):
+    """Calls the given function. Returns its result, and how much memory (in bytes) was allocated during the call and is
+    still in use afterwards."""
+
+    tracemalloc.start()
+    try:
+        result = func()
+        memory, _ = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return result, memory
+
+
+def _time_per_call(func, args_list):
+    """Returns the average time, in microseconds, taken to call the given function on each of the given arguments."""
+
+    start = time.perf_counter()
+    for args in args_list:
+        func(*args)
+    return (time.perf_counter() - start) * 1000000 / len(args_list)
+
+
+def _report(name, value, unit):
+    print('  {name:<50} {value:>14.3f} {unit}'.format(name=name, value=value, unit=unit))
+
+
+def _load_map(map_name=benchmark_map_name):
+    map_name, tile_types, tile_data, start_pos = maps.get_map_data_from_map_name(map_name, tiles.all_tiles())
+    return tile_types, tile_data, start_pos
+
+
+class _SyntheticTileData(collections.abc.Mapping):
+    """The tile data for a large synthetic map: floor everywhere, with a wall on every eighth row and column. Each
+    z-level is only generated when it is asked for, so the whole map never needs to be in memory at once."""
+
+    tile_types = ["{'def':'.'}", "{'def':'W','opts':{'rotation':'up','appearance_lookup':'square'}}"]
+
+    def __init__(self, width, height, depth):
+        self.width = width
+        self.height = height
+        self.depth = depth
+
+    def __getitem__(self, z):
+        if not 0 <= z < self.depth:
+            raise KeyError(z)
+        return {(x, y): int(x % 8 == 0 or y % 8 == 0) for x in range(self.width) for y in range(self.height)}
+
+    def __iter__(self):
+        return iter(range(self.depth))
+
+    def __len__(self):
+        return self.depth
+
+    @classmethod
+    def tile_type_callbacks(cls):
+        return [maps._deserialize_tile_type(serial_tile, tiles.all_tiles()) for serial_tile in cls.tile_types]
+
+
+@tools.register('map_storage', all_benchmarks)
+def map_storage(synthetic_size=(1000, 1000, 10)):
+    """Compares the memory use and lookup speed of the chunked array-backed tile storage against the old dict-of-dicts
+    of tile objects, on a real map and on a large synthetic map."""
+
+    print('Map storage, on {}:'.format(benchmark_map_name))
+    tile_types, tile_data, _ = _load_map()
+    cells = sum(len(z_level) for z_level in tile_data.values())
+
+    def old_layout():
+        return {z: {(x, y): tile_types[tile_def]() for (x, y), tile_def in z_level.items()}
+                for z, z_level in tile_data.items()}
+
+    def new_layout():
+        map_ = game.Map(config.GRAPHICS_BACKGROUND_COLOR)
+        map_._load_levels(tile_types, tile_data)
+        return map_
+
+    old_tiles, old_memory = _measure_memory(old_layout)
+    new_map, new_memory = _measure_memory(new_layout)
+    _report('dict-of-dicts of tiles: memory', old_memory / 1024, 'KiB')
+    _report('chunked levels: memory', new_memory / 1024, 'KiB')
+
+    lookups = [(x, y, z) for z, z_level in tile_data.items() for x, y in z_level.keys()]
+    lookups = [random.choice(lookups) for _ in range(repeats)]
+    _report('dict-of-dicts of tiles: lookup', _time_per_call(lambda x, y, z: old_tiles[z][(x, y)], lookups), 'us')
+    _report('chunked levels: tile index lookup', _time_per_call(lambda x, y, z: new_map._levels[z].get(x, y), lookups),
+            'us')
+    _report('chunked levels: Map.get', _time_per_call(new_map.get, lookups), 'us')
+
+    width, height, depth = synthetic_size
+    print('Map storage, on a synthetic {}x{}x{} map:'.format(width, height, depth))
+    synthetic_tile_data = _SyntheticTileData(width, height, depth)
+    synthetic_tile_types = synthetic_tile_data.tile_type_callbacks()
+
+    def new_synthetic_layout():
+        map_ = game.Map(config.GRAPHICS_BACKGROUND_COLOR)
+        map_._load_levels(synthetic_tile_types, synthetic_tile_data)
+        return map_
+
+    # Storing a tile object per cell of a map this large isn't feasible, so we measure one z-level's worth of the old
+    # dicts holding just the tile indices, and then estimate the cost of the tile objects from the real map above.
+    level_dict, level_dict_memory = _measure_memory(lambda: synthetic_tile_data[0])
+    del level_dict
+    old_tile_object_memory = (old_memory / cells) * width * height * depth
+    _, new_synthetic_memory = _measure_memory(new_synthetic_layout)
+    _report('dict-of-dicts of indices: memory (lower bound)', level_dict_memory * depth / 1024 ** 2, 'MiB')
+    _report('dict-of-dicts of tiles: memory (estimated)', old_tile_object_memory / 1024 ** 2, 'MiB')
+    _report('chunked levels: memory', new_synthetic_memory / 1024 ** 2, 'MiB')
+
+
+def _random_positions(map_, number):
+    """Returns the given number of random positions over the tiles of the given map."""
+
+    cells = [pos for pos, tile in map_]
+    positions = []
+    for _ in range(number):
+        cell = random.choice(cells)
+        positions.append(helpers.XYZPos(x=(cell.x + random.random()) * tiles.size,
+                                        y=(cell.y + random.random()) * tiles.size,
+                                        z=cell.z))
+    return positions
+
+
+def _tick_budget_report(name, microseconds, calls_per_tick):
+    """Reports how much of each physics tick is spent doing something, given how long it takes and how many times it
+    is done per tick."""
+
+    tick_length = 1000000 / config.PHYSICS_FRAMERATE
+    _report(name, microseconds, 'us')
+    _report(name + ': share of a {} Hz tick'.format(config.PHYSICS_FRAMERATE),
+            100 * microseconds * calls_per_tick / tick_length, '%')
+
+
+def _local_without_stencils(map_, radius, pos):
+    """How Map.local used to work, before caching stencils, for comparison: walks outwards in rings from the tile the
+    disc is centered in, testing each tile for intersection with the disc."""
+
+    def shell(tile_center_x, tile_center_y, dist):
+        if dist == 0:
+            yield tile_center_x, tile_center_y
+        else:
+            for i in range(0, dist):
+                j = dist - i
+                yield tile_center_x + i, tile_center_y + j
+                yield tile_center_x - j, tile_center_y + i
+                yield tile_center_x - i, tile_center_y - j
+                yield tile_center_x + j, tile_center_y - i
+
+    tile_radius = 2 * math.ceil(radius / tiles.diag)
+    tile_center_x = math.floor(pos.x / tiles.size)
+    tile_center_y = math.floor(pos.y / tiles.size)
+    disc = tools.Disc(radius, pos)
+    for dist in range(0, tile_radius + 1):
+        for tile_x, tile_y in shell(tile_center_x, tile_center_y, dist):
+            if disc.colliderect(sdl.Rect(tile_x * tiles.size, tile_y * tiles.size, tiles.size, tiles.size)):
+                tile_pos = helpers.XYZPos(x=pos.x - tile_x * tiles.size, y=pos.y - tile_y * tiles.size, z=pos.z)
+                yield map_.get(tile_x, tile_y, pos.z), tile_pos
+
+
+@tools.register('local', all_benchmarks)
+def local(calls_per_tick=4):
+    """Compares Map.local with and without cached stencils. (Each physics tick calls it a few times: three times to
+    check whether the player is falling, and once more for each move.)"""
+
+    print('Map.local, on {}:'.format(benchmark_map_name))
+    tile_types, tile_data, _ = _load_map()
+    map_ = game.Map(config.GRAPHICS_BACKGROUND_COLOR)
+    map_._load_levels(tile_types, tile_data)
+    radius = entities.Player().radius
+    args_list = [(radius, pos) for pos in _random_positions(map_, repeats)]
+
+    _tick_budget_report('without stencils',
+                        _time_per_call(lambda radius_, pos: list(_local_without_stencils(map_, radius_, pos)),
+                                       args_list),
+                        calls_per_tick)
+    _tick_budget_report('with stencils', _time_per_call(lambda radius_, pos: list(map_.local(radius_, pos)), args_list),
+                        calls_per_tick)
+
+
+def _every_tile_type_map():
+    """Returns a map with one of every possible type of tile (i.e. every kind of tile, in every rotation and with every
+    appearance) on it, spaced out with gaps between them."""
+
+    tile_types = []
+    for tile_class in tiles.all_tiles().values():
+        rotations = internal.TileRotation.values() if tile_class.can_rotate else [None]
+        appearance_lookups = tile_class.appearances.keys() if len(tile_class.appearances) != 1 else [None]
+        for rotation in rotations:
+            for appearance_lookup in appearance_lookups:
+                kwargs = {}
+                if rotation is not None:
+                    kwargs['rotation'] = rotation
+                if appearance_lookup is not None:
+                    kwargs['appearance_lookup'] = appearance_lookup
+                tile_types.append(functools.partial(tile_class, **kwargs))
+    tile_data = {0: {(2 * (i % 8), 2 * (i // 8)): i for i in range(len(tile_types))}}
+    map_ = game.Map(config.GRAPHICS_BACKGROUND_COLOR)
+    map_._load_levels(tile_types, tile_data)
+    return map_
+
+
+@tools.register('collide_many', all_benchmarks)
+def collide_many(entity_counts=(10, 100, 1000)):
+    """Checks that the batched collision functions give the same answers as testing entities one at a time, on a map
+    with every type of tile; and compares how long each takes."""
+
+    print('Batched collisions, on a map with every type of tile:')
+    map_ = _every_tile_type_map()
+    collide_names = ('wall_collide', 'floor_collide', 'suspend_collide')
+
+    # Includes positions around and outside of the edge of the map, and on a z-level with no tiles.
+    count = repeats // 10
+    radii = np.random.uniform(1, 1.5 * tiles.size, count)
+    xs = np.random.uniform(-2 * tiles.size, 18 * tiles.size, count)
+    ys = np.random.uniform(-2 * tiles.size, 2 * (len(map_._tiles) // 8 + 1) * tiles.size, count)
+    incorporeal = np.random.random(count) < 0.5
+    for z in (0, 1):
+        for collide_name in collide_names:
+            collide = getattr(map_, collide_name)
+            one_at_a_time = [collide(tools.Object(radius=radius, incorporeal=incorporeal_),
+                                     helpers.XYZPos(x=x, y=y, z=z))
+                             for radius, x, y, incorporeal_ in zip(radii, xs, ys, incorporeal)]
+            batched = getattr(map_, collide_name + '_many')(radii, xs, ys, z, incorporeal)
+            _report('{} on z={}: disagreements'.format(collide_name, z),
+                    np.count_nonzero(batched != np.array(one_at_a_time)), 'of {}'.format(count))
+
+    radius = entities.Player().radius
+    for entity_count in entity_counts:
+        positions = _random_positions(map_, entity_count)
+        entities_ = [tools.Object(radius=radius, incorporeal=False)] * entity_count
+        xs = np.array([pos.x for pos in positions])
+        ys = np.array([pos.y for pos in positions])
+        batch_repeats = max(1, repeats // (10 * entity_count))
+        one_at_a_time_time = _time_per_call(lambda: [map_.wall_collide(entity, pos)
+                                                     for entity, pos in zip(entities_, positions)],
+                                            [()] * batch_repeats)
+        batched_time = _time_per_call(lambda: map_.wall_collide_many(radius, xs, ys, 0), [()] * batch_repeats)
+        _report('wall_collide, {} entities one at a time'.format(entity_count), one_at_a_time_time, 'us')
+        _report('wall_collide_many, {} entities'.format(entity_count), batched_time, 'us')
+
+
+@tools.register('distance_fields', all_benchmarks)
+def distance_fields_(resolutions=(1, 2, 4)):
+    """Checks that collision tests using distance fields give the same answers as testing against the tiles; and
+    compares how long each takes, on a map with every type of tile."""
+
+    print('Distance fields, on a map with every type of tile:')
+    map_ = _every_tile_type_map()
+    radius = entities.Player().radius
+    positions = _random_positions(map_, repeats // 10)
+    args_lists = {incorporeal: [(tools.Object(radius=radius, incorporeal=incorporeal), pos) for pos in positions]
+                  for incorporeal in (False, True)}
+    exact = {(collide_name, incorporeal): [map_.tile_collide(collide_name, entity, pos) for entity, pos in args_list]
+             for collide_name in distance_fields.DistanceFields.collide_names
+             for incorporeal, args_list in args_lists.items()}
+    _tick_budget_report('wall_collide against tiles',
+                        _time_per_call(lambda entity, pos: map_.tile_collide('wall_collide', entity, pos),
+                                       args_lists[False]),
+                        4)
+
+    for resolution in resolutions:
+        for exact_fallback in (True, False):
+            name = 'resolution {}, {}'.format(resolution, 'exact fallback' if exact_fallback else 'no fallback')
+            fields = distance_fields.DistanceFields(map_, resolution=resolution, exact_fallback=exact_fallback)
+            start_time = time.perf_counter()
+            fields.compute_all()
+            _report(name + ': time to compute', time.perf_counter() - start_time, 's')
+            _report(name + ': memory', fields.nbytes() / 1024 ** 2, 'MiB')
+            disagreements = 0
+            for (collide_name, incorporeal), answers in exact.items():
+                disagreements += sum(fields.collide(collide_name, entity, pos) != answer
+                                     for (entity, pos), answer in zip(args_lists[incorporeal], answers))
+            _report(name + ': disagreements', disagreements, 'of {}'.format(len(positions) * len(exact)))
+            _report(name + ': fallbacks', 100 * fields.fallbacks / fields.tests, '%')
+            _tick_budget_report(name + ': wall_collide',
+                                _time_per_call(lambda entity, pos: fields.collide('wall_collide', entity, pos),
+                                               args_lists[False]),
+                                4)
+
+
+class _DiscreteSimulation(game.Simulation):
+    """How Simulation used to move entities, before swept collisions, for comparison: a single step, which is thrown
+    away if it ends up in a wall."""
+
+    def _move_entity(self, direction, entity, max_distance=math.inf):
+        scaling = min(entity.speed, max_distance) / math.sqrt(direction.x ** 2 + direction.y ** 2)
+        move_x = direction.x * scaling
+        move_y = direction.y * scaling
+        new_entity_pos = helpers.XYZPos(x=entity.x + move_x, y=entity.y + move_y, z=entity.z)
+        if self.game_objects.map.wall_collide(entity, new_entity_pos):
+            self._abs_move_command = None
+        else:
+            entity.x = new_entity_pos.x
+            entity.y = new_entity_pos.y
+
+            if entity is self.game_objects.player:
+                self._move_camera_offset(-1 * move_x, -1 * move_y)
+
+
+@tools.register('ticks', all_benchmarks)
+def ticks(speedmults=(1, 8), ticks_per_run=10000):
+    """Compares how many physics ticks per second can be run with and without swept collisions, whilst the player
+    wanders around the map being sent to random places."""
+
+    print('Physics ticks, on {}:'.format(benchmark_map_name))
+    tile_types, tile_data, start_pos = _load_map()
+    game_objects = game.GameObjects(config.GRAPHICS_BACKGROUND_COLOR)
+    game_objects.reset()
+    game_objects.map._load_levels(tile_types, tile_data)
+    targets = _random_positions(game_objects.map, ticks_per_run // 100)
+
+    for simulation_class, name in ((_DiscreteSimulation, 'discrete steps'), (game.Simulation, 'swept')):
+        for speedmult in speedmults:
+            simulation = simulation_class(game_objects, interface=None, clock=None)
+            simulation.reset()
+            player = game_objects.player
+            player.pos = helpers.XYZPos(x=(start_pos.x + 0.5) * tiles.size, y=(start_pos.y + 0.5) * tiles.size,
+                                        z=start_pos.z)
+            player.speedmult = speedmult
+            player.flight = True  # So that it stays on the same z-level
+            start_time = time.perf_counter()
+            for tick in range(ticks_per_run):
+                if tick % 100 == 0:
+                    target = targets[tick // 100]
+                    # Straight there, rather than via a path, so as to just compare moving.
+                    simulation._abs_move_command = collections.deque([helpers.XYZPos(x=target.x, y=target.y,
+                                                                                     z=player.z)])
+                simulation._tick([])
+            ticks_per_second = ticks_per_run / (time.perf_counter() - start_time)
+            _report('{}, speedmult {}: ticks per second'.format(name, speedmult), ticks_per_second, '')
+            _report('{}, speedmult {}: headroom at {} Hz'.format(name, speedmult, config.PHYSICS_FRAMERATE),
+                    ticks_per_second / config.PHYSICS_FRAMERATE, 'x')
+
+
+@tools.register('blits', all_benchmarks)
+def blits(blits_per_image=1000):
+    """Measures how quickly tile images can be blitted to the display: as loaded from file, and from the atlases before
+    and after they are converted to the display's pixel format. Also measures how long it takes to draw a whole z-level
+    of a real map, before and after conversion."""
+
+    display = sdl.display.set_mode(config.SCREEN_SIZE)
+    tile_types = list(tiles.all_tiles().values())
+    loaded_images = [sdl.image.load(path) for tile_type in tile_types for path in tile_type._appearance_paths.values()]
+    screen_width, screen_height = config.SCREEN_SIZE
+    positions = [(random.randrange(screen_width - tiles.size), random.randrange(screen_height - tiles.size))
+                 for _ in range(blits_per_image)]
+
+    map_tile_types, tile_data, start_pos = _load_map()
+    map_ = game.Map(config.GRAPHICS_BACKGROUND_COLOR)
+    map_.load_tiles(map_tile_types, tile_data)
+    bounds = map_.bounds
+
+    def draw_level():
+        map_._screens.clear()
+        map_._screens_memory = 0
+        list(map_.screens(start_pos.z, bounds.min_x * tiles.size, bounds.min_y * tiles.size,
+                          (bounds.max_x - bounds.min_x + 1) * tiles.size,
+                          (bounds.max_y - bounds.min_y + 1) * tiles.size))
+
+    def report(name, images):
+        _report('{}: time per blit'.format(name),
+                _time_per_call(display.blit, [(image, pos) for image in images for pos in positions]), 'us')
+
+    print('Blitting tile images, and drawing a z-level of {}:'.format(benchmark_map_name))
+    report('loaded from file', loaded_images)
+    if not assets.manager.converted:
+        report('atlas', [appearance for tile_type in tile_types for appearance in tile_type.appearances.values()])
+        _report('atlas: time to draw z-level', _time_per_call(draw_level, [()] * 10) / 1000, 'ms')
+        assets.manager.convert()
+    report('converted atlas', [appearance for tile_type in tile_types for appearance in tile_type.appearances.values()])
+    _report('converted atlas: time to draw z-level', _time_per_call(draw_level, [()] * 10) / 1000, 'ms')
+    _report('atlas pages', assets.manager.num_pages(), '')
+    _report('atlas memory', assets.manager.nbytes() / 1024 ** 2, 'MiB')
+
+
+@tools.register('screens', all_benchmarks)
+def screens(synthetic_size=(1000, 1000, 1), frames=1000, pan_speed=20):
+    """Measures how long it takes to get the visual depiction of the map each frame, and how much memory is used to
+    store it, whilst panning the camera across a large synthetic map."""
+
+    width, height, depth = synthetic_size
+    print('Drawing the map, panning across a synthetic {}x{}x{} map:'.format(width, height, depth))
+    synthetic_tile_data = _SyntheticTileData(width, height, depth)
+    map_ = game.Map(config.GRAPHICS_BACKGROUND_COLOR)
+    map_.load_tiles(synthetic_tile_data.tile_type_callbacks(), synthetic_tile_data)
+    screen_width, screen_height = config.SCREEN_SIZE
+
+    max_memory = 0
+    max_screens = 0
+    frame_times = []
+    for frame in range(frames):
+        # Pan diagonally, which brings new pieces of the map into view as often as possible.
+        left = frame * pan_speed
+        top = frame * pan_speed
+        start_time = time.perf_counter()
+        screens_in_view = list(map_.screens(0, left, top, screen_width, screen_height))
+        frame_times.append(time.perf_counter() - start_time)
+        max_screens = max(max_screens, len(screens_in_view))
+        max_memory = max(max_memory, map_._screens_memory)
+    frame_times.sort()
+    _report('average time per frame', 1000 * sum(frame_times) / frames, 'ms')
+    _report('worst time per frame', 1000 * frame_times[-1], 'ms')
+    _report('most pieces of the map blitted in a frame', max_screens, '')
+    _report('most memory used by drawn pieces of the map', max_memory / 1024 ** 2, 'MiB')
+    _report('frames that waited for a piece to be drawn', map_.screen_stalls, '')
+    _report('memory that drawing whole levels would use',
+            4 * width * height * depth * tiles.size ** 2 / 1024 ** 2, 'MiB')
+
+
+@tools.register('prefetch', all_benchmarks)
+def prefetch(synthetic_size=(300, 300, 2), frames=600, switch_every=60, pan_speed=4):
+    """Measures how many frames have to wait for a piece of the map to be drawn, whilst panning the camera and
+    regularly switching z-level (as when going up and down stairs), with and without drawing the next z-level in
+    advance."""
+
+    width, height, depth = synthetic_size
+    print('Switching z-level every {} frames on a synthetic {}x{}x{} map:'.format(switch_every, width, height, depth))
+    synthetic_tile_data = _SyntheticTileData(width, height, depth)
+    screen_width, screen_height = config.SCREEN_SIZE
+    for use_prefetch in (False, True):
+        map_ = game.Map(config.GRAPHICS_BACKGROUND_COLOR)
+        map_.load_tiles(synthetic_tile_data.tile_type_callbacks(), synthetic_tile_data)
+        frame_times = []
+        for frame in range(frames):
+            z = (frame // switch_every) % depth
+            left = frame * pan_speed
+            top = frame * pan_speed
+            start_time = time.perf_counter()
+            list(map_.screens(z, left, top, screen_width, screen_height))
+            frame_times.append(time.perf_counter() - start_time)
+            if use_prefetch:
+                map_.prefetch((z + 1) % depth, left, top, screen_width, screen_height,
+                              time.perf_counter() + config.MAP_PREFETCH_BUDGET / 1000)
+        name = 'with prefetching' if use_prefetch else 'without prefetching'
+        _report('{}: frames that waited for drawing'.format(name), map_.screen_stalls, '')
+        _report('{}: time spent waiting'.format(name), 1000 * map_.screen_stall_time, 'ms')
+        _report('{}: worst time per frame'.format(name), 1000 * max(frame_times), 'ms')
+
+
+@tools.register('entities', all_benchmarks)
+def entities_(entity_counts=(100, 1000, 2000), area=(100, 100), ticks_per_run=100):
+    """Compares finding every pair of colliding entities via the entity registry, against testing every pair of
+    entities, whilst the entities wander around at random."""
+
+    print('Entity collisions, on a {}x{} tile area:'.format(*area))
+    width, height = area
+    for entity_count in entity_counts:
+        registry = entities.EntityRegistry()
+        entities_list = []
+        for _ in range(entity_count):
+            entity = entities.Entity()
+            entity.pos = helpers.XYZPos(x=random.uniform(0, width * tiles.size), y=random.uniform(0, height * tiles.size),
+                                        z=0)
+            registry.add(entity)
+            entities_list.append(entity)
+        moves = [[(random.uniform(-1, 1) * entity.speed, random.uniform(-1, 1) * entity.speed)
+                  for entity in entities_list]
+                 for _ in range(ticks_per_run)]
+
+        def tick(tick_moves, collisions):
+            for entity, (move_x, move_y) in zip(entities_list, tick_moves):
+                entity.x += move_x
+                entity.y += move_y
+                registry.update(entity)
+            return list(collisions())
+
+        def every_pair():
+            return [(entity, other) for i, entity in enumerate(entities_list) for other in entities_list[i + 1:]
+                    if registry._intersect(entity, other)]
+
+        _tick_budget_report('{} entities: update and find collisions'.format(entity_count),
+                            _time_per_call(tick, [(tick_moves, registry.collisions) for tick_moves in moves]), 1)
+        if entity_count <= 1000:
+            _tick_budget_report('{} entities: testing every pair'.format(entity_count),
+                                _time_per_call(tick, [(tick_moves, every_pair) for tick_moves in moves[:10]]), 1)
+
+
+@tools.register('pathfinding', all_benchmarks)
+def pathfinding_(synthetic_size=(256, 256, 2), requests=200):
+    """Measures how long it takes to precompute the clusters used for pathfinding, and to find paths with and without
+    them, on a real map and a synthetic one."""
+
+    synthetic_tile_data = _SyntheticTileData(*synthetic_size)
+    maps_to_test = [(benchmark_map_name, _load_map()[:2]),
+                    ('a synthetic {}x{}x{} map'.format(*synthetic_size),
+                     (synthetic_tile_data.tile_type_callbacks(), synthetic_tile_data))]
+    for map_name, (tile_types, tile_data) in maps_to_test:
+        print('Pathfinding, on {}:'.format(map_name))
+        map_ = game.Map(config.GRAPHICS_BACKGROUND_COLOR)
+        map_._load_levels(tile_types, tile_data)
+        start_time = time.perf_counter()
+        pathfinder = pathfinding.Pathfinder(map_)
+        _report('precomputing clusters', 1000 * (time.perf_counter() - start_time), 'ms')
+
+        cells = [tuple(pos) for pos, tile in map_ if pathfinder.standable(tuple(pos))]
+        pairs = [(random.choice(cells), random.choice(cells)) for _ in range(requests)]
+        _report('plain A*', _time_per_call(pathfinder._search, pairs) / 1000, 'ms')
+        _report('hierarchical, uncached', _time_per_call(pathfinder._find_path, pairs) / 1000, 'ms')
+        for start, goal in pairs:
+            pathfinder.path(start, goal)
+        _report('hierarchical, cached', _time_per_call(pathfinder.path, pairs) / 1000, 'ms')
+        _report('length of a frame', 1000 / config.RENDER_FRAMERATE, 'ms')
+
+
+@tools.register('sparse', all_benchmarks)
+def sparse(size=200, density=0.02):
+    """Measures lookups and collision tests on a sparse map, where most lookups are misses; and compares them against
+    creating a new Empty tile for each miss, as used to happen."""
+
+    print('Misses, on a sparse {0}x{0} map:'.format(size))
+    tile_types = _SyntheticTileData.tile_type_callbacks()
+    tile_data = {0: {(x, y): 1 for x in range(size) for y in range(size) if random.random() < density}}
+    tile_data[0][(0, 0)] = 1  # Make sure the whole area is within the map
+    tile_data[0][(size - 1, size - 1)] = 1
+    map_ = game.Map(config.GRAPHICS_BACKGROUND_COLOR)
+    map_._load_levels(tile_types, tile_data)
+    misses = [(random.randrange(size), random.randrange(size), 0) for _ in range(repeats)]
+    misses = [(x, y, z) for x, y, z in misses if (x, y) not in tile_data[0]]
+    _report('creating a new Empty tile', _time_per_call(lambda x, y, z: tiles.Empty(), misses), 'us')
+    _report('Map.get on a miss', _time_per_call(map_.get, misses), 'us')
+
+    radius = entities.Player().radius
+    args_list = [(tools.Object(radius=radius, incorporeal=False),
+                  helpers.XYZPos(x=(x + random.random()) * tiles.size, y=(y + random.random()) * tiles.size, z=z))
+                 for x, y, z in misses]
+    _tick_budget_report('wall_collide', _time_per_call(map_.wall_collide, args_list), 4)
+    _, memory = _measure_memory(lambda: [map_.wall_collide(entity, pos) for entity, pos in args_list])
+    _report('wall_collide: memory still allocated afterwards', memory / 1024, 'KiB')
+
+
+@tools.register('text', all_benchmarks)
+def text(num_strings=50, rebuilds=200):
+    """Compares rendering text afresh with using the text cache, when the same text is drawn over and over (as when a
+    menu is rebuilt each time it is shown)."""
+
+    font = base.font(config.MENU_FONT, config.MENU_FONT_SIZE, config.MENU_FONT_COLOR)
+    text_pieces = [('Menu entry {}'.format(i),) for i in range(num_strings)] * rebuilds
+    text_cache = base.TextCache()
+    print('Rendering {} strings, {} times each:'.format(num_strings, rebuilds))
+    _report('uncached: time per string', _time_per_call(font.render, text_pieces), 'us')
+    _report('cached: time per string', _time_per_call(lambda piece: text_cache.render(font, piece), text_pieces),
+            'us')
+    _report('cached: hit rate', 100 * text_cache.hits / (text_cache.hits + text_cache.misses), '%')
+    _report('cached: memory', text_cache.nbytes() / 1024, 'KiB')
+
+
+@tools.register('input', all_benchmarks)
+def input_(events_per_tick=(1, 10), ticks=1200):
+    """Measures how long Interface.inp takes each physics tick, with mouse and keyboard events waiting to be handled
+    each tick. Compares working out which overlays events should go to just when that changes, with working it out
+    afresh every tick."""
+
+    debug_font = base.font(config.DEBUG_FONT, config.DEBUG_FONT_SIZE, config.DEBUG_FONT_COLOR)
+    overlays = tools.OrderedObject()
+    overlays.debug = text_overlay.DebugOverlay(name='debug', location=config.DEBUG_SCREEN_LOC,
+                                               size=config.DEBUG_SCREEN_SIZE,
+                                               background_color=config.DEBUG_BACKGROUND_COLOR, font=debug_font)
+    overlays.game = play_overlay.PlayOverlay(name='game', location=config.GRAPHICS_SCREEN_LOC,
+                                             size=config.GRAPHICS_SCREEN_SIZE,
+                                             background_color=config.GRAPHICS_BACKGROUND_COLOR)
+    interface_ = interface.Interface(overlays)
+    interface_.reset()
+    interface_.overlays.game.enable()
+    interface_.selected_overlay = interface_.overlays.game
+    screen_width, screen_height = config.SCREEN_SIZE
+    up_code = sdl.key.code(config.Move.UP)
+    tick_time = 1000 / config.PHYSICS_FRAMERATE
+
+    print('Handling input at {} ticks per second:'.format(config.PHYSICS_FRAMERATE))
+    for num_events in events_per_tick:
+        for reroute in (False, True):
+            sdl.event.clear()
+            start_time = time.perf_counter()
+            for _ in range(ticks):
+                for i in range(num_events):
+                    if i % 2:
+                        sdl.event.post(sdl.event.Event(sdl.KEYDOWN, key=up_code, unicode=config.Move.UP, mod=0))
+                    else:
+                        pos = (random.randrange(screen_width), random.randrange(screen_height))
+                        sdl.event.post(sdl.event.Event(sdl.MOUSEMOTION, pos=pos, rel=(0, 0), buttons=(0, 0, 0)))
+                if reroute:
+                    interface_.routing_changed()
+                interface_.inp()
+            time_per_tick = (time.perf_counter() - start_time) * 1000 / ticks
+            name = '{} events per tick, {}'.format(num_events, 'routed every tick' if reroute else 'routed on change')
+            _report(name + ': time per tick', time_per_tick * 1000, 'us')
+            _report(name + ': share of a tick', 100 * time_per_tick / tick_time, '%')
+
+
+@tools.register('list', all_benchmarks)
+def list_(entry_counts=(10, 1000, 10000), scrolls=1000):
+    """Measures how long it takes to create a menu's list of entries (e.g. of maps to select), how much memory it uses,
+    and how long it takes to scroll it, for different numbers of entries."""
+
+    font = base.font(config.MENU_FONT, config.MENU_FONT_SIZE, config.MENU_FONT_COLOR)
+    print('Creating and scrolling lists:')
+    for entry_count in entry_counts:
+        entry_text = ['Map {}'.format(i) for i in range(entry_count)]
+
+        def create_list():
+            list_screen = sdl.Surface.from_rect(menu_elements.List.size)
+            return menu_elements.List(screen=list_screen, title='Maps', entry_text=entry_text, font=font)
+
+        create_time = _time_per_call(create_list, [()] * 10)
+        created_list, memory = _measure_memory(create_list)
+        entries_screen = created_list.entry_view
+        entries_memory = entries_screen.get_bytesize() * entries_screen.get_width() * entries_screen.get_height()
+        scrollbar = created_list._components.scrollbar
+        scroll_args = [(None, i % 200 >= 100, (0, 0)) for i in range(scrolls)]
+        name = '{} entries'.format(entry_count)
+        _report(name + ': time to create', create_time / 1000, 'ms')
+        _report(name + ': memory used by the entries', (entries_memory + memory) / 1024 ** 2, 'MiB')
+        _report(name + ': time per scroll', _time_per_call(scrollbar.scroll, scroll_args), 'us')
+
+
+def start(benchmark_names=()):
+    """Runs the benchmarks with the given names, or all of them if no names are given."""
+
+    if not benchmark_names:
+        benchmark_names = all_benchmarks.keys()
+    for benchmark_name in benchmark_names:
+        all_benchmarks[benchmark_name]()
+
+
+if __name__ == '__main__':
+    start()